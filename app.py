@@ -1,18 +1,28 @@
-from flask import Flask, render_template, request, jsonify, Response, session, redirect, url_for, render_template_string, flash
-import os, math, json
+from flask import Flask, render_template, request, jsonify, Response, session, redirect, url_for, render_template_string, flash, g, send_file, stream_with_context
+import os, io, math, json, time
+import click
 from collections import OrderedDict
 from datetime import datetime, timezone, timedelta   # ✅ add timedelta here
 from flask_sqlalchemy import SQLAlchemy
 from helper.functions import (
     get_distance,
+    get_distances,
     load_json,
-    get_billable_miles,
-    evaluate_condition,
-    format_breakdown,
-    get_max_upcharge_cap,
-    PRICING_CALCULATORS,
     login_required,
+    admin_required,
+    is_admin,
 )
+from helper.catalog import PricingCatalog
+from helper.deadhead import get_trip_distance, trip_legs, resolve_job_legs, combine_legs
+from helper.bulk import read_jobs, price_jobs, format_results, FORMATS
+from helper.distance_client import UpstreamUnavailable
+from helper.quote import price_quote, restamp_quote, QuoteError
+from helper.quote_cache import QuoteCache
+from helper import metrics
+from helper.profiling import profiler_from_env
+from helper.quote_log import QuoteLogWriter, quote_record, new_quote_id
+from helper.fleet import fleet, validate_reading
+from helper.rollups import rollup_deltas, ROLLUP_KEY, DIMENSIONS, PERIODS
 from werkzeug.security import generate_password_hash, check_password_hash
 from functools import wraps
 
@@ -27,6 +37,27 @@ app.secret_key = os.getenv("FLASK_SECRET_KEY", "dev_default_key")
 
 app.permanent_session_lifetime = timedelta(minutes=30)
 
+# Pricing data is parsed once per worker and hot-reloaded when the files change
+catalog = PricingCatalog(
+    os.getenv("TOWDYNAMIQ_DATA_DIR", "data"),
+    check_interval=float(os.getenv("CATALOG_CHECK_INTERVAL", "2")),
+)
+
+# Recent quotes, so resubmitting the same job skips the distance lookup and pricing
+quote_cache = QuoteCache(
+    max_entries=int(os.getenv("QUOTE_CACHE_SIZE", "2000")),
+    ttl_seconds=float(os.getenv("QUOTE_CACHE_TTL", "300")),
+)
+
+BATCH_MAX_QUOTES = int(os.getenv("BATCH_MAX_QUOTES", "500"))
+BULK_WORKERS = int(os.getenv("BULK_WORKERS", "0"))
+CATALOG_MAX_AGE = int(os.getenv("CATALOG_MAX_AGE", "3600"))
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+FLEET_TOKEN = os.getenv("FLEET_TOKEN")   # bearer token for dispatch pushes to /fleet/status
+
+# Opt-in request profiling (PROFILE_SAMPLE_RATE / PROFILE_ALLOW_HEADER), see helper/profiling.py
+profiler = profiler_from_env()
+
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -45,6 +76,46 @@ app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
 db = SQLAlchemy(app)
 
+# -------------------------
+# 📈 Request metrics
+# -------------------------
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get("request_started")
+    if started is not None and request.endpoint != "metrics_endpoint":
+        metrics.observe_request(request.endpoint or "unknown", response.status_code, time.perf_counter() - started)
+    return response
+
+
+# -------------------------
+# 🔬 Request profiling (hooks only exist when enabled)
+# -------------------------
+if profiler.enabled:
+    @app.before_request
+    def start_profile():
+        forced = request.headers.get("X-Profile") == "1" and is_admin()
+        if profiler.should_profile(request.endpoint, forced):
+            g.profile = profiler.start()
+
+    @app.after_request
+    def finish_profile(response):
+        handle = g.pop("profile", None)
+        if handle is not None:
+            response.headers["X-Profile-File"] = profiler.finish(handle, request.endpoint, response.status_code)
+        return response
+
+    @app.teardown_request
+    def finish_failed_profile(exc):
+        handle = g.pop("profile", None)
+        if handle is not None:   # unhandled exception: after_request never ran
+            profiler.finish(handle, request.endpoint, "error")
+
+
 # -------------------------
 # ✅ Session timeout (auto logout)
 # -------------------------
@@ -53,7 +124,7 @@ def session_timeout_check():
     session.permanent = True
 
     # Skip static/login/logout
-    if request.endpoint in ["static", "login", "logout", "calculate"]:
+    if request.endpoint in ["static", "login", "logout", "calculate", "calculate_batch", "metrics_endpoint"]:
         return
 
     if "user" in session:
@@ -95,6 +166,215 @@ class User(db.Model):
         return f"<User {self.username}>"
 
 
+# -------------------------
+# 🧾 Quote log models (append-only, written by the quote_log thread)
+# -------------------------
+class QuoteLog(db.Model):
+    __tablename__ = "quote_log"
+    id = db.Column(db.String(32), primary_key=True)          # quote_id returned to the client
+    created_at = db.Column(db.DateTime, nullable=False, index=True)
+    hour = db.Column(db.DateTime, nullable=False, index=True)  # created_at truncated, for hourly aggregates
+    endpoint = db.Column(db.String(20), nullable=False)
+    username = db.Column(db.String(50))
+    tow_type = db.Column(db.String(50))
+    services = db.Column(db.Text)
+    source = db.Column(db.Text)           # free-text addresses: Text, never truncated
+    destination = db.Column(db.Text)
+    distance_miles = db.Column(db.Integer)
+    bucket_miles = db.Column(db.Integer)
+    distance_provider = db.Column(db.String(10))
+    standard_quote = db.Column(db.Float)
+    todynamiq_quote = db.Column(db.Float)
+    overall_pct_chng = db.Column(db.Float)
+    weather = db.Column(db.String(32))            # rollup dimensions, "none" when not applicable
+    vehicle_location = db.Column(db.String(64))
+    time_slot = db.Column(db.String(32))
+    catalog_version = db.Column(db.String(16))
+    cache_hit = db.Column(db.Boolean, default=False)
+    payload = db.Column(db.JSON)
+
+    __table_args__ = (
+        db.Index("ix_quote_log_tow_type_created_at", "tow_type", "created_at"),
+        db.Index("ix_quote_log_username_created_at", "username", "created_at"),
+    )
+
+
+class QuoteLogService(db.Model):
+    __tablename__ = "quote_log_services"
+    id = db.Column(db.Integer, primary_key=True)
+    quote_id = db.Column(db.String(32), db.ForeignKey("quote_log.id"), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    tow_type = db.Column(db.String(50))
+    service = db.Column(db.String(64), nullable=False)
+    pricing_type = db.Column(db.String(20))
+    standard_quote = db.Column(db.Float)
+    todynamiq_quote = db.Column(db.Float)
+    combined_upcharge_pct = db.Column(db.Float)
+    upcharge_amount = db.Column(db.Float)
+
+    __table_args__ = (db.Index("ix_quote_log_services_service_created_at", "service", "created_at"),)
+
+
+class QuoteLogModifier(db.Model):
+    __tablename__ = "quote_log_modifiers"
+    id = db.Column(db.Integer, primary_key=True)
+    quote_id = db.Column(db.String(32), db.ForeignKey("quote_log.id"), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    service = db.Column(db.String(64), nullable=False)
+    modifier = db.Column(db.String(32), nullable=False)
+    upcharge = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (db.Index("ix_quote_log_modifiers_modifier_created_at", "modifier", "created_at"),)
+
+
+class QuoteRollup(db.Model):
+    __tablename__ = "quote_rollups"
+    id = db.Column(db.Integer, primary_key=True)
+    period = db.Column(db.String(4), nullable=False)      # "hour" / "day"
+    bucket = db.Column(db.DateTime, nullable=False)       # start of the hour / day (UTC)
+    tow_type = db.Column(db.String(50), nullable=False)
+    service = db.Column(db.String(64), nullable=False)
+    weather = db.Column(db.String(32), nullable=False)
+    vehicle_location = db.Column(db.String(64), nullable=False)
+    time_slot = db.Column(db.String(32), nullable=False)
+    lines = db.Column(db.Integer, nullable=False, default=0)
+    standard_sum = db.Column(db.Float, nullable=False, default=0.0)
+    todynamiq_sum = db.Column(db.Float, nullable=False, default=0.0)
+    upcharge_pct_sum = db.Column(db.Float, nullable=False, default=0.0)
+
+    __table_args__ = (db.UniqueConstraint(*ROLLUP_KEY, name="uq_quote_rollups_key"),)
+
+
+class RollupState(db.Model):
+    __tablename__ = "rollup_state"
+    name = db.Column(db.String(32), primary_key=True)
+    high_water = db.Column(db.Integer, nullable=False, default=0)   # last quote_log_services.id folded in
+    updated_at = db.Column(db.DateTime)
+
+
+QUOTE_LOG_TABLES = [QuoteLog.__table__, QuoteLogService.__table__, QuoteLogModifier.__table__,
+                    QuoteRollup.__table__, RollupState.__table__]
+_quote_log_tables_ready = False
+
+def ensure_quote_log_tables():
+    global _quote_log_tables_ready
+    if not _quote_log_tables_ready:
+        db.metadata.create_all(db.engine, tables=QUOTE_LOG_TABLES)
+        _quote_log_tables_ready = True
+
+def write_quote_log(records):
+    """One bulk insert per table for a batch of helper.quote_log records."""
+    with app.app_context():
+        ensure_quote_log_tables()
+        db.session.execute(db.insert(QuoteLog), [r["quote"] for r in records])
+        services = [row for r in records for row in r["services"]]
+        if services:
+            db.session.execute(db.insert(QuoteLogService), services)
+        modifiers = [row for r in records for row in r["modifiers"]]
+        if modifiers:
+            db.session.execute(db.insert(QuoteLogModifier), modifiers)
+        db.session.commit()
+
+
+quote_log = QuoteLogWriter(
+    write_quote_log,
+    enabled=os.getenv("QUOTE_LOG_ENABLED", "true").lower() != "false",
+    queue_size=int(os.getenv("QUOTE_LOG_QUEUE_SIZE", "10000")),
+    batch_size=int(os.getenv("QUOTE_LOG_BATCH_SIZE", "500")),
+    flush_interval=float(os.getenv("QUOTE_LOG_FLUSH_INTERVAL", "1")),
+)
+
+def log_quote(data, response, endpoint, snapshot, cache_hit=False, username=None):
+    """Give the response its quote_id and queue it for the quote log (never blocks)."""
+    response["quote_id"] = new_quote_id()
+    if quote_log.enabled:
+        quote_log.log(quote_record(data, response, endpoint, snapshot, username, cache_hit))
+    return response
+
+
+# -------------------------
+# 📊 Quote rollups (see helper/rollups.py)
+# -------------------------
+ROLLUP_LAG_SECONDS = int(os.getenv("ROLLUP_LAG_SECONDS", "60"))
+
+def rollup_quotes(max_rows=50000, lag=ROLLUP_LAG_SECONDS):
+    """Fold up to `max_rows` service lines past the high-water mark into quote_rollups. Returns (lines, high water)."""
+    ensure_quote_log_tables()
+    state = db.session.execute(
+        db.select(RollupState).filter_by(name="quote_rollups").with_for_update()   # one job at a time
+    ).scalar_one_or_none()
+    if state is None:
+        state = RollupState(name="quote_rollups", high_water=0)
+        db.session.add(state)
+
+    pending = (
+        db.select(QuoteLogService.id, QuoteLogService.created_at)
+        .where(QuoteLogService.id > state.high_water)
+        .order_by(QuoteLogService.id).limit(max_rows).subquery()
+    )
+    settled = datetime.utcnow() - timedelta(seconds=lag)
+    upper = db.session.execute(db.select(db.func.max(pending.c.id)).where(pending.c.created_at <= settled)).scalar()
+    if upper is None:
+        db.session.commit()
+        return 0, state.high_water
+
+    groups = db.session.execute(
+        db.select(
+            QuoteLog.hour, QuoteLogService.tow_type, QuoteLogService.service,
+            QuoteLog.weather, QuoteLog.vehicle_location, QuoteLog.time_slot,
+            db.func.count(),
+            db.func.sum(QuoteLogService.standard_quote),
+            db.func.sum(QuoteLogService.todynamiq_quote),
+            db.func.sum(QuoteLogService.combined_upcharge_pct),
+        )
+        .join(QuoteLog, QuoteLog.id == QuoteLogService.quote_id)
+        .where(QuoteLogService.id > state.high_water, QuoteLogService.id <= upper)
+        .group_by(QuoteLog.hour, QuoteLogService.tow_type, QuoteLogService.service,
+                  QuoteLog.weather, QuoteLog.vehicle_location, QuoteLog.time_slot)
+    ).all()
+    deltas = rollup_deltas(groups)
+
+    # Add to the rows of the touched buckets, insert the combinations seen for the first time
+    existing = {
+        tuple(getattr(row, column) for column in ROLLUP_KEY): row
+        for row in db.session.execute(
+            db.select(QuoteRollup).where(QuoteRollup.bucket.in_({key[1] for key in deltas}))
+        ).scalars()
+    }
+    inserts = []
+    for key, (lines, standard_sum, todynamiq_sum, upcharge_pct_sum) in deltas.items():
+        row = existing.get(key)
+        if row is None:
+            inserts.append(dict(zip(ROLLUP_KEY, key), lines=lines, standard_sum=standard_sum,
+                                todynamiq_sum=todynamiq_sum, upcharge_pct_sum=upcharge_pct_sum))
+        else:
+            row.lines += lines
+            row.standard_sum += standard_sum
+            row.todynamiq_sum += todynamiq_sum
+            row.upcharge_pct_sum += upcharge_pct_sum
+    if inserts:
+        db.session.execute(db.insert(QuoteRollup), inserts)
+
+    state.high_water = upper
+    state.updated_at = datetime.utcnow()
+    db.session.commit()
+    return sum(group[6] for group in groups), upper
+
+
+@app.cli.command("rollup-quotes")
+@click.option("--max-rows", default=50000, help="service lines folded per transaction")
+@click.option("--lag", default=ROLLUP_LAG_SECONDS, help="leave lines younger than this many seconds for the next run")
+def rollup_quotes_command(max_rows, lag):
+    """Fold newly logged quotes into the hourly/daily rollups (run from cron)."""
+    total = 0
+    while True:
+        lines, high_water = rollup_quotes(max_rows, lag)
+        total += lines
+        if not lines:
+            break
+    print(f"✅ Rolled up {total} service lines (high-water mark {high_water})")
+
+
 @app.route("/login", methods=["GET", "POST"])
 def login():
     error = None
@@ -124,13 +404,73 @@ def logout():
 @app.route("/testquote007")
 @login_required  # ✅ protects this route
 def testquote007():
-    pricing = load_json("pricing.json")
-    dynamic_modifiers = load_json("dynamic_modifiers.json")
-    cars = load_json("make_model_modifiers.json")
+    snapshot = catalog.get()
+    # Only the makes are embedded; models are fetched from /catalog when a make is picked
     return render_template("testquote007.html",
-                           pricing=pricing,
-                           dynamic_modifiers=dynamic_modifiers,
-                           cars=cars)
+                           pricing=snapshot.pricing,
+                           dynamic_modifiers=snapshot.dynamic_modifiers,
+                           makes=[(key, make["label"]) for key, make in snapshot.cars.items()])
+
+
+# -------------------------
+# Make/model catalog API
+# -------------------------
+def catalog_json(snapshot, build_payload):
+    """
+    JSON response tagged with the catalog version. Browsers revalidate with
+    If-None-Match and get a bodyless 304 until the catalog files change.
+    """
+    etag = f"catalog-{snapshot.version}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(build_payload())
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = f"private, max-age={CATALOG_MAX_AGE}, must-revalidate"
+    return response
+
+
+@app.route("/catalog/makes")
+@login_required
+def catalog_makes():
+    snapshot = catalog.get()
+    return catalog_json(snapshot, lambda: {
+        "version": snapshot.version,
+        "makes": [{"key": key, "label": make["label"]} for key, make in snapshot.cars.items()],
+    })
+
+
+@app.route("/catalog/makes/<path:make>/models")
+@login_required
+def catalog_models(make):
+    snapshot = catalog.get()
+    make_key = make if make in snapshot.cars else next(
+        (key for key, entry in snapshot.cars.items() if entry["label"] == make), None
+    )
+    if make_key is None:
+        return jsonify({"error": f"Unknown make: {make}"}), 404
+
+    return catalog_json(snapshot, lambda: {
+        "version": snapshot.version,
+        "make": make_key,
+        "models": [
+            {"key": key, "label": model.get("label", key)}
+            for key, model in snapshot.cars[make_key]["models"].items()
+        ],
+    })
+
+
+@app.route("/catalog/search")
+@login_required
+def catalog_search():
+    query = request.args.get("q", "").strip()
+    limit = min(max(request.args.get("limit", 10, type=int), 1), 50)
+    snapshot = catalog.get()
+    return jsonify({
+        "version": snapshot.version,
+        "query": query,
+        "results": snapshot.search_index.search(query, limit) if query else [],
+    })
 
 
 
@@ -138,261 +478,446 @@ def testquote007():
 def calculate():
     data = request.get_json()
 
-    tow_type = data.get("tow_type")
-    services = data.get("services", [])
-    is_accident = data.get("is_accident") == "yes"
     source = data.get("source")
     destination = data.get("destination")
-    # Extra service-specific inputs from frontend
-    window_film_entries = data.get("window_film", {})  # default to {} if missing
-    side_window = window_film_entries.get("side_window", 0)
-    front_or_back_window = window_film_entries.get("front_or_back_window", 0)
-    skid_steer_entries = data.get("skid_steer")
-    skid_steer_hours = skid_steer_entries.get("hours",0)
 
     if not source or not destination:
         return jsonify({"error": "Source and destination are required"}), 400
 
+    # One snapshot per request so a reload mid-quote can't mix catalog versions
+    with metrics.span("catalog"):
+        snapshot = catalog.get()
+    with metrics.span("quote_cache"):
+        cache_key = quote_cache.key(data, snapshot)
+        response = quote_cache.get(cache_key)
+    if response is not None:
+        response = restamp_quote(response, data)
+        log_quote(data, response, "calculate", snapshot, cache_hit=True, username=session.get("user"))
+        with metrics.span("serialize"):
+            body = json.dumps(response)
+        return Response(body, mimetype="application/json", headers={"X-Quote-Cache": "hit"})
+
     try:
-        distance_info = get_distance(source, destination)
-        g_miles_actual = distance_info["g_miles"]
-        g_miles = math.ceil(g_miles_actual)
-        distance_text = f"{g_miles} mi"
-        distance_text_actual = f"{g_miles_actual} mi"
-        # Overwrite with Google's resolved addresses
-        resolved_source = distance_info["resolved_origin"]
-        resolved_destination = distance_info["resolved_destination"]
+        with metrics.span("distance"):
+            distance_info = get_trip_distance(data, snapshot.yards, get_distance, get_distances)
+    except QuoteError as e:
+        return jsonify({"error": e.message}), e.status
+    except UpstreamUnavailable as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-    make = data.get("make")
-    model = data.get("model")
-    unsafe_location = data.get("unsafe_location")  # dict {road_type, lane}
-    weather = data.get("weather")
-
-    pricing = load_json("pricing.json")
-    dynamic_modifiers = load_json("dynamic_modifiers.json")
-    cars = load_json("make_model_modifiers.json")
-
-    if tow_type not in pricing:
-        return jsonify({"error": f"Invalid tow type: {tow_type}"}), 400
-
-    breakdowns = []
-    standard_total = 0   # before upcharges
-    todynamiq_total = 0  # after upcharges
-
-
-    for service in services:
-        if service not in pricing[tow_type]:
-            return jsonify({"error": f"Invalid service: {service}"}), 400
-
-        config = pricing[tow_type][service]
-        pricing_type = config.get("pricing_type", "flat")
-
-        # -------------------------
-        # 1. Apply addon/accident overrides
-        # -------------------------
-        base_rate = config.get("base_rate", 0)
-
-        # addon rules (override base_rate if condition is true)
-        for rule in config.get("rules", []):
-            if evaluate_condition(rule["condition"], services):
-                base_rate = rule["addon_rate"]
-                break
-
-        # accident override
-        if is_accident and "accident" in config:
-            base_rate = config["accident"].get("hook", base_rate)
-
-        # -------------------------
-        # 2. Build inputs for calculators
-        # -------------------------
-        bucket_miles = get_billable_miles(g_miles, dynamic_modifiers)
-        inputs = {"miles": bucket_miles}
-
-        # Window Film → capture both side and front/back counts
-        if service == "window_film":
-            inputs["side_window"] = side_window
-            inputs["front_or_back_window"] = front_or_back_window
-
-
-        # Skid Steer → capture hours (convert to minutes for time-based calc)
-        elif service.startswith("skid_steer"):
-            inputs["unit_type"] = "hours"
-            inputs["count"] = skid_steer_hours
-            inputs["duration_minutes"] = int(skid_steer_hours) * 60
-
-
-        # -------------------------
-        # 3. Dispatch to calculator (bucket miles calc)
-        # -------------------------
-        if pricing_type in PRICING_CALCULATORS:
-            service_cfg = dict(config)
-            service_cfg["base_rate"] = base_rate
-            calc_result = PRICING_CALCULATORS[pricing_type](service_cfg, inputs)
-            bucket_subtotal = calc_result["subtotal"]
-        else:
-            calc_result = {"subtotal": base_rate}
-            bucket_subtotal = base_rate
-
-        # -------------------------
-        # 3b. Calculate "standard" subtotal (rounded miles)
-        # -------------------------
-        if pricing_type == "flat":
-            actual_rounded = g_miles  # already ceil’d above
-            includes = config.get("includes", 0)
-            per_mile = config.get("mileage", 0)
-
-            rounded_miles_charged = max(0, actual_rounded - includes)
-            mileage_cost_rounded = rounded_miles_charged * per_mile
-            standard_subtotal = base_rate + mileage_cost_rounded
-        else:
-            standard_subtotal = bucket_subtotal
-
-
-        # -------------------------
-        # 4. Apply per-service modifiers
-        # -------------------------
-        service_upcharges = {}
-        combined_mod_pct = 0.0
-
-        for mod_name, enabled in config.get("modifiers", {}).items():
-            if not enabled:
-                continue
-
-            value = 0.0
-            if mod_name == "make_model" and make and model:
-                make_entry = cars.get(make)
-                if make_entry:
-                    model_entry = make_entry["models"].get(model)
-                    if model_entry:
-                        value = model_entry.get("upcharge_percentage", 0.0)
-
-            elif mod_name == "vehicle_location" and unsafe_location:
-                road_type = unsafe_location.get("road_type")
-                lane = unsafe_location.get("lane")
-                if road_type in dynamic_modifiers["vehicle_location"]:
-                    road_data = dynamic_modifiers["vehicle_location"][road_type]
-                    if lane in road_data["lanes"]:
-                        value = road_data["lanes"][lane].get("upcharge", 0.0)
-
-            elif mod_name == "weather" and weather:
-                if weather in dynamic_modifiers["weather"]:
-                    value = dynamic_modifiers["weather"][weather].get("upcharge", 0.0)
-
-            elif mod_name == "time_of_day":
-                now = datetime.now(timezone.utc).time()
-                local_time_str = data.get("local_time")
-                tz_offset = data.get("timezone_offset")
-                if local_time_str and tz_offset is not None:
-                    try:
-                        client_time = datetime.fromisoformat(local_time_str.replace("Z", "+00:00"))
-                        offset = timedelta(minutes=-int(tz_offset))
-                        now = (client_time + offset).time()
-                    except:
-                        pass
-
-                for slot, slot_data in dynamic_modifiers.get("time_of_day", {}).items():
-                    start = datetime.strptime(slot_data["start"], "%H:%M").time()
-                    end = datetime.strptime(slot_data["end"], "%H:%M").time()
-                    if start <= now <= end:
-                        value = slot_data.get("upcharge", 0.0)
-                        break
-
-            elif mod_name == "truck_utilization":
-                value = dynamic_modifiers.get("truck_utilization", {}).get("upcharge", 0.0)
-
-            # accumulate
-            service_upcharges[mod_name] = value
-            combined_mod_pct += value
-
-        # -------------------------
-        # Dynamic cap based on subtotal bands
-        # -------------------------
-        max_cap = get_max_upcharge_cap(standard_subtotal, dynamic_modifiers["subtotal_upcharge_bands"])
-        combined_mod_pct = min(combined_mod_pct, max_cap)
-
-        upcharge_amount = round(standard_subtotal * combined_mod_pct, 2)
-
-        # -------------------------
-        # 5. Final amounts
-        # -------------------------
-        mileage_upcharge = bucket_subtotal - standard_subtotal
-        service_total = round(standard_subtotal + mileage_upcharge + upcharge_amount, 2)
-
-        breakdowns.append({
-            "service": config["label"],
-            "pricing_type": pricing_type,
-            "standard_quote": round(standard_subtotal, 2),
-            "calc_details": calc_result,
-            "upcharges": service_upcharges,
-            "combined_upcharge_pct": round(combined_mod_pct, 3),
-            "upcharge_amount": upcharge_amount,
-            "mileage_upcharge": mileage_upcharge,
-            "todynamiq_quote": service_total
-        })
-
-        standard_total += standard_subtotal
-        todynamiq_total += service_total
-        overall_pct_chng = (todynamiq_total-standard_total)/standard_total * 100
-
-
-    # -------------------------
-    # Time of calculation (client local time if provided)
-    # -------------------------
-    local_time_str = data.get("local_time")
-    tz_offset = data.get("timezone_offset")
-
     try:
-        if local_time_str and tz_offset is not None:
-            client_time = datetime.fromisoformat(local_time_str.replace("Z", "+00:00"))
-            offset = timedelta(minutes=-int(tz_offset))  # JS offset is minutes *behind* UTC
-            local_time = client_time + offset
-            calculation_time = local_time.strftime("%Y-%m-%d %H:%M:%S")
+        with metrics.span("pricing"):
+            response = price_quote(data, distance_info, snapshot)
+    except QuoteError as e:
+        return jsonify({"error": e.message}), e.status
+
+    quote_cache.set(cache_key, response)
+    log_quote(data, response, "calculate", snapshot, username=session.get("user"))
+    with metrics.span("serialize"):
+        body = json.dumps(response)
+    return Response(body, mimetype="application/json", headers={"X-Quote-Cache": "miss"})
+
+
+@app.route("/calculate/batch", methods=["POST"])
+def calculate_batch():
+    """
+    Price many jobs in one request. Accepts {"quotes": [payload, ...]} (or a
+    bare list) where each payload is what /calculate takes. Distances for all
+    jobs are resolved together and each job gets its own result or error.
+    """
+    data = request.get_json()
+    payloads = data.get("quotes") if isinstance(data, dict) else data
+    if not isinstance(payloads, list) or not payloads:
+        return jsonify({"error": "Expected a non-empty list of quotes"}), 400
+    if len(payloads) > BATCH_MAX_QUOTES:
+        return jsonify({"error": f"Batch is limited to {BATCH_MAX_QUOTES} quotes"}), 400
+
+    snapshot = catalog.get()
+
+    # Cached quotes need no distance lookup; every other leg (deadhead included) is resolved in one go
+    cache_keys = {}
+    cached = {}
+    legs = {}
+    pairs = []
+    errors = {}
+    for index, payload in enumerate(payloads):
+        if not isinstance(payload, dict):
+            errors[index] = (400, "Quote must be an object")
+        elif not payload.get("source") or not payload.get("destination"):
+            errors[index] = (400, "Source and destination are required")
+        elif not isinstance(payload["source"], str) or not isinstance(payload["destination"], str):
+            errors[index] = (400, "Source and destination must be addresses")
         else:
-            calculation_time = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-    except Exception as e:
-        print("⚠️ Failed to set calculation_time:", local_time_str, tz_offset, e)
-        calculation_time = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+            try:
+                cache_keys[index] = quote_cache.key(payload, snapshot)
+                response = quote_cache.get(cache_keys[index])
+                if response is not None:
+                    cached[index] = restamp_quote(response, payload)
+                    continue
+                legs[index] = trip_legs(payload, snapshot.yards)
+                pairs.extend(legs[index][1])
+            except QuoteError as e:
+                errors[index] = (e.status, e.message)
+            except Exception as e:
+                # One malformed job must not fail the batch for every other job
+                errors[index] = (500, f"{type(e).__name__}: {e}")
+    with metrics.span("distance_batch"):
+        distances = resolve_job_legs(legs, get_distances)
+
+    results = []
+    for index, payload in enumerate(payloads):
+        result = {"index": index}
+        if index in errors:
+            result.update(ok=False, status=errors[index][0], error=errors[index][1])
+        elif index in cached:
+            result.update(ok=True, quote=log_quote(payload, cached[index], "batch", snapshot, True, session.get("user")))
+        else:
+            try:
+                distance_info = combine_legs(payload, legs[index][0], distances)
+            except Exception as e:
+                distance_info = e
+            if isinstance(distance_info, Exception):
+                status = 503 if isinstance(distance_info, UpstreamUnavailable) else 500
+                result.update(ok=False, status=status, error=str(distance_info))
+            else:
+                try:
+                    quote = price_quote(payload, distance_info, snapshot)
+                    quote_cache.set(cache_keys[index], quote)
+                    result.update(ok=True, quote=log_quote(payload, quote, "batch", snapshot, username=session.get("user")))
+                except QuoteError as e:
+                    result.update(ok=False, status=e.status, error=e.message)
+                except Exception as e:
+                    result.update(ok=False, status=500, error=f"{type(e).__name__}: {e}")
+        if not result["ok"]:
+            metrics.count_error("calculate_batch_item", result["status"])
+        results.append(result)
 
-    # -------------------------
-    # ✅ RESPONSE
-    # -------------------------
     response = OrderedDict()
-    # User input
-    response["source"] = source
-    response["destination"] = destination
-    # Google resolved addresses
-    response["source_resolved"] = resolved_source
-    response["destination_resolved"] = resolved_destination
+    response["count"] = len(results)
+    response["errors"] = sum(1 for r in results if not r["ok"])
+    response["cache_hits"] = len(cached)
+    response["distance_lookups"] = len(set(pairs))
+    response["results"] = results
+    return Response(json.dumps(response), mimetype="application/json")
+
 
-    # Distance
-    response["distance_miles"] = g_miles          # Rounded miles
-    response["bucket_miles"] = bucket_miles       # True billable miles
-    response["distance_text"] = distance_text
+@app.route("/calculate/bulk", methods=["POST"])
+@login_required
+def calculate_bulk():
+    """
+    Stream a CSV or JSONL job file (request body) through pricing and stream
+    the priced rows back. Input format from the Content-Type (text/csv or
+    application/x-ndjson) or ?input=; output format from ?format= (default: same).
+    """
+    content_type = request.mimetype or ""
+    input_format = request.args.get("input") or ("csv" if "csv" in content_type else "jsonl")
+    output_format = request.args.get("format") or input_format
+    if input_format not in FORMATS or output_format not in FORMATS:
+        return jsonify({"error": f"Formats must be one of {', '.join(FORMATS)}"}), 400
+
+    lines = io.TextIOWrapper(request.stream, encoding="utf-8-sig", newline="")
+    username = session.get("user")
+    jobs = {}   # index -> payload, only for the chunks in flight
+
+    def remembered(payloads):
+        for index, payload in enumerate(payloads):
+            jobs[index] = payload
+            yield payload
+
+    def logged(items):
+        for item in items:
+            job = jobs.pop(item["index"])
+            if item["ok"]:
+                log_quote(job, item["quote"], "bulk", catalog.get(), username=username)
+            yield item
+
+    items = logged(price_jobs(remembered(read_jobs(lines, input_format)), catalog, workers=BULK_WORKERS))
+    mimetype = "text/csv" if output_format == "csv" else "application/x-ndjson"
+    return Response(stream_with_context(format_results(items, output_format)), mimetype=mimetype)
 
-    # Tow info
-    response["tow_type"] = tow_type
-    response["services"] = breakdowns
-    response["calculation_time"] = calculation_time
-    response["distance_text_actual"] = distance_text_actual
-    
 
-    # Pricing
-    response["standard_quote"] = round(standard_total, 2)   # 👈 before modifiers
-    response["overall_pct_chng"] = round(overall_pct_chng, 2)   # 👈 before modifiers
-    response["todynamiq_quote"] = round(todynamiq_total, 2) # 👈 after modifiers
+# -------------------------
+# 📈 Prometheus metrics
+# -------------------------
+@app.route("/metrics")
+def metrics_endpoint():
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        return jsonify({"error": "Unauthorized"}), 401
+    body, content_type = metrics.render()
+    return Response(body, content_type=content_type)
 
+# -------------------------
+# 🚚 Live fleet state (truck_utilization surge, see helper/fleet.py)
+# -------------------------
+def fleet_status(snapshot):
+    status = []
+    for tow_type, reading in sorted(fleet.snapshot().items()):
+        fresh = fleet.get(tow_type) is not None
+        band, upcharge = snapshot.utilization_bands.lookup(reading.utilization()) if fresh else (None, 0.0)
+        status.append({
+            "tow_type": tow_type,
+            "total": reading.total,
+            "available": reading.available,
+            "utilization_pct": round(reading.utilization(), 1),
+            "band": band,
+            "upcharge": upcharge,
+            "fresh": fresh,
+            "source": reading.source,
+            "updated_at": datetime.fromtimestamp(reading.updated_at, timezone.utc).isoformat(),
+        })
+    return status
+
+
+@app.route("/fleet/status", methods=["GET", "POST"])
+def fleet_status_endpoint():
+    token_ok = FLEET_TOKEN and request.headers.get("Authorization") == f"Bearer {FLEET_TOKEN}"
+    if not token_ok and not ("user" in session and is_admin()):
+        return jsonify({"error": "Unauthorized"}), 401
+    snapshot = catalog.get()
+    if request.method == "GET":
+        return jsonify({"fleet": fleet_status(snapshot)})
+
+    # {"tow_type", "total", "available"[, "updated_at"]} or {"fleet": [...]}
+    data = request.get_json(silent=True)
+    entries = data.get("fleet") if isinstance(data, dict) and "fleet" in data else [data]
+    if not isinstance(entries, list) or not entries:
+        return jsonify({"error": "Expected a reading or {\"fleet\": [readings]}"}), 400
+    readings = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            return jsonify({"error": "Each reading must be an object"}), 400
+        if not isinstance(entry.get("tow_type"), str) or entry["tow_type"] not in snapshot.plans:
+            return jsonify({"error": f"Invalid tow type: {entry.get('tow_type')}"}), 400
+        try:
+            readings.append(validate_reading(entry["tow_type"], entry.get("total"), entry.get("available"),
+                                             entry.get("updated_at")))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    fleet.update(readings)
+    return jsonify({"fleet": fleet_status(snapshot)})
 
-    # Breakdown string
-    response["breakdown"] = format_breakdown(response)
 
-    response["window_film"] = window_film_entries
-    response["skid_steer"] = skid_steer_entries
 
+# -------------------------
+# 🔬 Recent request profiles (admins only)
+# -------------------------
+@app.route("/admin/profiles")
+@admin_required
+def admin_profiles():
+    limit = min(max(request.args.get("limit", 50, type=int), 1), 500)
+    return jsonify({
+        "enabled": profiler.enabled,
+        "mode": profiler.mode,
+        "sample_rate": profiler.sample_rate,
+        "profiles": profiler.list_files(limit),
+    })
+
+
+@app.route("/admin/profiles/<name>")
+@admin_required
+def admin_profile_file(name):
+    path = profiler.path_for(name)
+    if path is None:
+        return jsonify({"error": f"Unknown profile: {name}"}), 404
+    return send_file(os.path.abspath(path), as_attachment=True, download_name=name)
 
 
-    return Response(json.dumps(response), mimetype="application/json")
+# -------------------------
+# 🧾 Quote log queries (admins only)
+# -------------------------
+def quote_log_filters(args):
+    """WHERE clauses for the quote log from ?start=&end=&tow_type=&user=&service= (ISO times, UTC)."""
+    filters = []
+    for name, op in (("start", "__ge__"), ("end", "__lt__")):
+        if args.get(name):
+            try:
+                moment = datetime.fromisoformat(args[name].replace("Z", "+00:00"))
+            except ValueError:
+                raise QuoteError(f"Invalid {name}: {args[name]}")
+            if moment.tzinfo is not None:
+                moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+            filters.append(getattr(QuoteLog.created_at, op)(moment))
+    if args.get("tow_type"):
+        filters.append(QuoteLog.tow_type == args["tow_type"])
+    if args.get("user"):
+        filters.append(QuoteLog.username == args["user"])
+    if args.get("service"):
+        filters.append(QuoteLog.id.in_(
+            db.select(QuoteLogService.quote_id).where(QuoteLogService.service == args["service"])
+        ))
+    return filters
+
+
+@app.route("/admin/quotes")
+@admin_required
+def admin_quotes():
+    try:
+        filters = quote_log_filters(request.args)
+    except QuoteError as e:
+        return jsonify({"error": e.message}), e.status
+    page = max(request.args.get("page", 1, type=int), 1)
+    per_page = min(max(request.args.get("per_page", 50, type=int), 1), 500)
+
+    ensure_quote_log_tables()
+    # One row past the page tells us whether there is a next one (no COUNT over the whole log)
+    rows = db.session.execute(
+        db.select(QuoteLog).where(*filters)
+        .order_by(QuoteLog.created_at.desc(), QuoteLog.id)
+        .offset((page - 1) * per_page).limit(per_page + 1)
+    ).scalars().all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    services = {}
+    if rows:
+        for line in db.session.execute(
+            db.select(QuoteLogService).where(QuoteLogService.quote_id.in_([row.id for row in rows]))
+        ).scalars():
+            services.setdefault(line.quote_id, []).append({
+                "service": line.service,
+                "pricing_type": line.pricing_type,
+                "standard_quote": line.standard_quote,
+                "todynamiq_quote": line.todynamiq_quote,
+                "combined_upcharge_pct": line.combined_upcharge_pct,
+                "upcharge_amount": line.upcharge_amount,
+            })
+
+    quotes = [{
+        "quote_id": row.id,
+        "created_at": row.created_at.isoformat(),
+        "endpoint": row.endpoint,
+        "user": row.username,
+        "tow_type": row.tow_type,
+        "source": row.source,
+        "destination": row.destination,
+        "distance_miles": row.distance_miles,
+        "bucket_miles": row.bucket_miles,
+        "distance_provider": row.distance_provider,
+        "standard_quote": row.standard_quote,
+        "todynamiq_quote": row.todynamiq_quote,
+        "overall_pct_chng": row.overall_pct_chng,
+        "catalog_version": row.catalog_version,
+        "cache_hit": row.cache_hit,
+        "services": services.get(row.id, []),
+    } for row in rows]
+    return jsonify({"page": page, "per_page": per_page, "has_more": has_more, "quotes": quotes})
+
+
+@app.route("/admin/quotes/stats")
+@admin_required
+def admin_quote_stats():
+    args = request.args.to_dict()
+    if not args.get("start"):
+        args["start"] = (datetime.utcnow() - timedelta(days=1)).isoformat()
+    try:
+        filters = quote_log_filters(args)
+    except QuoteError as e:
+        return jsonify({"error": e.message}), e.status
+
+    ensure_quote_log_tables()
+    hourly = db.session.execute(
+        db.select(
+            QuoteLog.hour,
+            db.func.count(),
+            db.func.sum(QuoteLog.todynamiq_quote),
+            db.func.avg(QuoteLog.todynamiq_quote),
+            db.func.avg(QuoteLog.overall_pct_chng),
+        ).where(*filters).group_by(QuoteLog.hour).order_by(QuoteLog.hour)
+    ).all()
+
+    # Joined to the parent quote so the same time/tow_type/user/service filters apply
+    modifier_filters = [QuoteLogModifier.quote_id == QuoteLog.id, *filters]
+    modifiers = db.session.execute(
+        db.select(
+            QuoteLogModifier.modifier,
+            db.func.count(),
+            db.func.avg(QuoteLogModifier.upcharge),
+            db.func.sum(db.case((QuoteLogModifier.upcharge > 0, 1), else_=0)),
+        ).where(*modifier_filters).group_by(QuoteLogModifier.modifier).order_by(QuoteLogModifier.modifier)
+    ).all()
+
+    return jsonify({
+        "quote_log": quote_log.stats(),
+        "total_quotes": sum(count for _, count, *_ in hourly),
+        "total_revenue": round(sum(revenue or 0 for _, _, revenue, *_ in hourly), 2),
+        "hourly": [{
+            "hour": hour.isoformat(),
+            "quotes": count,
+            "revenue": round(revenue or 0, 2),
+            "avg_quote": round(avg_quote or 0, 2),
+            "avg_pct_chng": round(avg_pct or 0, 2),
+        } for hour, count, revenue, avg_quote, avg_pct in hourly],
+        "modifiers": [{
+            "modifier": name,
+            "services_priced": count,
+            "applied": int(applied or 0),
+            "avg_upcharge": round(avg or 0, 4),
+        } for name, count, avg, applied in modifiers],
+    })
+
+
+@app.route("/admin/quotes/rollups")
+@admin_required
+def admin_quote_rollups():
+    """Dashboard series from quote_rollups only: ?period=hour|day&start=&end=&group_by=<dims>&<dim>=<value>."""
+    period = request.args.get("period", "hour")
+    if period not in PERIODS:
+        return jsonify({"error": f"Invalid period: {period}"}), 400
+    group_by = [name for name in request.args.get("group_by", "tow_type").split(",") if name]
+    unknown = [name for name in group_by if name not in DIMENSIONS]
+    if unknown:
+        return jsonify({"error": f"Invalid group_by: {', '.join(unknown)}"}), 400
+
+    default_start = datetime.utcnow() - (timedelta(days=2) if period == "hour" else timedelta(days=30))
+    filters = [QuoteRollup.period == period]
+    for name, op, default in (("start", "__ge__", default_start), ("end", "__lt__", None)):
+        moment = default
+        if request.args.get(name):
+            try:
+                moment = datetime.fromisoformat(request.args[name].replace("Z", "+00:00"))
+            except ValueError:
+                return jsonify({"error": f"Invalid {name}: {request.args[name]}"}), 400
+            if moment.tzinfo is not None:
+                moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+        if moment is not None:
+            filters.append(getattr(QuoteRollup.bucket, op)(moment))
+    for name in DIMENSIONS:
+        if request.args.get(name):
+            filters.append(getattr(QuoteRollup, name) == request.args[name])
+
+    columns = [getattr(QuoteRollup, name) for name in group_by]
+    ensure_quote_log_tables()
+    rows = db.session.execute(
+        db.select(
+            QuoteRollup.bucket, *columns,
+            db.func.sum(QuoteRollup.lines),
+            db.func.sum(QuoteRollup.standard_sum),
+            db.func.sum(QuoteRollup.todynamiq_sum),
+            db.func.sum(QuoteRollup.upcharge_pct_sum),
+        ).where(*filters).group_by(QuoteRollup.bucket, *columns).order_by(QuoteRollup.bucket, *columns)
+    ).all()
+    state = db.session.get(RollupState, "quote_rollups")
+
+    series = []
+    for row in rows:
+        lines, standard_sum, todynamiq_sum, upcharge_pct_sum = row[-4:]
+        entry = {"bucket": row[0].isoformat(), **dict(zip(group_by, row[1:1 + len(group_by)]))}
+        entry.update(
+            lines=lines,
+            standard_quote=round(standard_sum, 2),
+            todynamiq_quote=round(todynamiq_sum, 2),
+            avg_upcharge_pct=round(upcharge_pct_sum / lines, 4) if lines else 0.0,
+        )
+        series.append(entry)
+    return jsonify({
+        "period": period,
+        "group_by": group_by,
+        "high_water": state.high_water if state else 0,
+        "updated_at": state.updated_at.isoformat() if state and state.updated_at else None,
+        "series": series,
+    })
 
 
 if __name__ == "__main__":
@@ -0,0 +1,155 @@
+import json, time, asyncio
+from http.cookies import SimpleCookie
+from asgiref.wsgi import WsgiToAsgi
+from app import app, catalog, quote_cache, log_quote
+from helper.async_distance import get_distance_async, close_async_client
+from helper.deadhead import trip_legs, resolve_legs, combine_legs
+from helper.distance_client import UpstreamUnavailable
+from helper.quote import price_quote, restamp_quote, QuoteError
+from helper import metrics
+
+# -------------------------
+# ASGI entry point
+# -------------------------
+# POST /calculate is served natively on the event loop. It awaits the
+# Distance Matrix call on a shared async client, then runs the (fast,
+# CPU-bound) pricing synchronously. Every other route is handed to the
+# Flask app unchanged.
+#
+#   gunicorn -k uvicorn.workers.UvicornWorker asgi:application
+#
+
+MAX_BODY_BYTES = 1024 * 1024
+
+flask_app = WsgiToAsgi(app)
+
+
+async def send_json(send, status, payload, headers=()):
+    with metrics.span("serialize"):
+        body = json.dumps(payload).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), *headers],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def read_body(receive):
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            raise ValueError("Request body too large")
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+def session_user(scope):
+    """The logged-in user from Flask's signed session cookie (there is no Flask request here), or None."""
+    header = next((value for name, value in scope["headers"] if name == b"cookie"), None)
+    if header is None:
+        return None
+    morsel = SimpleCookie(header.decode("latin-1")).get(app.config["SESSION_COOKIE_NAME"])
+    serializer = app.session_interface.get_signing_serializer(app)
+    if morsel is None or serializer is None:
+        return None
+    try:
+        return serializer.loads(morsel.value, max_age=int(app.permanent_session_lifetime.total_seconds())).get("user")
+    except Exception:   # tampered, expired or foreign cookie: log the quote without a user
+        return None
+
+
+async def calculate(scope, receive, send):
+    try:
+        body = await read_body(receive)
+        if body is None:
+            return
+        data = json.loads(body)
+        if not isinstance(data, dict):
+            raise ValueError("Expected a JSON object")
+    except ValueError as e:
+        return await send_json(send, 400, {"error": f"Invalid request body: {e}"})
+
+    source = data.get("source")
+    destination = data.get("destination")
+
+    if not source or not destination:
+        return await send_json(send, 400, {"error": "Source and destination are required"})
+
+    with metrics.span("catalog"):
+        snapshot = catalog.get()
+    with metrics.span("quote_cache"):
+        cache_key = quote_cache.key(data, snapshot)
+        response = quote_cache.get(cache_key)
+    if response is not None:
+        response = log_quote(data, restamp_quote(response, data), "calculate", snapshot, cache_hit=True,
+                              username=session_user(scope))
+        return await send_json(send, 200, response, [(b"x-quote-cache", b"hit")])
+
+    try:
+        with metrics.span("distance"):
+            starts, pairs = trip_legs(data, snapshot.yards)
+            if starts:
+                # Yard mileage: all legs go out as one multi-origin request, off the event loop
+                distance_info = combine_legs(data, starts, await asyncio.to_thread(resolve_legs, pairs))
+            else:
+                distance_info = await get_distance_async(source, destination)
+    except QuoteError as e:
+        return await send_json(send, e.status, {"error": e.message})
+    except UpstreamUnavailable as e:
+        return await send_json(send, 503, {"error": str(e)})
+    except Exception as e:
+        return await send_json(send, 500, {"error": str(e)})
+
+    try:
+        with metrics.span("pricing"):
+            response = price_quote(data, distance_info, snapshot)
+    except QuoteError as e:
+        return await send_json(send, e.status, {"error": e.message})
+
+    quote_cache.set(cache_key, response)
+    log_quote(data, response, "calculate", snapshot, username=session_user(scope))
+    await send_json(send, 200, response, [(b"x-quote-cache", b"miss")])
+
+
+async def timed(endpoint, handler, scope, receive, send):
+    """Run a native handler and record its latency and status like the Flask routes."""
+    started = time.perf_counter()
+    status = 500
+
+    async def send_and_capture(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        await send(message)
+
+    try:
+        await handler(scope, receive, send_and_capture)
+    finally:
+        metrics.observe_request(endpoint, status, time.perf_counter() - started)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await close_async_client()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    if scope["type"] == "http" and scope["path"] == "/calculate" and scope["method"] == "POST":
+        return await timed("calculate", calculate, scope, receive, send)
+    await flask_app(scope, receive, send)
@@ -0,0 +1,252 @@
+import os, sys, json, time, platform, argparse, subprocess, tracemalloc, statistics
+
+# ------------------- Quote Benchmarks -------------------
+#
+# Reproducible timings for the /calculate hot path and the pricing helpers.
+# Scenarios are drawn (with a fixed seed) from the real data/*.json files and
+# get_distance is stubbed with a deterministic fake, so no network and no API
+# key are needed and two runs price exactly the same jobs.
+#
+#   python -m benchmarks.bench_quote run --out bench.json
+#   python -m benchmarks.bench_quote run --out new.json --baseline bench.json
+#   python -m benchmarks.bench_quote compare bench.json new.json
+#
+# Each benchmark reports p50/p95/p99/mean per call in microseconds, plus
+# allocations from a separate tracemalloc pass (peak KiB per sample batch and
+# bytes still held afterwards per call).
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("GOOGLE_MAPS_API_KEY", "benchmark")
+
+from helper.scenarios import fake_distance, fake_distances, build_scenarios
+
+
+# ------------------- Measurement -------------------
+
+def measure(fn, args_list, samples, inner):
+    """
+    Time `fn(*args)` over `samples` batches of `inner` calls (cycling through
+    args_list). Returns per-call stats in microseconds plus allocations.
+    """
+    calls = len(args_list)
+    for k in range(min(calls, 50)):   # warm up caches and code paths
+        fn(*args_list[k])
+
+    per_call = []
+    k = 0
+    for _ in range(samples):
+        batch = [args_list[(k + j) % calls] for j in range(inner)]
+        k += inner
+        started = time.perf_counter_ns()
+        for args in batch:
+            fn(*args)
+        per_call.append((time.perf_counter_ns() - started) / inner / 1000.0)
+
+    # allocations in a separate pass so tracing does not skew the timings
+    batch = [args_list[j % calls] for j in range(inner)]
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    for args in batch:
+        fn(*args)
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    per_call.sort()
+    def pct(p):
+        return round(per_call[min(len(per_call) - 1, int(p / 100 * len(per_call)))], 3)
+    return {
+        "samples": samples,
+        "inner": inner,
+        "p50_us": pct(50),
+        "p95_us": pct(95),
+        "p99_us": pct(99),
+        "mean_us": round(statistics.fmean(per_call), 3),
+        "alloc_peak_kib": round((peak - before) / 1024, 2),
+        "alloc_retained_bytes_per_call": round(max(0, after - before) / inner, 1),
+    }
+
+
+# ------------------- Benchmarks -------------------
+
+def benchmarks(scenarios, snapshot):
+    """{name: (fn, args_list, inner)}"""
+    import app as app_module
+    from helper.functions import (
+        get_billable_miles, evaluate_condition, PRICING_CALCULATORS,
+        get_max_upcharge_cap, format_breakdown,
+    )
+    from helper.pricing_plan import build_quote_context
+    from helper.quote import price_quote
+    from helper.time_slots import client_local_time
+
+    app_module.get_distance = fake_distance
+    app_module.get_distances = fake_distances
+    client = app_module.app.test_client()
+    quote_cache = app_module.quote_cache
+    dm = snapshot.dynamic_modifiers
+
+    def post_calculate(payload):
+        response = client.post("/calculate", json=payload)
+        assert response.status_code == 200, response.get_data(as_text=True)
+
+    def post_calculate_uncached(payload):
+        quote_cache.clear()
+        post_calculate(payload)
+
+    miles = [(m,) for m in range(0, 400)]
+    distances = [fake_distance(p["source"], p["destination"]) for p in scenarios]
+    quotes = [price_quote(p, d, snapshot) for p, d in zip(scenarios, distances)]
+
+    conditions = []
+    for tow_type, services in snapshot.pricing.items():
+        for service in services.values():
+            for rule in service.get("rules", []):
+                for p in scenarios:
+                    if p["tow_type"] == tow_type:
+                        conditions.append((rule["condition"], p["services"]))
+    conditions = conditions or [({"type": "SINGLE", "triggers": ["tow"]}, ["tow"])]
+
+    calc_args = {}
+    for services in snapshot.pricing.values():
+        for config in services.values():
+            pricing_type = config.get("pricing_type", "flat")
+            calc_args.setdefault(pricing_type, [])
+            for m in range(0, 400, 7):
+                calc_args[pricing_type].append((config, {
+                    "miles": m, "side_window": m % 4, "front_or_back_window": m % 3,
+                    "duration_minutes": (m % 5) * 60,
+                }))
+
+    bands = dm["subtotal_upcharge_bands"]
+    subtotals = [(s * 3.7,) for s in range(0, 3000)]
+
+    suite = {
+        "calculate.endpoint": (post_calculate_uncached, [(p,) for p in scenarios], 1),
+        # the 50 warm-up calls fill the cache, so every timed call is a hit
+        "calculate.endpoint_cached": (post_calculate, [(p,) for p in scenarios[:50]], 1),
+        "quote.price_quote": (price_quote, list(zip(scenarios, distances, [snapshot] * len(scenarios))), 10),
+        "quote.build_context": (
+            build_quote_context,
+            [(p, snapshot, 42) for p in scenarios], 50),
+        "helpers.get_billable_miles": (lambda m: get_billable_miles(m, dm), miles, 200),
+        "helpers.billable_miles_table": (snapshot.billable_miles.lookup, miles, 200),
+        "helpers.evaluate_condition": (evaluate_condition, conditions, 200),
+        "helpers.get_max_upcharge_cap": (lambda s: get_max_upcharge_cap(s, bands), subtotals, 200),
+        "helpers.upcharge_bands": (snapshot.upcharge_bands.lookup, subtotals, 200),
+        "helpers.time_slot_lookup": (
+            snapshot.time_slots.lookup,
+            [(client_local_time(p),) for p in scenarios],
+            200),
+        "helpers.format_breakdown": (format_breakdown, [(q,) for q in quotes], 20),
+    }
+    for pricing_type, args_list in calc_args.items():
+        suite[f"calculators.{pricing_type}"] = (PRICING_CALCULATORS[pricing_type], args_list, 200)
+    return suite
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(args):
+    os.chdir(ROOT)
+    from app import catalog
+
+    snapshot = catalog.get()
+    scenarios = build_scenarios(snapshot, args.scenarios, args.seed)
+    suite = benchmarks(scenarios, snapshot)
+
+    results = {}
+    for name, (fn, args_list, inner) in suite.items():
+        if args.only and not any(part in name for part in args.only):
+            continue
+        results[name] = measure(fn, args_list, args.samples, inner)
+        r = results[name]
+        print(f"{name:<34} p50 {r['p50_us']:>10.2f}µs  p95 {r['p95_us']:>10.2f}µs  "
+              f"p99 {r['p99_us']:>10.2f}µs  peak {r['alloc_peak_kib']:>8.1f}KiB")
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "catalog_version": snapshot.version,
+            "scenarios": args.scenarios,
+            "seed": args.seed,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "benchmarks": results,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Benchmark results saved to {os.path.abspath(args.out)}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            return compare_reports(json.load(f), report, args.threshold)
+    return 0
+
+
+# ------------------- Compare -------------------
+
+def compare_reports(baseline, current, threshold):
+    """Print p50/p95 ratios per benchmark; returns 1 if any got slower by more than `threshold`."""
+    regressions = []
+    print(f"\n{'benchmark':<34} {'p50 base':>10} {'p50 now':>10} {'ratio':>7}   {'p95 ratio':>9}")
+    for name, now in current["benchmarks"].items():
+        base = baseline["benchmarks"].get(name)
+        if base is None:
+            print(f"{name:<34} {'-':>10} {now['p50_us']:>10.2f}     new")
+            continue
+        p50 = now["p50_us"] / base["p50_us"] if base["p50_us"] else 1.0
+        p95 = now["p95_us"] / base["p95_us"] if base["p95_us"] else 1.0
+        flag = ""
+        if p50 > 1 + threshold or p95 > 1 + threshold * 2:
+            flag = "  ❌ regression"
+            regressions.append(name)
+        elif p50 < 1 - threshold:
+            flag = "  ✅ faster"
+        print(f"{name:<34} {base['p50_us']:>10.2f} {now['p50_us']:>10.2f} {p50:>6.2f}x   {p95:>8.2f}x{flag}")
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) over {threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    print(f"\n✅ No regressions over {threshold:.0%}")
+    return 0
+
+
+def compare(args):
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+    return compare_reports(baseline, current, args.threshold)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the /calculate hot path and pricing helpers.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("--out", help="write results to this JSON file")
+    run_parser.add_argument("--baseline", help="compare against this earlier results file")
+    run_parser.add_argument("--scenarios", type=int, default=500)
+    run_parser.add_argument("--samples", type=int, default=300)
+    run_parser.add_argument("--seed", type=int, default=1234)
+    run_parser.add_argument("--threshold", type=float, default=0.15, help="allowed p50 slowdown (0.15 = 15%%)")
+    run_parser.add_argument("--only", nargs="*", help="only benchmarks whose name contains one of these")
+
+    compare_parser = sub.add_parser("compare", help="compare two results files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.15)
+
+    args = parser.parse_args()
+    sys.exit(run(args) if args.command == "run" else compare(args))
@@ -0,0 +1,9 @@
+import os
+
+# Prometheus multiprocess mode (see helper/metrics.py): drop the samples of
+# workers that exited so /metrics only aggregates live ones.
+if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    from prometheus_client import multiprocess
+
+    def child_exit(server, worker):
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,153 @@
+import os, time, random, asyncio
+import httpx
+from helper.distance_client import RETRYABLE_HTTP, RETRYABLE_API, UpstreamUnavailable
+from helper import metrics
+from helper.functions import (
+    API_KEY, DISTANCE_PROVIDERS, DISTANCE_FUNCTIONS, FALLBACK_ERRORS,
+    distance_client, distance_cache, parse_matrix_element, pick_fallback_error,
+)
+
+# ------------------- Async Distance Matrix -------------------
+#
+# asyncio twin of DistanceMatrixClient for the ASGI entry point (asgi.py).
+# A quote waiting on Google only holds a coroutine, not a worker thread.
+# The base URL, timeouts, retry budget, circuit breaker and distance cache
+# are all shared with the sync client, so both paths behave the same.
+
+
+class AsyncDistanceMatrixClient:
+    def __init__(self, api_key, base_url, connect_timeout, read_timeout, max_retries,
+                 backoff, max_backoff, breaker, max_connections=100):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = breaker
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+    async def matrix(self, origins, destinations):
+        self.breaker.before_call()
+
+        params = {
+            "origins": "|".join(origins),
+            "destinations": "|".join(destinations),
+            "key": self.api_key,
+            "units": "imperial",
+        }
+
+        last_error = None
+        try:
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    ceiling = min(self.max_backoff, self.backoff * (2 ** (attempt - 1)))
+                    await asyncio.sleep(random.uniform(0, ceiling))
+                started = time.perf_counter()
+                try:
+                    response = await self.client.get(self.base_url, params=params)
+                except httpx.RequestError as e:
+                    metrics.observe_upstream("async", type(e).__name__, time.perf_counter() - started)
+                    last_error = f"{type(e).__name__}: {e}"
+                    continue
+                metrics.observe_upstream("async", str(response.status_code), time.perf_counter() - started)
+
+                if response.status_code in RETRYABLE_HTTP:
+                    last_error = f"HTTP {response.status_code}"
+                    continue
+
+                try:
+                    data = response.json()
+                except ValueError:
+                    last_error = f"HTTP {response.status_code}: invalid JSON"
+                    continue
+
+                if data.get("status") in RETRYABLE_API:
+                    last_error = f"API status {data['status']}"
+                    continue
+
+                self.breaker.record_success()
+                return data
+        except asyncio.CancelledError:
+            # The client went away; that says nothing about the upstream
+            self.breaker.release_trial()
+            raise
+        except Exception:
+            # Anything unexpected still counts, or a half-open trial would never settle
+            self.breaker.record_failure()
+            raise
+
+        self.breaker.record_failure()
+        raise UpstreamUnavailable(
+            f"Distance service unavailable after {self.max_retries + 1} attempts ({last_error})"
+        )
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_async_client = None
+
+def get_async_client() -> AsyncDistanceMatrixClient:
+    """The process-wide async client (created on first use, inside the running loop)."""
+    global _async_client
+    if _async_client is None:
+        connect_timeout, read_timeout = distance_client.timeout
+        _async_client = AsyncDistanceMatrixClient(
+            API_KEY,
+            base_url=distance_client.base_url,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            max_retries=distance_client.max_retries,
+            backoff=distance_client.backoff,
+            max_backoff=distance_client.max_backoff,
+            breaker=distance_client.breaker,
+            max_connections=int(os.environ.get("ASYNC_DISTANCE_MAX_CONNECTIONS", 100)),
+        )
+    return _async_client
+
+async def close_async_client():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+async def google_distance_async(origin, destination):
+    # The in-memory tier is checked on the loop; the SQLite tier (DISTANCE_CACHE_DB)
+    # does disk I/O and can wait on WAL locks, so it runs in a thread.
+    cached = distance_cache.get_memory(origin, destination)
+    if cached is None:
+        if distance_cache.db_path:
+            cached = await asyncio.to_thread(distance_cache.get_persistent, origin, destination)
+        else:
+            cached = distance_cache.get_persistent(origin, destination)   # just counts the miss
+    if cached is not None:
+        cached["provider"] = "cache"
+        return cached
+
+    data = await get_async_client().matrix([origin], [destination])
+    if data["status"] != "OK":
+        raise Exception(f"Error from API: {data}")
+    result = parse_matrix_element(data, 0, 0)
+    if distance_cache.db_path:
+        await asyncio.to_thread(distance_cache.set, origin, destination, result)
+    else:
+        distance_cache.set(origin, destination, result)
+    result["provider"] = "google"
+    return result
+
+
+async def get_distance_async(origin, destination):
+    """Async get_distance: same providers, same cache, same response shape."""
+    error = None
+    for provider in DISTANCE_PROVIDERS:
+        try:
+            if provider == "google":
+                return await google_distance_async(origin, destination)
+            return DISTANCE_FUNCTIONS[provider](origin, destination)
+        except FALLBACK_ERRORS as e:
+            error = pick_fallback_error(error, e)
+    raise error
@@ -0,0 +1,276 @@
+import os, csv, json, itertools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from helper.catalog import PricingCatalog
+from helper.deadhead import trip_legs, resolve_job_legs, combine_legs
+from helper.distance_client import UpstreamUnavailable
+from helper.functions import get_distances
+from helper.quote import price_quote, QuoteError
+
+# ------------------- Bulk Quotes -------------------
+#
+# Streams a CSV or JSONL file of jobs through the /calculate pipeline and
+# writes priced rows back out, in bounded memory whatever the file size:
+#   read jobs lazily -> chunks of `chunk_size` -> one deduplicated distance
+#   lookup per chunk (get_distances: cache + packed Distance Matrix requests)
+#   -> pricing on a process pool -> results written in input order.
+# At most `workers * 2` chunks are in flight, so the reader never runs ahead
+# of the pool, and distances for the next chunk are fetched while the pool
+# prices the current ones.
+#
+#   python -m helper.bulk jobs.csv priced.csv --workers 8
+#   python -m helper.bulk jobs.jsonl priced.jsonl
+#
+# JSONL: one /calculate payload per line (an optional "job_id" is echoed).
+# CSV: one job per row with the columns in JOB_INPUT_COLUMNS; `services` is
+# separated by ";", unsafe location is road_type + lane.
+
+JOB_INPUT_COLUMNS = [
+    "job_id", "source", "destination", "tow_type", "services", "is_accident", "make", "model",
+    "weather", "road_type", "lane", "local_time", "timezone_offset", "window_film_side",
+    "window_film_front_back", "skid_steer_hours", "mileage_from", "driver_start", "repeat_customer",
+]
+# CSV output: one row per priced service, job totals repeated on each row
+JOB_OUTPUT_COLUMNS = [
+    "job_id", "ok", "status", "error", "quote_id", "source", "destination", "source_resolved", "destination_resolved",
+    "distance_miles", "bucket_miles", "distance_provider", "mileage_from", "start_point", "deadhead_miles",
+    "tow_type", "calculation_time", "standard_quote", "overall_pct_chng", "todynamiq_quote",
+]
+SERVICE_OUTPUT_COLUMNS = [
+    "service", "pricing_type", "service_standard_quote", "upcharges", "combined_upcharge_pct",
+    "upcharge_amount", "mileage_upcharge", "service_todynamiq_quote", "calc_details",
+]
+FORMATS = ("csv", "jsonl")
+
+
+def detect_format(filename, default="jsonl"):
+    ext = os.path.splitext(filename or "")[1].lower().lstrip(".")
+    if ext == "csv":
+        return "csv"
+    if ext in ("jsonl", "ndjson"):
+        return "jsonl"
+    return default
+
+
+# ------------------- Readers -------------------
+
+def job_from_row(row: dict) -> dict:
+    """A /calculate payload from one flat CSV row."""
+    job = {}
+    for key in ("job_id", "source", "destination", "tow_type", "is_accident", "make", "model", "weather",
+                "local_time", "mileage_from", "driver_start", "repeat_customer"):
+        value = (row.get(key) or "").strip()
+        if value:
+            job[key] = value
+    job["services"] = [s.strip() for s in (row.get("services") or "").split(";") if s.strip()]
+    if row.get("timezone_offset"):
+        job["timezone_offset"] = int(row["timezone_offset"])
+    if row.get("road_type") and row.get("lane"):
+        job["unsafe_location"] = {"road_type": row["road_type"].strip(), "lane": row["lane"].strip()}
+    if row.get("window_film_side") or row.get("window_film_front_back"):
+        job["window_film"] = {
+            "side_window": int(row.get("window_film_side") or 0),
+            "front_or_back_window": int(row.get("window_film_front_back") or 0),
+        }
+    if row.get("skid_steer_hours"):
+        job["skid_steer"] = {"hours": float(row["skid_steer_hours"])}
+    return job
+
+
+def read_jobs(lines, fmt):
+    """Yield payloads from an iterable of text lines; unparseable lines yield the error instead."""
+    if fmt == "csv":
+        for row in csv.DictReader(lines):
+            try:
+                yield job_from_row(row)
+            except ValueError as e:
+                yield ValueError(f"Invalid row: {e}")
+        return
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield ValueError(f"Invalid JSON line: {e}")
+
+
+# ------------------- Pipeline -------------------
+
+def resolve_chunk(chunk, snapshot, distances=get_distances):
+    """
+    Distances for a chunk of (index, job) in one deduplicated lookup.
+    Returns pricing tasks (index, job, distance_info, error) with error = (status, message) or None.
+    """
+    legs = {}
+    errors = {}
+    pairs = []
+    for index, job in chunk:
+        if isinstance(job, Exception):
+            errors[index] = (400, str(job))
+        elif not isinstance(job, dict):
+            errors[index] = (400, "Quote must be an object")
+        elif not job.get("source") or not job.get("destination"):
+            errors[index] = (400, "Source and destination are required")
+        elif not isinstance(job["source"], str) or not isinstance(job["destination"], str):
+            errors[index] = (400, "Source and destination must be addresses")
+        else:
+            try:
+                legs[index] = trip_legs(job, snapshot.yards)
+            except QuoteError as e:
+                errors[index] = (e.status, e.message)
+            except Exception as e:
+                errors[index] = (500, f"{type(e).__name__}: {e}")
+    results = resolve_job_legs(legs, distances)
+
+    tasks = []
+    for index, job in chunk:
+        distance_info = None
+        if index in legs:
+            try:
+                distance_info = combine_legs(job, legs[index][0], results)
+            except Exception as e:
+                errors[index] = (503 if isinstance(e, UpstreamUnavailable) else 500, str(e))
+        tasks.append((index, job, distance_info, errors.get(index)))
+    return tasks
+
+
+def price_tasks(tasks, snapshot):
+    """Batch-style result items ({"index", "job_id", "ok", "quote" | "status", "error"}) for resolved tasks."""
+    items = []
+    for index, job, distance_info, error in tasks:
+        item = {"index": index, "job_id": job.get("job_id") if isinstance(job, dict) else None}
+        if error is None:
+            try:
+                item.update(ok=True, quote=price_quote(job, distance_info, snapshot))
+            except QuoteError as e:
+                error = (e.status, e.message)
+            except Exception as e:
+                # One malformed job must not end the run for every job after it
+                error = (500, f"{type(e).__name__}: {e}")
+        if error is not None:
+            item.update(ok=False, status=error[0], error=error[1])
+        items.append(item)
+    return items
+
+
+_worker_catalog = None
+
+def _init_worker(data_dir):
+    global _worker_catalog
+    _worker_catalog = PricingCatalog(data_dir)
+
+def _price_in_worker(tasks):
+    return price_tasks(tasks, _worker_catalog.get())
+
+
+def price_jobs(jobs, catalog, workers=0, chunk_size=500, distances=get_distances):
+    """
+    Yield result items for an iterable of jobs, in input order.
+    workers=0 prices in this process (the web endpoint); otherwise on a pool
+    of that many processes, each with its own catalog of the same data dir.
+    """
+    numbered = enumerate(jobs)
+    chunks = iter(lambda: list(itertools.islice(numbered, chunk_size)), [])
+
+    if workers <= 0:
+        for chunk in chunks:
+            snapshot = catalog.get()
+            yield from price_tasks(resolve_chunk(chunk, snapshot, distances), snapshot)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(catalog.data_dir,)) as pool:
+        in_flight = deque()
+        for chunk in chunks:
+            in_flight.append(pool.submit(_price_in_worker, resolve_chunk(chunk, catalog.get(), distances)))
+            if len(in_flight) >= workers * 2:
+                yield from in_flight.popleft().result()
+        while in_flight:
+            yield from in_flight.popleft().result()
+
+
+# ------------------- Writers -------------------
+
+def result_rows(item):
+    """CSV rows for one result item: one per service, or a single error row."""
+    job = {"job_id": item.get("job_id"), "ok": item["ok"], "status": item.get("status", 200), "error": item.get("error")}
+    if not item["ok"]:
+        return [job]
+    quote = item["quote"]
+    for column in JOB_OUTPUT_COLUMNS[4:]:
+        job[column] = quote.get(column)
+    rows = []
+    for service in quote["services"]:
+        rows.append({
+            **job,
+            "service": service["service"],
+            "pricing_type": service["pricing_type"],
+            "service_standard_quote": service["standard_quote"],
+            "upcharges": json.dumps(service["upcharges"]),
+            "combined_upcharge_pct": service["combined_upcharge_pct"],
+            "upcharge_amount": service["upcharge_amount"],
+            "mileage_upcharge": service["mileage_upcharge"],
+            "service_todynamiq_quote": service["todynamiq_quote"],
+            "calc_details": json.dumps(service["calc_details"]),
+        })
+    return rows
+
+
+def format_results(items, fmt):
+    """Yield output text chunks (header first for CSV)."""
+    if fmt == "jsonl":
+        for item in items:
+            yield json.dumps(item) + "\n"
+        return
+
+    class _Line:
+        def write(self, text):
+            self.text = text
+
+    line = _Line()
+    writer = csv.DictWriter(line, fieldnames=JOB_OUTPUT_COLUMNS + SERVICE_OUTPUT_COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+    yield line.text
+    for item in items:
+        for row in result_rows(item):
+            writer.writerow(row)
+            yield line.text
+
+
+if __name__ == "__main__":
+    import sys, time, argparse
+    from helper import bulk   # pool tasks must pickle as helper.bulk.*, not __main__.*
+
+    parser = argparse.ArgumentParser(description="Price a CSV/JSONL file of tow jobs.")
+    parser.add_argument("input", help="jobs file (.csv or .jsonl), - for stdin")
+    parser.add_argument("output", help="priced file (.csv or .jsonl), - for stdout")
+    parser.add_argument("--input-format", choices=FORMATS)
+    parser.add_argument("--output-format", choices=FORMATS)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="pricing processes (0 = in process)")
+    parser.add_argument("--chunk-size", type=int, default=500, help="jobs per distance lookup / pricing task")
+    parser.add_argument("--data-dir", default=os.getenv("TOWDYNAMIQ_DATA_DIR", "data"))
+    args = parser.parse_args()
+
+    input_format = args.input_format or detect_format(args.input)
+    output_format = args.output_format or detect_format(args.output, default=input_format)
+    source = sys.stdin if args.input == "-" else open(args.input, "r", newline="", encoding="utf-8-sig")
+    target = sys.stdout if args.output == "-" else open(args.output, "w", newline="", encoding="utf-8")
+
+    started = time.perf_counter()
+    count = errors = 0
+    with source, target:
+        def counted(items):
+            global count, errors
+            for item in items:
+                count += 1
+                errors += not item["ok"]
+                yield item
+
+        items = bulk.price_jobs(read_jobs(source, input_format), PricingCatalog(args.data_dir),
+                                workers=args.workers, chunk_size=args.chunk_size)
+        for text in format_results(counted(items), output_format):
+            target.write(text)
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ Priced {count:,} jobs ({errors:,} errors) in {elapsed:.1f}s ({count / max(elapsed, 1e-9):,.0f} jobs/s)",
+          file=sys.stderr)
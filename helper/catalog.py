@@ -0,0 +1,116 @@
+import os, json, time, threading
+from helper.functions import BillableMilesTable, UpchargeBands
+from helper.generate_json_assets import CATALOG_FILES, content_version
+from helper.deadhead import YardConfig
+from helper.pricing_plan import compile_pricing_plan
+from helper.search import VehicleSearchIndex
+from helper.time_slots import TimeSlotIndex
+from helper.fleet import UtilizationBands
+
+# ------------------- Pricing Catalog -------------------
+#
+# Process-wide cache of the JSON files in data/. Each gunicorn worker parses
+# them once and afterwards only stats the files (at most every
+# `check_interval` seconds) to notice when generate_json_assets.py rewrote them.
+# A reload builds a brand new snapshot and swaps the reference, so a request
+# that already holds a snapshot keeps a consistent view until it finishes.
+#
+# The snapshot version is a hash of the file contents (not their mtimes), so
+# every worker and host serving the same files agrees on it, and it matches
+# the catalog_version generate_json_assets records in assets_manifest.json.
+
+VEHICLE_CSV = os.path.join(os.path.dirname(__file__), "car_makes_models_us.csv")
+
+
+class CatalogSnapshot:
+    """One consistent, read-only view of the pricing data files, plus what is compiled from them."""
+
+    __slots__ = ("pricing", "dynamic_modifiers", "cars", "plans", "billable_miles", "upcharge_bands", "time_slots",
+                 "utilization_bands", "search_index", "yards", "version", "stamp", "loaded_at")
+
+    def __init__(self, pricing, dynamic_modifiers, cars, yards, stamp, version):
+        self.pricing = pricing
+        self.dynamic_modifiers = dynamic_modifiers
+        self.cars = cars
+        self.plans = compile_pricing_plan(pricing)
+        self.billable_miles = BillableMilesTable(dynamic_modifiers)
+        self.upcharge_bands = UpchargeBands(dynamic_modifiers)
+        self.time_slots = TimeSlotIndex(dynamic_modifiers.get("time_of_day", {}), dynamic_modifiers.get("holidays"))
+        self.utilization_bands = UtilizationBands(dynamic_modifiers)
+        self.search_index = VehicleSearchIndex(cars, VEHICLE_CSV)
+        self.yards = YardConfig(yards)
+        self.stamp = stamp
+        self.version = version
+        self.loaded_at = time.time()
+
+
+class PricingCatalog:
+    def __init__(self, data_dir="data", check_interval=2.0):
+        self.data_dir = data_dir
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def _path(self, filename):
+        return os.path.join(self.data_dir, filename)
+
+    def _stamp(self):
+        stamp = []
+        for filename in CATALOG_FILES:
+            st = os.stat(self._path(filename))
+            stamp.append((filename, st.st_mtime_ns, st.st_size))
+        # The search index also reads the vehicle CSV: edits to it reload the snapshot too
+        # (without changing the version, which only covers what prices depend on)
+        st = os.stat(VEHICLE_CSV)
+        stamp.append((VEHICLE_CSV, st.st_mtime_ns, st.st_size))
+        return tuple(stamp)
+
+    def _load(self, stamp):
+        # Re-read if a file changed underneath us while we were parsing it
+        for _ in range(3):
+            blobs = {}
+            for filename in CATALOG_FILES:
+                with open(self._path(filename), "rb") as f:
+                    blobs[filename] = f.read()
+            latest = self._stamp()
+            if latest == stamp:
+                break
+            stamp = latest
+
+        loaded = {filename: json.loads(blob.decode("utf-8")) for filename, blob in blobs.items()}
+        return CatalogSnapshot(
+            pricing=loaded["pricing.json"],
+            dynamic_modifiers=loaded["dynamic_modifiers.json"],
+            cars=loaded["make_model_modifiers.json"],
+            yards=loaded["yards.json"],
+            stamp=stamp,
+            version=content_version(blobs),
+        )
+
+    def get(self) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() < self._next_check:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and time.monotonic() < self._next_check:
+                return snapshot
+            try:
+                stamp = self._stamp()
+                if snapshot is None or stamp != snapshot.stamp:
+                    snapshot = self._load(stamp)
+            except (OSError, ValueError) as e:
+                # Half-written or missing file: keep serving the last good snapshot
+                if snapshot is None:
+                    raise
+                print(f"⚠️ Catalog reload failed, keeping version {snapshot.version}: {e}")
+            self._snapshot = snapshot
+            self._next_check = time.monotonic() + self.check_interval
+        return snapshot
+
+    def reload(self) -> CatalogSnapshot:
+        """Force the next get() to re-check the files on disk."""
+        self._next_check = 0.0
+        return self.get()
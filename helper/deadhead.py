@@ -0,0 +1,273 @@
+import os, json, time, threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Tuple
+from helper.distance_cache import normalize_address
+from helper.distance_client import UpstreamUnavailable
+from helper.functions import get_distance, get_distances, google_distances
+from helper.quote import QuoteError
+
+# ------------------- Deadhead Mileage -------------------
+#
+# "All mileage is charged based on where our driver starts" (data/notes.md).
+# In yard mode a quote is priced on yard -> pickup -> drop, from the nearest
+# available yard (or the driver's current position when the request sends
+# `driver_start`). Repeat customers are still priced pickup -> drop.
+#
+# data/yards.json (part of the catalog, so edits hot-reload):
+#   {"default_mileage_from": "pickup" | "yard",
+#    "repeat_customers_from_pickup": true,
+#    "yards": [{"name": "...", "address": "...", "available": true}]}
+# A request can override the mode with "mileage_from".
+#
+# Yard -> pickup legs for frequently seen pickups are precomputed into
+# data/yard_matrix.json (`python -m helper.deadhead precompute`). Legs not in
+# the matrix go through get_distances together with pickup -> drop, so every
+# missing leg is fetched in one multi-origin Distance Matrix request.
+
+MILEAGE_MODES = ("pickup", "yard")
+
+
+@dataclass(frozen=True, slots=True)
+class Yard:
+    name: str
+    address: str
+    available: bool
+
+
+class YardConfig:
+    """Compiled yards.json."""
+
+    __slots__ = ("yards", "default_mileage_from", "repeat_customers_from_pickup")
+
+    def __init__(self, config: dict):
+        yards = []
+        for entry in config.get("yards", []):
+            if not entry.get("address"):
+                raise ValueError(f"Yard without an address in yards.json: {entry}")
+            yards.append(Yard(entry.get("name") or entry["address"], entry["address"], bool(entry.get("available", True))))
+        self.yards: Tuple[Yard, ...] = tuple(yards)
+        self.default_mileage_from = config.get("default_mileage_from", "pickup")
+        if self.default_mileage_from not in MILEAGE_MODES:
+            raise ValueError(f"Unknown default_mileage_from in yards.json: {self.default_mileage_from}")
+        self.repeat_customers_from_pickup = bool(config.get("repeat_customers_from_pickup", True))
+
+    def mileage_from(self, data: dict) -> str:
+        if self.repeat_customers_from_pickup and data.get("repeat_customer") == "yes":
+            return "pickup"
+        mode = data.get("mileage_from") or self.default_mileage_from
+        if mode not in MILEAGE_MODES:
+            raise QuoteError(f"Invalid mileage_from: {mode}")
+        return mode
+
+    def start_points(self, data: dict):
+        """[(name, address)] the driver could start from."""
+        driver_start = data.get("driver_start")
+        if driver_start and not isinstance(driver_start, str):
+            raise QuoteError("driver_start must be an address")
+        if driver_start:
+            return [("driver", driver_start)]
+        return [(yard.name, yard.address) for yard in self.yards if yard.available]
+
+
+# ------------------- Yard Matrix -------------------
+
+class YardMatrix:
+    """Precomputed yard -> pickup distances, reloaded when the file changes."""
+
+    def __init__(self, path, check_interval=30.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.legs = {}   # distance_cache.key(yard, pickup) -> distance result
+        self._stamp = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(origin, destination):
+        return f"{normalize_address(origin)}|{normalize_address(destination)}"
+
+    def _maybe_reload(self):
+        if time.monotonic() < self._next_check:
+            return
+        with self._lock:
+            self._next_check = time.monotonic() + self.check_interval
+            try:
+                st = os.stat(self.path)
+            except OSError:
+                self.legs, self._stamp = {}, None
+                return
+            stamp = (st.st_mtime_ns, st.st_size)
+            if stamp == self._stamp:
+                return
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.legs = json.load(f).get("legs", {})
+                self._stamp = stamp
+            except ValueError as e:
+                print(f"⚠️ Yard matrix reload failed, keeping {len(self.legs)} legs: {e}")
+
+    def get(self, origin, destination):
+        self._maybe_reload()
+        leg = self.legs.get(self.key(origin, destination))
+        return dict(leg, provider="cache") if leg is not None else None
+
+    def save(self, legs):
+        """Atomically replace the matrix file with `legs`."""
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"built_at": time.strftime("%Y-%m-%d %H:%M:%S"), "legs": legs}, f, indent=2)
+        os.replace(tmp, self.path)
+        self._next_check = 0.0
+
+
+yard_matrix = YardMatrix(os.environ.get("YARD_MATRIX_FILE", os.path.join("data", "yard_matrix.json")))
+
+
+# ------------------- Trip Distance -------------------
+
+def trip_legs(data: dict, yards: YardConfig):
+    """(start points, legs to look up). No start points means plain pickup -> drop pricing."""
+    trip = (data["source"], data["destination"])
+    if yards.mileage_from(data) == "pickup":
+        return [], [trip]
+    starts = yards.start_points(data)
+    if not starts:
+        raise QuoteError("No available yard or driver start point for yard mileage", status=409)
+    return starts, [(address, trip[0]) for _, address in starts] + [trip]
+
+
+def resolve_legs(pairs, distances=get_distances):
+    """{pair: result or Exception}; the yard matrix first, everything else in one get_distances call."""
+    results = {}
+    missing = []
+    for pair in dict.fromkeys(pairs):
+        leg = yard_matrix.get(*pair)
+        if leg is not None:
+            results[pair] = leg
+        else:
+            missing.append(pair)
+    if missing:
+        results.update(distances(missing))
+    return results
+
+
+def resolve_job_legs(legs, distances=get_distances):
+    """
+    resolve_legs for {index: (starts, pairs)} in one lookup. If that lookup
+    fails, each job's legs are resolved on their own so the failure lands on
+    the job that caused it: its legs map to the exception.
+    """
+    pairs = [pair for _, job_pairs in legs.values() for pair in job_pairs]
+    try:
+        return resolve_legs(pairs, distances) if pairs else {}
+    except Exception:
+        results = {}
+        for _, job_pairs in legs.values():
+            try:
+                results.update(resolve_legs(job_pairs, distances))
+            except Exception as e:
+                for pair in job_pairs:
+                    results.setdefault(pair, e)
+        return results
+
+
+def combine_legs(data: dict, starts, results) -> dict:
+    """distance_info for price_quote: nearest start -> pickup plus pickup -> drop."""
+    trip = results[(data["source"], data["destination"])]
+    if isinstance(trip, Exception):
+        raise trip
+    if not starts:
+        return trip
+
+    best = None
+    errors = []
+    for name, address in starts:
+        leg = results[(address, data["source"])]
+        if isinstance(leg, Exception):
+            errors.append(leg)
+        elif best is None or leg["g_miles"] < best[1]["g_miles"]:
+            best = (name, leg)
+    if best is None:
+        raise next((e for e in errors if isinstance(e, UpstreamUnavailable)), errors[0])
+
+    name, leg = best
+    providers = {leg.get("provider", "google"), trip.get("provider", "google")}
+    return {
+        "g_miles": round(leg["g_miles"] + trip["g_miles"], 1),
+        "resolved_origin": trip["resolved_origin"],
+        "resolved_destination": trip["resolved_destination"],
+        # An estimated leg makes the whole distance an estimate (and keeps it out of the quote cache)
+        "provider": "local" if "local" in providers else "google" if "google" in providers else "cache",
+        "deadhead": {
+            "start": name,
+            "start_address": leg["resolved_origin"],
+            "miles": leg["g_miles"],
+            "trip_miles": trip["g_miles"],
+        },
+    }
+
+
+def get_trip_distance(data: dict, yards: YardConfig, distance=get_distance, distances=get_distances) -> dict:
+    """get_distance for a quote, including the deadhead leg in yard mode."""
+    starts, pairs = trip_legs(data, yards)
+    if not starts:
+        return distance(data["source"], data["destination"])
+    return combine_legs(data, starts, resolve_legs(pairs, distances))
+
+
+# ------------------- Precompute -------------------
+
+def frequent_pickups(db_path, limit):
+    """The most common origins in the distance cache's SQLite file."""
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    try:
+        counts = Counter(key.partition("|")[0] for (key,) in conn.execute("SELECT key FROM distance_cache"))
+    finally:
+        conn.close()
+    return [origin for origin, _ in counts.most_common(limit)]
+
+
+def precompute_matrix(yards: YardConfig, pickups, matrix: YardMatrix = yard_matrix):
+    """Fetch every yard -> pickup leg and write the matrix file. Returns (legs written, failures)."""
+    pairs = [(yard.address, pickup) for yard in yards.yards for pickup in pickups]
+    legs = {}
+    failures = 0
+    for (origin, destination), result in google_distances(pairs).items():
+        if isinstance(result, Exception):
+            failures += 1
+            continue
+        legs[matrix.key(origin, destination)] = {
+            "g_miles": result["g_miles"],
+            "resolved_origin": result["resolved_origin"],
+            "resolved_destination": result["resolved_destination"],
+        }
+    matrix.save(legs)
+    return len(legs), failures
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Precompute the yard -> pickup distance matrix.")
+    parser.add_argument("command", choices=["precompute"])
+    parser.add_argument("--yards", default=os.path.join("data", "yards.json"))
+    parser.add_argument("--pickups", help="file with one pickup address per line")
+    parser.add_argument("--db", default=os.environ.get("DISTANCE_CACHE_DB"),
+                        help="distance cache SQLite file to take the most frequent pickups from")
+    parser.add_argument("--limit", type=int, default=500, help="pickups taken from --db")
+    args = parser.parse_args()
+
+    with open(args.yards, "r", encoding="utf-8") as f:
+        yard_config = YardConfig(json.load(f))
+    if args.pickups:
+        with open(args.pickups, "r", encoding="utf-8") as f:
+            pickups = [line.strip() for line in f if line.strip()]
+    elif args.db:
+        pickups = frequent_pickups(args.db, args.limit)
+    else:
+        parser.error("--pickups or --db (DISTANCE_CACHE_DB) is required")
+
+    written, failed = precompute_matrix(yard_config, pickups)
+    print(f"✅ {written} yard legs written to {yard_matrix.path}" + (f" (⚠️ {failed} failed)" if failed else ""))
@@ -0,0 +1,196 @@
+import re, time, sqlite3, threading
+from collections import OrderedDict
+from helper import metrics
+
+# ------------------- Address Normalization -------------------
+
+_ABBREVIATIONS = {
+    "street": "st", "avenue": "ave", "road": "rd", "drive": "dr",
+    "boulevard": "blvd", "highway": "hwy", "parkway": "pkwy", "lane": "ln",
+    "court": "ct", "place": "pl", "circle": "cir", "suite": "ste",
+    "north": "n", "south": "s", "east": "e", "west": "w",
+    "alabama": "al", "usa": "us",
+}
+
+
+def normalize_address(address: str) -> str:
+    """Canonical form used as a cache key: "123 Main Street, Birmingham" -> "123 main st birmingham"."""
+    text = (address or "").casefold()
+    text = re.sub(r"[.,#;:]+", " ", text)
+    words = [_ABBREVIATIONS.get(w, w) for w in text.split()]
+    return " ".join(words)
+
+
+# ------------------- Distance Cache -------------------
+
+class DistanceCache:
+    """
+    LRU + TTL cache of get_distance results keyed on normalized origin/destination.
+
+    Entries live in memory (bounded by `max_entries`). When `db_path` is set they
+    are also written to a SQLite file, so they survive restarts and are shared by
+    every gunicorn worker on the host.
+    """
+
+    def __init__(self, max_entries=5000, ttl_seconds=86400, db_path=None, max_db_entries=200000):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self.max_db_entries = max_db_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()   # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes = 0
+        if db_path:
+            self._init_db()
+
+    @staticmethod
+    def key(origin, destination):
+        return f"{normalize_address(origin)}|{normalize_address(destination)}"
+
+    # ---- SQLite backing ----
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        conn = self._conn()
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS distance_cache (
+                   key TEXT PRIMARY KEY,
+                   g_miles REAL NOT NULL,
+                   resolved_origin TEXT,
+                   resolved_destination TEXT,
+                   stored_at REAL NOT NULL
+               )"""
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_distance_cache_stored_at ON distance_cache (stored_at)")
+        conn.commit()
+
+    def _db_get(self, key):
+        try:
+            row = self._conn().execute(
+                "SELECT g_miles, resolved_origin, resolved_destination, stored_at FROM distance_cache WHERE key = ?",
+                (key,),
+            ).fetchone()
+        except sqlite3.Error as e:
+            print("⚠️ Distance cache read failed:", e)
+            return None
+        if row is None:
+            return None
+        value = {"g_miles": row[0], "resolved_origin": row[1], "resolved_destination": row[2]}
+        return row[3], value
+
+    def _db_set(self, key, stored_at, value):
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO distance_cache VALUES (?, ?, ?, ?, ?)",
+                (key, value["g_miles"], value.get("resolved_origin", ""),
+                 value.get("resolved_destination", ""), stored_at),
+            )
+            self._writes += 1
+            if self._writes % 500 == 0:
+                self._db_prune(conn, stored_at)
+            conn.commit()
+        except sqlite3.Error as e:
+            print("⚠️ Distance cache write failed:", e)
+
+    def _db_prune(self, conn, now):
+        conn.execute("DELETE FROM distance_cache WHERE stored_at < ?", (now - self.ttl_seconds,))
+        conn.execute(
+            """DELETE FROM distance_cache WHERE key IN (
+                   SELECT key FROM distance_cache ORDER BY stored_at DESC LIMIT -1 OFFSET ?
+               )""",
+            (self.max_db_entries,),
+        )
+
+    # ---- public API ----
+
+    def get(self, origin, destination):
+        key = self.key(origin, destination)
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is None and self.db_path:
+            value = self._db_lookup(key, now)
+        if value is None:
+            self._count_miss()
+        return value
+
+    def get_memory(self, origin, destination):
+        """In-memory tier only, never touches disk (for the event loop). A miss here is not counted."""
+        return self._memory_get(self.key(origin, destination), time.time())
+
+    def get_persistent(self, origin, destination):
+        """SQLite tier only, for callers that already missed get_memory (run it off the event loop)."""
+        key = self.key(origin, destination)
+        value = self._db_lookup(key, time.time()) if self.db_path else None
+        if value is None:
+            self._count_miss()
+        return value
+
+    def _memory_get(self, key, now):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    metrics.count_cache("distance", True)
+                    return dict(entry[1])
+                del self._entries[key]
+        return None
+
+    def _db_lookup(self, key, now):
+        entry = self._db_get(key)
+        if entry is not None and now - entry[0] <= self.ttl_seconds:
+            self._remember(key, entry[0], entry[1])
+            with self._lock:
+                self.hits += 1
+            metrics.count_cache("distance", True)
+            return dict(entry[1])
+        return None
+
+    def _count_miss(self):
+        with self._lock:
+            self.misses += 1
+        metrics.count_cache("distance", False)
+
+    def set(self, origin, destination, value):
+        key = self.key(origin, destination)
+        stored_at = time.time()
+        value = {
+            "g_miles": value["g_miles"],
+            "resolved_origin": value.get("resolved_origin", ""),
+            "resolved_destination": value.get("resolved_destination", ""),
+        }
+        self._remember(key, stored_at, value)
+        if self.db_path:
+            self._db_set(key, stored_at, value)
+
+    def _remember(self, key, stored_at, value):
+        with self._lock:
+            self._entries[key] = (stored_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.db_path:
+            conn = self._conn()
+            conn.execute("DELETE FROM distance_cache")
+            conn.commit()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
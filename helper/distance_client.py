@@ -0,0 +1,204 @@
+import time, random, threading
+import requests
+from requests.adapters import HTTPAdapter
+from helper import metrics
+
+DEFAULT_DISTANCE_MATRIX_URL = "https://maps.googleapis.com/maps/api/distancematrix/json"
+
+# HTTP statuses / API statuses worth another attempt
+RETRYABLE_HTTP = {429, 500, 502, 503, 504}
+RETRYABLE_API = {"OVER_QUERY_LIMIT", "UNKNOWN_ERROR"}
+
+
+class UpstreamUnavailable(Exception):
+    """The Distance Matrix API is down, timing out, or the circuit breaker is open."""
+
+
+# ------------------- Circuit Breaker -------------------
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failed calls and rejects calls
+    for `reset_timeout` seconds. After that one trial call is let through
+    (half-open); its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_call(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+            if remaining > 0 or self._trial_in_flight:
+                raise UpstreamUnavailable(
+                    f"Distance service is temporarily unavailable (circuit open, retry in {max(remaining, 0):.0f}s)"
+                )
+            self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """The call was abandoned (e.g. cancelled) without an outcome: let the next one be the trial."""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+# ------------------- Distance Matrix Client -------------------
+
+class DistanceMatrixClient:
+    """
+    Shared, pooled HTTP client for the Distance Matrix API.
+
+    Connections are kept alive between quotes, every request is bounded by
+    (connect, read) timeouts, transient failures are retried with jittered
+    exponential backoff, and repeated failures trip the circuit breaker so
+    quotes fail fast instead of piling up on a dead upstream.
+    """
+
+    def __init__(self, api_key, base_url=DEFAULT_DISTANCE_MATRIX_URL, connect_timeout=3.05,
+                 read_timeout=10.0, max_retries=2, backoff=0.25, max_backoff=2.0,
+                 pool_size=10, breaker=None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = breaker or CircuitBreaker()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _sleep_before_retry(self, attempt):
+        # "Full jitter": random delay up to the exponential backoff ceiling
+        ceiling = min(self.max_backoff, self.backoff * (2 ** attempt))
+        time.sleep(random.uniform(0, ceiling))
+
+    def matrix(self, origins, destinations):
+        """Raw Distance Matrix response for every origin x destination pair."""
+        self.breaker.before_call()
+
+        params = {
+            "origins": "|".join(origins),
+            "destinations": "|".join(destinations),
+            "key": self.api_key,
+            "units": "imperial",
+        }
+
+        last_error = None
+        try:
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    self._sleep_before_retry(attempt - 1)
+                started = time.perf_counter()
+                try:
+                    response = self.session.get(self.base_url, params=params, timeout=self.timeout)
+                except requests.RequestException as e:   # connection, timeout, broken chunked/compressed body...
+                    metrics.observe_upstream("sync", type(e).__name__, time.perf_counter() - started)
+                    last_error = f"{type(e).__name__}: {e}"
+                    continue
+                metrics.observe_upstream("sync", str(response.status_code), time.perf_counter() - started)
+
+                if response.status_code in RETRYABLE_HTTP:
+                    last_error = f"HTTP {response.status_code}"
+                    continue
+
+                try:
+                    data = response.json()
+                except ValueError:
+                    last_error = f"HTTP {response.status_code}: invalid JSON"
+                    continue
+
+                if data.get("status") in RETRYABLE_API:
+                    last_error = f"API status {data['status']}"
+                    continue
+
+                # Reached the API and got a definitive answer (even a REQUEST_DENIED)
+                self.breaker.record_success()
+                return data
+        except Exception:
+            # Anything unexpected still counts, or a half-open trial would never settle
+            self.breaker.record_failure()
+            raise
+
+        self.breaker.record_failure()
+        raise UpstreamUnavailable(
+            f"Distance service unavailable after {self.max_retries + 1} attempts ({last_error})"
+        )
+
+
+# ------------------- Batch Request Planning -------------------
+
+# Distance Matrix limits per request
+MAX_MATRIX_SIDE = 25       # origins or destinations
+MAX_MATRIX_ELEMENTS = 100  # origins x destinations
+
+
+def plan_matrix_requests(pairs, max_side=MAX_MATRIX_SIDE, max_elements=MAX_MATRIX_ELEMENTS):
+    """
+    Pack (origin, destination) pairs into as few Distance Matrix requests as the
+    API limits allow. Pairs are grouped by origin; origins that share
+    destinations end up in the same request so their elements are reused.
+
+    Returns a list of (origins, destinations) tuples.
+    """
+    by_origin = {}
+    for origin, destination in pairs:
+        by_origin.setdefault(origin, [])
+        if destination not in by_origin[origin]:
+            by_origin[origin].append(destination)
+
+    # Origins with many destinations are split so no single origin breaks the limits
+    per_origin_cap = min(max_side, max_elements)
+    groups = []
+    for origin, destinations in by_origin.items():
+        for i in range(0, len(destinations), per_origin_cap):
+            groups.append((origin, destinations[i:i + per_origin_cap]))
+    groups.sort(key=lambda g: tuple(sorted(g[1])))
+
+    requests_plan = []
+    origins, destinations = [], []
+    for origin, dests in groups:
+        merged = destinations + [d for d in dests if d not in destinations]
+        fits = (
+            origin not in origins
+            and len(origins) + 1 <= max_side
+            and len(merged) <= max_side
+            and (len(origins) + 1) * len(merged) <= max_elements
+        )
+        if origins and not fits:
+            requests_plan.append((origins, destinations))
+            origins, merged = [], list(dests)
+        origins = origins + [origin]
+        destinations = merged
+    if origins:
+        requests_plan.append((origins, destinations))
+    return requests_plan
@@ -0,0 +1,200 @@
+import os, re, csv, math, statistics
+from helper.distance_cache import normalize_address
+
+# ------------------- Local Distance Engine -------------------
+#
+# Offline distance estimates for places we already know: yards, repeat
+# customers and frequent pickup/drop addresses, geocoded once into
+# data/known_places.csv (name, address, aliases, lat, lng, kind). A "lat,lng"
+# string is accepted as a point too.
+#
+#   road miles ~= great-circle miles x circuity
+#
+# The circuity factor (roads are longer than the straight line, ~1.2-1.4 in
+# metro areas) is calibrated against real Google distances from the distance
+# cache with the `calibrate` command below.
+#
+# get_distance tries providers in DISTANCE_PROVIDERS order (helper/functions.py):
+#   google,local  Google first, local estimate when Google is down (default)
+#   local,google  local estimate whenever both ends are known places
+#   google        Google only
+
+EARTH_RADIUS_MILES = 3958.7613
+DEFAULT_CIRCUITY = 1.3
+PLACE_FIELDS = ["name", "address", "aliases", "lat", "lng", "kind"]
+
+_COORDINATES = re.compile(r"^\s*(-?\d{1,2}(?:\.\d+)?)\s*,\s*(-?\d{1,3}(?:\.\d+)?)\s*$")
+
+
+class UnknownPlace(LookupError):
+    """The local engine has no coordinates for this address."""
+
+
+def haversine_miles(a, b):
+    lat1, lng1 = map(math.radians, a)
+    lat2, lng2 = map(math.radians, b)
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * math.asin(math.sqrt(h))
+
+
+def parse_coordinates(text):
+    match = _COORDINATES.match(text or "")
+    if not match:
+        return None
+    lat, lng = float(match.group(1)), float(match.group(2))
+    if -90 <= lat <= 90 and -180 <= lng <= 180:
+        return lat, lng
+    return None
+
+
+class LocalDistanceEngine:
+    name = "local"
+
+    def __init__(self, places_csv=None, circuity=DEFAULT_CIRCUITY):
+        self.places_csv = places_csv
+        self.circuity = circuity
+        self.places = {}   # normalized address / name / alias -> (lat, lng, address)
+        if places_csv and os.path.exists(places_csv):
+            self.load(places_csv)
+
+    def load(self, places_csv):
+        places = {}
+        with open(places_csv, newline="", encoding="utf-8-sig") as f:
+            for row in csv.DictReader(f):
+                try:
+                    point = (float(row["lat"]), float(row["lng"]), row["address"].strip())
+                except (KeyError, TypeError, ValueError):
+                    continue
+                spellings = [row.get("address"), row.get("name"), *(row.get("aliases") or "").split("|")]
+                for spelling in spellings:
+                    if spelling and spelling.strip():
+                        places.setdefault(normalize_address(spelling), point)
+        self.places = places
+
+    def locate(self, address):
+        """(lat, lng, display address) or None."""
+        point = self.places.get(normalize_address(address))
+        if point is not None:
+            return point
+        coordinates = parse_coordinates(address)
+        if coordinates is not None:
+            return coordinates[0], coordinates[1], address.strip()
+        return None
+
+    def distance(self, origin, destination):
+        """Same shape as get_distance, estimated from coordinates."""
+        a = self.locate(origin)
+        b = self.locate(destination)
+        if a is None or b is None:
+            raise UnknownPlace(f"No local coordinates for {origin if a is None else destination!r}")
+        miles = haversine_miles(a[:2], b[:2]) * self.circuity
+        return {
+            "g_miles": round(miles, 1),
+            "resolved_origin": a[2],
+            "resolved_destination": b[2],
+            "provider": self.name,
+        }
+
+    def distances(self, pairs):
+        """{pair: result or UnknownPlace} like get_distances."""
+        results = {}
+        for pair in pairs:
+            try:
+                results[pair] = self.distance(*pair)
+            except UnknownPlace as e:
+                results[pair] = e
+        return results
+
+
+# ------------------- Calibration -------------------
+
+def calibrate_circuity(engine, samples):
+    """
+    Median ratio of real road miles to great-circle miles.
+    `samples` yields (origin, destination, google_miles); pairs with an
+    unknown end or shorter than a mile (too noisy) are skipped.
+    """
+    ratios = []
+    for origin, destination, google_miles in samples:
+        a, b = engine.locate(origin), engine.locate(destination)
+        if a is None or b is None:
+            continue
+        straight = haversine_miles(a[:2], b[:2])
+        if straight >= 1.0 and google_miles:
+            ratios.append(google_miles / straight)
+    if not ratios:
+        return None, 0
+    return statistics.median(ratios), len(ratios)
+
+
+def cached_google_distances(db_path):
+    """(origin, destination, miles) from the distance cache's SQLite file (keys are normalized)."""
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    try:
+        for key, miles in conn.execute("SELECT key, g_miles FROM distance_cache"):
+            origin, _, destination = key.partition("|")
+            yield origin, destination, miles
+    finally:
+        conn.close()
+
+
+def geocode(address, api_key):
+    """(lat, lng, formatted address) from the Google Geocoding API."""
+    import requests
+    response = requests.get(
+        "https://maps.googleapis.com/maps/api/geocode/json",
+        params={"address": address, "key": api_key}, timeout=10,
+    )
+    data = response.json()
+    if data.get("status") != "OK" or not data.get("results"):
+        raise Exception(f"Geocoding failed for {address!r}: {data.get('status')}")
+    result = data["results"][0]
+    location = result["geometry"]["location"]
+    return location["lat"], location["lng"], result["formatted_address"]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local distance engine tools.")
+    parser.add_argument("--places", default=os.path.join("data", "known_places.csv"))
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    estimate_parser = sub.add_parser("estimate", help="estimate one distance")
+    estimate_parser.add_argument("origin")
+    estimate_parser.add_argument("destination")
+    estimate_parser.add_argument("--circuity", type=float, default=float(os.environ.get("LOCAL_DISTANCE_CIRCUITY", DEFAULT_CIRCUITY)))
+
+    calibrate_parser = sub.add_parser("calibrate", help="fit the circuity factor to cached Google distances")
+    calibrate_parser.add_argument("--db", default=os.environ.get("DISTANCE_CACHE_DB"), required=not os.environ.get("DISTANCE_CACHE_DB"))
+
+    add_parser = sub.add_parser("add", help="geocode an address (Google) and add it to the places file")
+    add_parser.add_argument("address")
+    add_parser.add_argument("--name", default="")
+    add_parser.add_argument("--aliases", default="", help="|-separated other spellings")
+    add_parser.add_argument("--kind", default="customer", help="yard, customer, shop, ...")
+
+    args = parser.parse_args()
+    engine = LocalDistanceEngine(args.places)
+
+    if args.command == "estimate":
+        engine.circuity = args.circuity
+        print(engine.distance(args.origin, args.destination))
+    elif args.command == "calibrate":
+        factor, used = calibrate_circuity(engine, cached_google_distances(args.db))
+        if factor is None:
+            print("⚠️ No cached distances between known places yet")
+        else:
+            print(f"✅ Circuity {factor:.3f} from {used} cached Google distances (set LOCAL_DISTANCE_CIRCUITY)")
+    elif args.command == "add":
+        lat, lng, formatted = geocode(args.address, os.environ["GOOGLE_MAPS_API_KEY"])
+        new_file = not os.path.exists(args.places)
+        with open(args.places, "a", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=PLACE_FIELDS)
+            if new_file:
+                writer.writeheader()
+            aliases = "|".join(a for a in [args.address, *args.aliases.split("|")] if a and a != formatted)
+            writer.writerow({"name": args.name, "address": formatted, "aliases": aliases,
+                             "lat": lat, "lng": lng, "kind": args.kind})
+        print(f"✅ Added {formatted} ({lat:.6f}, {lng:.6f})")
@@ -0,0 +1,203 @@
+import os, json, math, time, threading
+from dataclasses import dataclass
+from typing import Optional
+
+# ------------------- Fleet State -------------------
+#
+# Live truck availability per tow type, kept in memory so the
+# truck_utilization modifier costs a dict lookup per quote, not a database
+# round trip. Readings arrive two ways:
+#   - POST /fleet/status (dispatch pushes {"tow_type", "total", "available"}),
+#   - a JSON file named by FLEET_STATE_FILE, reloaded when it changes:
+#       {"Light Duty": {"total": 12, "available": 3, "updated_at": 1760000000}, ...}
+#     (updated_at is optional and defaults to the file's mtime).
+# With FLEET_STATE_FILE set, pushes are also written to the file, so every
+# gunicorn worker picks them up within FLEET_CHECK_INTERVAL seconds. For each
+# tow type the newest reading wins. Readings older than FLEET_MAX_AGE seconds
+# are ignored, so a dead feed falls back to no surge instead of a stale one.
+#
+# Utilization is the share of trucks out: (total - available) / total. A
+# quote may send its own "truck_utilization" (the form's "how many trucks are
+# available?") to override the live available count; the total still comes
+# from the feed.
+#
+# dynamic_modifiers["truck_utilization"] = {"80%": {"threshold": 80, "upcharge": 0.05}, ...}
+# is compiled per catalog snapshot into a 0..100 table, so the band lookup is
+# one list index: the band with the highest threshold at or below the
+# utilization applies, none below the lowest threshold.
+
+
+class UtilizationBands:
+    """truck_utilization bands precomputed for every whole utilization percent."""
+
+    __slots__ = ("table",)
+
+    NO_BAND = (None, 0.0)
+
+    def __init__(self, dynamic_modifiers: dict):
+        bands = sorted(dynamic_modifiers.get("truck_utilization", {}).items(), key=lambda item: item[1]["threshold"])
+        table = [self.NO_BAND] * 101
+        for key, band in bands:
+            threshold = band["threshold"]
+            if not isinstance(threshold, int) or not 0 <= threshold <= 100:
+                raise ValueError(f"truck_utilization band {key}: threshold must be a whole percent 0-100")
+            for percent in range(threshold, 101):
+                table[percent] = (key, band.get("upcharge", 0.0))
+        self.table = tuple(table)
+
+    def lookup(self, utilization: float):
+        """(band key, upcharge) for a utilization percent."""
+        return self.table[min(max(math.floor(utilization), 0), 100)]
+
+
+@dataclass(frozen=True, slots=True)
+class FleetReading:
+    tow_type: str
+    total: int
+    available: int
+    updated_at: float   # epoch seconds
+    source: str         # "push" / "file"
+
+    def utilization(self, available=None) -> float:
+        available = self.available if available is None else min(max(available, 0), self.total)
+        return (self.total - available) / self.total * 100
+
+
+def validate_reading(tow_type, total, available, updated_at=None, source="push") -> FleetReading:
+    """A FleetReading from untrusted input; raises ValueError."""
+    if not isinstance(tow_type, str) or not tow_type:
+        raise ValueError("tow_type is required")
+    if isinstance(total, bool) or not isinstance(total, int) or total <= 0:
+        raise ValueError(f"{tow_type}: total must be a positive integer")
+    if isinstance(available, bool) or not isinstance(available, int) or not 0 <= available <= total:
+        raise ValueError(f"{tow_type}: available must be an integer between 0 and total")
+    if updated_at is None:
+        updated_at = time.time()
+    elif isinstance(updated_at, bool) or not isinstance(updated_at, (int, float)):
+        raise ValueError(f"{tow_type}: updated_at must be epoch seconds")
+    return FleetReading(tow_type, total, available, float(updated_at), source)
+
+
+class FleetState:
+    """Thread-safe store of the newest FleetReading per tow type."""
+
+    def __init__(self, path=None, max_age=900.0, check_interval=5.0):
+        self.path = path
+        self.max_age = max_age
+        self.check_interval = check_interval
+        self.readings = {}   # tow_type -> FleetReading; replaced, never mutated, so readers need no lock
+        self._stamp = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    # ---- Reads (per quote) ----
+
+    def get(self, tow_type) -> Optional[FleetReading]:
+        """The fresh reading for `tow_type`, or None."""
+        if self.path:
+            self._maybe_reload()
+        reading = self.readings.get(tow_type) if isinstance(tow_type, str) else None
+        if reading is None or time.time() - reading.updated_at > self.max_age:
+            return None
+        return reading
+
+    def snapshot(self):
+        return dict(self.readings)
+
+    # ---- Writes ----
+
+    def _merge(self, readings):
+        """Keep the newer of the stored and the incoming reading per tow type. Caller holds the lock."""
+        merged = dict(self.readings)
+        for reading in readings:
+            current = merged.get(reading.tow_type)
+            if current is None or reading.updated_at >= current.updated_at:
+                merged[reading.tow_type] = reading
+        self.readings = merged
+
+    def update(self, readings):
+        """Store pushed readings (and share them through the feed file, if any)."""
+        with self._lock:
+            if self.path:
+                self._reload()   # don't overwrite what other workers wrote since our last check
+            self._merge(readings)
+            if self.path:
+                try:
+                    self._save()
+                except OSError as e:
+                    print(f"⚠️ Could not write fleet state to {self.path}, other workers won't see this update: {e}")
+
+    # ---- File feed ----
+
+    def _read_file(self, st):
+        with open(self.path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        if not isinstance(entries, dict):
+            raise ValueError("expected an object keyed by tow type")
+        readings = []
+        for tow_type, entry in entries.items():
+            try:
+                readings.append(validate_reading(tow_type, entry.get("total"), entry.get("available"),
+                                                 entry.get("updated_at", st.st_mtime), source="file"))
+            except (AttributeError, ValueError) as e:
+                print(f"⚠️ Skipping fleet reading in {self.path}: {e}")
+        return readings
+
+    def _reload(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp == self._stamp:
+            return
+        try:
+            self._merge(self._read_file(st))
+            self._stamp = stamp
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Fleet state reload failed, keeping {len(self.readings)} readings: {e}")
+
+    def _maybe_reload(self):
+        if time.monotonic() < self._next_check:
+            return
+        with self._lock:
+            self._next_check = time.monotonic() + self.check_interval
+            self._reload()
+
+    def _save(self):
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        entries = {
+            r.tow_type: {"total": r.total, "available": r.available, "updated_at": r.updated_at}
+            for r in self.readings.values()
+        }
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entries, f, indent=2)
+        os.replace(tmp, self.path)
+        st = os.stat(self.path)
+        self._stamp = (st.st_mtime_ns, st.st_size)
+
+
+fleet = FleetState(
+    os.environ.get("FLEET_STATE_FILE") or None,
+    max_age=float(os.environ.get("FLEET_MAX_AGE", "900")),
+    check_interval=float(os.environ.get("FLEET_CHECK_INTERVAL", "5")),
+)
+
+
+def requested_available(data: dict):
+    """The quote's own available-truck count ("truck_utilization" form field), or None."""
+    value = data.get("truck_utilization")
+    if value in (None, ""):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def utilization_band(data: dict, snapshot):
+    """(band key, upcharge) for the quote's tow type; (None, 0.0) without a fresh fleet reading."""
+    reading = fleet.get(data.get("tow_type"))
+    if reading is None:
+        return UtilizationBands.NO_BAND
+    return snapshot.utilization_bands.lookup(reading.utilization(requested_available(data)))
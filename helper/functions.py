@@ -1,20 +1,110 @@
-import os, json, requests, math
+import os, json, math
+from bisect import bisect_right
 from datetime import datetime, timedelta
 from functools import wraps
-from flask import session, redirect, url_for
+from flask import session, redirect, url_for, jsonify
+from helper.distance_cache import DistanceCache
+from helper.distance_client import (
+    DistanceMatrixClient,
+    CircuitBreaker,
+    DEFAULT_DISTANCE_MATRIX_URL,
+    UpstreamUnavailable,
+    plan_matrix_requests,
+)
+from helper.distance_providers import LocalDistanceEngine, UnknownPlace, DEFAULT_CIRCUITY
 
 API_KEY = os.environ.get("GOOGLE_MAPS_API_KEY", "YOUR_API_KEY_HERE")
 
-# ------------------- Google Distance -------------------
+# One pooled keep-alive client per worker. DISTANCE_MATRIX_URL can point at a local stub.
+distance_client = DistanceMatrixClient(
+    API_KEY,
+    base_url=os.environ.get("DISTANCE_MATRIX_URL", DEFAULT_DISTANCE_MATRIX_URL),
+    connect_timeout=float(os.environ.get("DISTANCE_CONNECT_TIMEOUT", 3.05)),
+    read_timeout=float(os.environ.get("DISTANCE_READ_TIMEOUT", 10)),
+    max_retries=int(os.environ.get("DISTANCE_MAX_RETRIES", 2)),
+    pool_size=int(os.environ.get("DISTANCE_POOL_SIZE", 10)),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.environ.get("DISTANCE_BREAKER_THRESHOLD", 5)),
+        reset_timeout=float(os.environ.get("DISTANCE_BREAKER_RESET", 30)),
+    ),
+)
+
+# Repeat quotes for the same pickup/drop skip the Distance Matrix call.
+# Set DISTANCE_CACHE_DB to a file path to persist and share across workers.
+distance_cache = DistanceCache(
+    max_entries=int(os.environ.get("DISTANCE_CACHE_SIZE", 5000)),
+    ttl_seconds=float(os.environ.get("DISTANCE_CACHE_TTL", 86400)),
+    db_path=os.environ.get("DISTANCE_CACHE_DB") or None,
+)
+
+# Offline estimates from known coordinates (helper/distance_providers.py).
+local_distance = LocalDistanceEngine(
+    os.environ.get("LOCAL_PLACES_CSV", os.path.join("data", "known_places.csv")),
+    circuity=float(os.environ.get("LOCAL_DISTANCE_CIRCUITY", DEFAULT_CIRCUITY)),
+)
+
+# Tried in order; the next provider answers when one is down or doesn't know the place.
+DISTANCE_PROVIDERS = [p.strip() for p in os.environ.get("DISTANCE_PROVIDERS", "google,local").split(",") if p.strip()]
+FALLBACK_ERRORS = (UpstreamUnavailable, UnknownPlace)
+
+# ------------------- Distance Providers -------------------
 
 def get_distance(origin, destination):
-    url = "https://maps.googleapis.com/maps/api/distancematrix/json"
-    params = {"origins": origin, "destinations": destination, "key": API_KEY, "units": "imperial"}
-    response = requests.get(url, params=params)
-    data = response.json()
+    """Distance from the first provider in DISTANCE_PROVIDERS that can answer; result["provider"] says which."""
+    error = None
+    for provider in DISTANCE_PROVIDERS:
+        try:
+            return DISTANCE_FUNCTIONS[provider](origin, destination)
+        except FALLBACK_ERRORS as e:
+            error = pick_fallback_error(error, e)
+    raise error
+
+def get_distances(pairs):
+    """Batch get_distance: {pair: result}, a failed lookup maps to its Exception."""
+    results = {}
+    pending = list(dict.fromkeys(pairs))
+    for provider in DISTANCE_PROVIDERS:
+        if not pending:
+            break
+        found = BATCH_DISTANCE_FUNCTIONS[provider](pending)
+        unresolved = []
+        for pair in pending:
+            result = found[pair]
+            if isinstance(result, FALLBACK_ERRORS):
+                results[pair] = pick_fallback_error(results.get(pair), result)
+                unresolved.append(pair)
+            else:
+                results[pair] = result
+        pending = unresolved
+    return results
+
+def pick_fallback_error(previous, error):
+    """Report Google being down (503) over a place the local engine doesn't know."""
+    if isinstance(previous, UpstreamUnavailable):
+        return previous
+    return error
+
+# ------------------- Google Distance -------------------
+
+def google_distance(origin, destination):
+    cached = distance_cache.get(origin, destination)
+    if cached is not None:
+        cached["provider"] = "cache"
+        return cached
+
+    result = fetch_distance(origin, destination)
+    distance_cache.set(origin, destination, result)
+    result["provider"] = "google"
+    return result
+
+def fetch_distance(origin, destination):
+    data = distance_client.matrix([origin], [destination])
     if data["status"] != "OK":
         raise Exception(f"Error from API: {data}")
-    element = data["rows"][0]["elements"][0]
+    return parse_matrix_element(data, 0, 0)
+
+def parse_matrix_element(data, origin_index, destination_index):
+    element = data["rows"][origin_index]["elements"][destination_index]
     if element["status"] != "OK":
         raise Exception(f"Error in element: {element}")
 
@@ -22,10 +112,73 @@ def get_distance(origin, destination):
     g_miles = distance_value / 1609.34
     return {
         "g_miles": round(g_miles, 1),
-        "resolved_origin": data.get("origin_addresses", [""])[0],
-        "resolved_destination": data.get("destination_addresses", [""])[0]
+        "resolved_origin": data.get("origin_addresses", [""])[origin_index],
+        "resolved_destination": data.get("destination_addresses", [""])[destination_index]
     }
 
+def google_distances(pairs):
+    """
+    Resolve many (origin, destination) pairs at once.
+
+    Pairs are deduplicated on their normalized cache key, cache hits are served
+    locally and the rest are fetched with as few multi-origin/multi-destination
+    Distance Matrix requests as possible. Returns {pair: result}, where a
+    failed lookup maps to the Exception that caused it.
+    """
+    results = {}
+    pairs_by_key = {}
+    for pair in pairs:
+        pairs_by_key.setdefault(distance_cache.key(*pair), []).append(pair)
+
+    missing = {}
+    for key, same_pairs in pairs_by_key.items():
+        cached = distance_cache.get(*same_pairs[0])
+        if cached is not None:
+            cached["provider"] = "cache"
+            for pair in same_pairs:
+                results[pair] = dict(cached)
+        else:
+            missing[same_pairs[0]] = key
+
+    for origins, destinations in plan_matrix_requests(list(missing)):
+        try:
+            data = distance_client.matrix(origins, destinations)
+            if data["status"] != "OK":
+                raise Exception(f"Error from API: {data}")
+        except Exception as e:
+            for pair in missing:
+                if pair[0] in origins and pair[1] in destinations:
+                    results.setdefault(pair, e)
+            continue
+
+        for i, origin in enumerate(origins):
+            for j, destination in enumerate(destinations):
+                pair = (origin, destination)
+                if pair not in missing or isinstance(results.get(pair), dict):
+                    continue
+                try:
+                    results[pair] = parse_matrix_element(data, i, j)
+                    distance_cache.set(origin, destination, results[pair])
+                    results[pair]["provider"] = "google"
+                except Exception as e:
+                    results[pair] = e
+
+    # Fan the fetched value out to every spelling of the same address pair
+    for pair, key in missing.items():
+        for other in pairs_by_key[key]:
+            result = results.get(pair, Exception("Distance lookup failed"))
+            results[other] = dict(result) if isinstance(result, dict) else result
+    return results
+
+DISTANCE_FUNCTIONS = {"google": google_distance, "local": local_distance.distance}
+BATCH_DISTANCE_FUNCTIONS = {"google": google_distances, "local": local_distance.distances}
+
+if not DISTANCE_PROVIDERS:
+    raise ValueError("DISTANCE_PROVIDERS is empty")
+for _provider in DISTANCE_PROVIDERS:
+    if _provider not in DISTANCE_FUNCTIONS:
+        raise ValueError(f"Unknown distance provider in DISTANCE_PROVIDERS: {_provider}")
+
 # ------------------- JSON Loader -------------------
 
 def load_json(filename):
@@ -68,6 +221,76 @@ def get_billable_miles(actual_miles: int, dynamic_modifiers: dict) -> int:
 
     raise ValueError(f"Unknown mileage mode: {mode}")
 
+
+class BillableMilesTable:
+    """
+    get_billable_miles precomputed for every whole mile the bucket config
+    covers (0..max_miles in pattern mode, 0..last tier end in tier mode), so a
+    lookup is one list index; whole miles past the table bill `beyond`
+    (max_miles), or as-is in tier mode. Built once per dynamic_modifiers.json
+    version.
+    """
+
+    __slots__ = ("mode", "table", "beyond", "dynamic_modifiers")
+
+    def __init__(self, dynamic_modifiers: dict):
+        config = dynamic_modifiers["bucket_mileage_pricing"]
+        self.mode = config["mode"]
+        self.dynamic_modifiers = dynamic_modifiers
+
+        if self.mode == "tiers":
+            tiers = []
+            for rng, values in config["tiers"].items():
+                start, end = map(int, rng.split("-"))
+                tiers.append((start, end, values["billable_miles"]))
+            size = max((end for _, end, _ in tiers), default=-1) + 1
+            table = list(range(size))       # uncovered miles bill as-is
+            filled = [False] * size
+            for start, end, billable in tiers:  # first matching tier wins
+                for miles in range(max(start, 0), end + 1):
+                    if not filled[miles]:
+                        table[miles] = billable
+                        filled[miles] = True
+            self.table = table
+            self.beyond = None                  # past the last tier: bill actual miles
+
+        elif self.mode == "pattern":
+            rules = config["pattern"]
+            max_miles = rules["max_miles"]
+            free = rules.get("free_range", {})
+            # Past max_miles everything bills max_miles, except a free range reaching beyond it
+            size = max(max_miles, math.floor(free["max"]) if free else 0) + 1
+            table = [max_miles] * size
+
+            start = rules["start"]
+            step = rules["first_step"]
+            cap = start + step - 1
+            low = 0
+            while cap < max_miles:
+                for miles in range(low, min(cap, max_miles) + 1):
+                    table[miles] = cap
+                low = cap + 1
+                step += rules["step_growth"]
+                start = cap + 1
+                cap = start + step - 1
+
+            if free:
+                billable = free.get("billable_miles", free["max"])
+                for miles in range(max(math.ceil(free["min"]), 0), math.floor(free["max"]) + 1):
+                    table[miles] = billable
+            self.table = table
+            self.beyond = max_miles             # past the table: bill max_miles
+
+        else:
+            raise ValueError(f"Unknown mileage mode: {self.mode}")
+
+    def lookup(self, actual_miles: int) -> int:
+        if type(actual_miles) is int and 0 <= actual_miles:
+            if actual_miles < len(self.table):
+                return self.table[actual_miles]
+            return actual_miles if self.beyond is None else self.beyond
+        return get_billable_miles(actual_miles, self.dynamic_modifiers)
+
 # ------------------- Condition Evaluation -------------------
 
 def evaluate_condition(condition, selected_services):
@@ -286,10 +509,71 @@ def get_max_upcharge_cap(subtotal: float, bands: dict) -> float:
             return band["max_upcharge"]
     return 0.25  # fallback default
 
+DEFAULT_UPCHARGE_CAP = 0.25
+
+class UpchargeBands:
+    """
+    subtotal_upcharge_bands compiled into sorted, non-overlapping intervals, so
+    the cap lookup is a bisect. Subtotals outside every band (below the first,
+    above the last, or in a gap between two bands) get `fallback`, set by
+    dynamic_modifiers["subtotal_upcharge_fallback"] (default 0.25).
+    Bands written as whole dollars (max 150 / min 151) count as adjacent; only
+    missing whole-dollar ranges are reported in `gaps`.
+    """
+
+    __slots__ = ("keys", "starts", "ends", "caps", "fallback", "gaps")
+
+    def __init__(self, dynamic_modifiers: dict):
+        bands = dynamic_modifiers.get("subtotal_upcharge_bands", {})
+        self.fallback = dynamic_modifiers.get("subtotal_upcharge_fallback", DEFAULT_UPCHARGE_CAP)
+
+        ordered = sorted(bands.items(), key=lambda item: (item[1]["min"], item[1]["max"]))
+        self.gaps = []   # [(previous band max, next band min)] with whole dollars between them
+        for key, band in ordered:
+            if band["min"] > band["max"]:
+                raise ValueError(f"Upcharge band {key}: min {band['min']} is above max {band['max']}")
+        for (prev_key, prev), (key, band) in zip(ordered, ordered[1:]):
+            if band["min"] <= prev["max"]:
+                raise ValueError(f"Upcharge bands {prev_key} and {key} overlap")
+            if band["min"] - prev["max"] > 1:
+                self.gaps.append((prev["max"], band["min"]))
+
+        self.keys = tuple(key for key, _ in ordered)
+        self.starts = tuple(band["min"] for _, band in ordered)
+        self.ends = tuple(band["max"] for _, band in ordered)
+        self.caps = tuple(band["max_upcharge"] for _, band in ordered)
+
+    def band(self, subtotal: float):
+        """Key of the band containing `subtotal`, or None."""
+        i = bisect_right(self.starts, subtotal) - 1
+        if i >= 0 and subtotal <= self.ends[i]:
+            return self.keys[i]
+        return None
+
+    def lookup(self, subtotal: float) -> float:
+        i = bisect_right(self.starts, subtotal) - 1
+        if i >= 0 and subtotal <= self.ends[i]:
+            return self.caps[i]
+        return self.fallback
+
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if "user" not in session:
             return redirect(url_for("login"))
         return f(*args, **kwargs)
-    return decorated_function
\ No newline at end of file
+    return decorated_function
+
+def is_admin():
+    # roles are "admin", "admin2", ... for staff; everyone else is a customer
+    return str(session.get("role") or "").startswith("admin")
+
+def admin_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if "user" not in session:
+            return redirect(url_for("login"))
+        if not is_admin():
+            return jsonify({"error": "Admin access required"}), 403
+        return f(*args, **kwargs)
+    return decorated_function
@@ -1,6 +1,9 @@
 import csv
 import json
 import os
+import sys
+import time
+import hashlib
 from collections import defaultdict
 import re
 
@@ -42,125 +45,115 @@ def split_top_level(expr: str, op: str):
     return [p for p in parts if p]
 
 
+# ------------------- Builders -------------------
+# Each builder reads one source CSV and returns the JSON it compiles to.
 
-def collect_all_modifiers(csv_file):
+def collect_all_modifiers(rows):
     all_mods = set()
-    with open(csv_file, newline='', encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            applied = row.get("applied_modifiers", "")
-            all_mods.update(m.strip() for m in applied.split(",") if m.strip())
+    for row in rows:
+        applied = row.get("applied_modifiers", "")
+        all_mods.update(m.strip() for m in applied.split(",") if m.strip())
     return sorted(all_mods)  # keep stable order
 
-def pricing_csv_to_json(csv_file, json_file):
+def build_pricing(csv_file):
     services_by_type = defaultdict(dict)
     units_map = defaultdict(lambda: defaultdict(dict))
-    # ✅ pass 1: get global modifiers
-    all_modifiers = collect_all_modifiers(csv_file)
 
     with open(csv_file, newline='', encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            tow_type = row["tow_type"].strip()
-            service_code = row["service_code"].strip()
-            pricing_type = row["pricing_type"].strip().lower()
-            dropdown_rank = int(row["dropdown_rank"] or 0)
-
-            # ✅ build modifiers with full coverage
-            row_mods = {m.strip(): True for m in row["applied_modifiers"].split(",") if m.strip()}
-            modifiers = {mod: row_mods.get(mod, False) for mod in all_modifiers}
-
-            # --- Common object skeleton ---
-            base_obj = {
-                "label": row["service_label"],
-                "pricing_type": pricing_type,
-                "dropdown_rank": dropdown_rank,
-                "rules": [],
-                "modifiers": modifiers
+        rows = list(csv.DictReader(f))
+    # ✅ global modifiers, from the rows already in memory
+    all_modifiers = collect_all_modifiers(rows)
+
+    for row in rows:
+        tow_type = row["tow_type"].strip()
+        service_code = row["service_code"].strip()
+        pricing_type = row["pricing_type"].strip().lower()
+        dropdown_rank = int(row["dropdown_rank"] or 0)
+
+        # ✅ build modifiers with full coverage
+        row_mods = {m.strip(): True for m in row["applied_modifiers"].split(",") if m.strip()}
+        modifiers = {mod: row_mods.get(mod, False) for mod in all_modifiers}
+
+        # --- Common object skeleton ---
+        base_obj = {
+            "label": row["service_label"],
+            "pricing_type": pricing_type,
+            "dropdown_rank": dropdown_rank,
+            "rules": [],
+            "modifiers": modifiers
+        }
+
+        # --- Handle per_unit ---
+        if pricing_type == "per_unit":
+            unit_code = row["unit_code"].strip()
+            unit_label = row["unit_label"].strip()
+            unit_price = float(row["unit_price"]) if row["unit_price"] else 0
+
+            units_map[tow_type][service_code][unit_code] = {
+                "label": unit_label,
+                "price": unit_price
             }
 
-            # --- Handle per_unit ---
-            if pricing_type == "per_unit":
-                unit_code = row["unit_code"].strip()
-                unit_label = row["unit_label"].strip()
-                unit_price = float(row["unit_price"]) if row["unit_price"] else 0
-
-                units_map[tow_type][service_code][unit_code] = {
-                    "label": unit_label,
-                    "price": unit_price
-                }
-
-                if service_code not in services_by_type[tow_type]:
-                    service_obj = {
-                        **base_obj,
-                        "base_rate": float(row["base_rate"] or 0),
-                        "mileage": int(row["mileage_rate"] or 0),
-                        "includes": int(row["included_miles"] or 0),
-                        "accident": {"hook": float(row["accident_hook"])} if row.get("accident_hook") else None,
-                        "units": units_map[tow_type][service_code],
-                        "requires_inputs": ["unit_type", "count"]
-                    }
-                    services_by_type[tow_type][service_code] = service_obj
-                else:
-                    services_by_type[tow_type][service_code]["units"] = units_map[tow_type][service_code]
-                continue
-
-            # --- Handle time_based ---
-            if pricing_type == "time_based":
+            if service_code not in services_by_type[tow_type]:
                 service_obj = {
                     **base_obj,
                     "base_rate": float(row["base_rate"] or 0),
-                    "includes_time": int(row["included_minutes"] or 0),
-                    "increment_minutes": int(row["increment_minutes"] or 0),
-                    "rate_per_increment": float(row["increment_price"] or 0),
-                    "requires_inputs": ["duration_minutes"]
+                    "mileage": int(row["mileage_rate"] or 0),
+                    "includes": int(row["included_miles"] or 0),
+                    "accident": {"hook": float(row["accident_hook"])} if row.get("accident_hook") else None,
+                    "units": units_map[tow_type][service_code],
+                    "requires_inputs": ["unit_type", "count"]
                 }
                 services_by_type[tow_type][service_code] = service_obj
-                continue
+            else:
+                services_by_type[tow_type][service_code]["units"] = units_map[tow_type][service_code]
+            continue
 
-            # --- Handle flat (default) ---
+        # --- Handle time_based ---
+        if pricing_type == "time_based":
             service_obj = {
                 **base_obj,
                 "base_rate": float(row["base_rate"] or 0),
-                "mileage": int(row["mileage_rate"] or 0),
-                "includes": int(row["included_miles"] or 0),
-                "requires_inputs": []
+                "includes_time": int(row["included_minutes"] or 0),
+                "increment_minutes": int(row["increment_minutes"] or 0),
+                "rate_per_increment": float(row["increment_price"] or 0),
+                "requires_inputs": ["duration_minutes"]
             }
-
-            # Accident hook
-            if row.get("accident_hook"):
-                try:
-                    service_obj["accident"] = {"hook": float(row["accident_hook"])}
-                except ValueError:
-                    pass
-
-            # Addon rules
-            if row.get("addon_price") and row.get("addon_trigger_service_code"):
-                trigger_expr = row["addon_trigger_service_code"].strip()
-                condition = parse_condition(trigger_expr)
-                service_obj["rules"].append({
-                    "addon_rate": float(row["addon_price"]),
-                    "condition": condition
-                })
-
             services_by_type[tow_type][service_code] = service_obj
+            continue
+
+        # --- Handle flat (default) ---
+        service_obj = {
+            **base_obj,
+            "base_rate": float(row["base_rate"] or 0),
+            "mileage": int(row["mileage_rate"] or 0),
+            "includes": int(row["included_miles"] or 0),
+            "requires_inputs": []
+        }
+
+        # Accident hook
+        if row.get("accident_hook"):
+            try:
+                service_obj["accident"] = {"hook": float(row["accident_hook"])}
+            except ValueError:
+                pass
 
-    with open(json_file, "w", encoding="utf-8") as f:
-        json.dump(services_by_type, f, indent=2)
+        # Addon rules
+        if row.get("addon_price") and row.get("addon_trigger_service_code"):
+            trigger_expr = row["addon_trigger_service_code"].strip()
+            condition = parse_condition(trigger_expr)
+            service_obj["rules"].append({
+                "addon_rate": float(row["addon_price"]),
+                "condition": condition
+            })
 
-    print(f"✅ pricing JSON saved to {json_file}")
+        services_by_type[tow_type][service_code] = service_obj
 
+    return services_by_type
 
-def update_vehicle_location_from_csv(csv_file: str, json_file: str):
-    """
-    Replaces the `vehicle_location` section of dynamic_modifiers.json
-    with values from vehicle_location.csv
-    """
-    # Step 1: Load current JSON
-    with open(json_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
 
-    # Step 2: Build new vehicle_location dict from CSV
+def build_vehicle_location(csv_file):
+    """`vehicle_location` section of dynamic_modifiers.json from vehicle_location_modifiers.csv"""
     new_vehicle_location = {}
     with open(csv_file, mode="r", newline="", encoding="utf-8-sig") as f:
         reader = csv.DictReader(f)
@@ -184,31 +177,17 @@ def update_vehicle_location_from_csv(csv_file: str, json_file: str):
                 "label": lane,
                 "upcharge": upcharge
             }
+    return new_vehicle_location
 
-    # Step 3: Replace in JSON
-    data["vehicle_location"] = new_vehicle_location
-
-    # Step 4: Save back
-    with open(json_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
 
-    print(f"✅ vehicle_location updated in {json_file}")
-
-def update_subtotal_upcharge_from_csv(csv_file: str, json_file: str):
+def build_subtotal_bands(csv_file):
     """
-    Reads subtotal upcharge bands from a CSV file and updates
-    the 'subtotal_upcharge_bands' section in dynamic_modifiers.json.
-    
+    `subtotal_upcharge_bands` section of dynamic_modifiers.json.
+
     CSV must have columns:
       subtotal_range, subtotal_min, subtotal_max, max_upcharge
     """
-    # Step 1: Load current JSON
-    with open(json_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    # Step 2: Build subtotal bands dict
     subtotal_bands = {}
-
     with open(csv_file, newline="", encoding="utf-8-sig") as f:
         reader = csv.DictReader(f)
         for row in reader:
@@ -224,26 +203,11 @@ def update_subtotal_upcharge_from_csv(csv_file: str, json_file: str):
                 "max": max_val,
                 "max_upcharge": upcharge
             }
+    return subtotal_bands
 
-    # Step 3: Replace in JSON
-    data["subtotal_upcharge_bands"] = subtotal_bands
-
-    # Step 4: Save back
-    with open(json_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
-
-    print(f"✅ upcharge_bands updated in {json_file}")
-
-
-def makeModelCsv_to_json(csv_file: str, json_file: str):
-    """
-    Convert car CSV into nested JSON structure.
-
-    Args:
-        csv_file (str): Path to input CSV file.
-        json_file (str): Path where JSON will be written.
-    """
 
+def build_make_models(csv_file):
+    """Car CSV as nested JSON: {make: {"label", "models": {model: {...}}}}"""
     # use defaultdict to auto-create nested dicts
     car_data = defaultdict(lambda: {"label": "", "models": {}})
 
@@ -267,38 +231,182 @@ def makeModelCsv_to_json(csv_file: str, json_file: str):
             }
 
     # convert defaultdict to normal dict
-    car_data = dict(car_data)
+    return dict(car_data)
 
-    # write JSON
-    with open(json_file, "w", encoding="utf-8") as f:
-        json.dump(car_data, f, indent=2, ensure_ascii=False)
 
-    print(f"✅ make_model_modifiers JSON file created at {json_file}")
+# ------------------- Atomic Writes -------------------
 
-if __name__ == "__main__":
-    base_dir = r"C:\Users\dthiya\OneDrive - Niagara Bottling, LLC\Documents\Dixit Thiya\towdynamiq\data"
+def dump_json(data, ensure_ascii=True) -> bytes:
+    return json.dumps(data, indent=2, ensure_ascii=ensure_ascii).encode("utf-8")
 
-    #Pricing2.0
-    csv_file = os.path.join(base_dir, "pricing.csv")
-    json_file = os.path.join(base_dir, "pricing.json")
+def write_atomic(path, content: bytes):
+    """
+    Write via a temp file in the same directory and rename it over `path`, so
+    a running app (helper/catalog.py) only ever sees the old or the new file.
+    """
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
 
-    pricing_csv_to_json(csv_file, json_file)
+def file_sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
 
-    # Vehicle Location
-    vehicle_csv = os.path.join(base_dir, "vehicle_location_modifiers.csv")
-    modifiers_json = os.path.join(base_dir, "dynamic_modifiers.json")
 
-    update_vehicle_location_from_csv(vehicle_csv, modifiers_json)
+# ------------------- Single-asset entry points -------------------
 
-    # Upcharge Bands
-    subtotal_csv = os.path.join(base_dir, "subtotal_upcharge_bands_modifiers.csv")
-    modifiers_json = os.path.join(base_dir, "dynamic_modifiers.json")
+def pricing_csv_to_json(csv_file, json_file):
+    write_atomic(json_file, dump_json(build_pricing(csv_file)))
+    print(f"✅ pricing JSON saved to {json_file}")
 
-    update_subtotal_upcharge_from_csv(subtotal_csv, modifiers_json)
+def update_vehicle_location_from_csv(csv_file: str, json_file: str):
+    """Replaces the `vehicle_location` section of dynamic_modifiers.json with values from vehicle_location.csv"""
+    update_sections(json_file, {"vehicle_location": build_vehicle_location(csv_file)})
+    print(f"✅ vehicle_location updated in {json_file}")
 
-    # make_model_modifiers.json Build
+def update_subtotal_upcharge_from_csv(csv_file: str, json_file: str):
+    """Replaces the `subtotal_upcharge_bands` section of dynamic_modifiers.json."""
+    update_sections(json_file, {"subtotal_upcharge_bands": build_subtotal_bands(csv_file)})
+    print(f"✅ upcharge_bands updated in {json_file}")
+
+def makeModelCsv_to_json(csv_file: str, json_file: str):
+    write_atomic(json_file, dump_json(build_make_models(csv_file), ensure_ascii=False))
+    print(f"✅ make_model_modifiers JSON file created at {json_file}")
+
+def update_sections(json_file, sections):
+    """Replace top-level sections of a JSON file in one read and one atomic write."""
+    with open(json_file, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    data.update(sections)
+    write_atomic(json_file, dump_json(data))
+
+
+# ------------------- Incremental Build -------------------
+#
+# python -m helper.generate_json_assets [--data-dir data] [--force] [--check]
+#
+# Every source CSV is hashed and compared with data/assets_manifest.json; only
+# outputs whose sources changed (or that are missing) are rebuilt. Sections
+# that land in the same file (dynamic_modifiers.json) are merged in a single
+# write, and an output whose bytes did not change is not touched at all, so
+# the app does not reload for nothing. The manifest also records the catalog
+# version the app will compute for the new files.
+
+MANIFEST = "assets_manifest.json"
+
+# Everything helper/catalog.py loads as one catalog snapshot
+CATALOG_FILES = ("pricing.json", "dynamic_modifiers.json", "make_model_modifiers.json", "yards.json")
+
+# source CSV -> (output JSON, section of the output or None for the whole file, builder)
+ASSETS = {
+    "pricing.csv": ("pricing.json", None, build_pricing),
+    "vehicle_location_modifiers.csv": ("dynamic_modifiers.json", "vehicle_location", build_vehicle_location),
+    "subtotal_upcharge_bands_modifiers.csv": ("dynamic_modifiers.json", "subtotal_upcharge_bands", build_subtotal_bands),
+    "make_model_modifiers.csv": ("make_model_modifiers.json", None, build_make_models),
+}
+NON_ASCII_OUTPUTS = {"make_model_modifiers.json"}
+
+def content_version(blobs: dict) -> str:
+    """Catalog version of {filename: raw bytes}: same files, same version, on every host."""
+    digest = hashlib.blake2b(digest_size=6)
+    for filename in sorted(blobs):
+        digest.update(filename.encode())
+        digest.update(hashlib.sha256(blobs[filename]).digest())
+    return digest.hexdigest()
+
+def load_manifest(data_dir):
+    try:
+        with open(os.path.join(data_dir, MANIFEST), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def stale_assets(data_dir, manifest, force=False):
+    """{source: sha256} of the sources whose outputs need rebuilding."""
+    known = manifest.get("sources", {})
+    stale = {}
+    for source, (output, _, _) in ASSETS.items():
+        digest = file_sha256(os.path.join(data_dir, source))
+        if force or known.get(source) != digest or not os.path.exists(os.path.join(data_dir, output)):
+            stale[source] = digest
+    return stale
+
+def build_assets(data_dir, force=False):
+    """Rebuild what changed. Returns (written outputs, manifest)."""
+    manifest = load_manifest(data_dir)
+    stale = stale_assets(data_dir, manifest, force)
+
+    # Group by output so each file is read and written at most once
+    by_output = defaultdict(dict)
+    for source in stale:
+        output, section, builder = ASSETS[source]
+        by_output[output][section] = builder(os.path.join(data_dir, source))
+
+    written = []
+    for output, sections in by_output.items():
+        path = os.path.join(data_dir, output)
+        if None in sections:
+            data = sections[None]
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            data.update(sections)
+        content = dump_json(data, ensure_ascii=output not in NON_ASCII_OUTPUTS)
+        try:
+            with open(path, "rb") as f:
+                unchanged = f.read() == content
+        except OSError:
+            unchanged = False
+        if not unchanged:
+            write_atomic(path, content)
+            written.append(output)
+
+    manifest["sources"] = {**manifest.get("sources", {}), **stale}
+    if written or "catalog_version" not in manifest:
+        blobs = {}
+        for filename in CATALOG_FILES:
+            with open(os.path.join(data_dir, filename), "rb") as f:
+                blobs[filename] = f.read()
+        manifest["catalog_version"] = content_version(blobs)
+        manifest["built_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    if stale or written:
+        write_atomic(os.path.join(data_dir, MANIFEST), dump_json(manifest))
+    return written, manifest
 
-    make_model_csv = os.path.join(base_dir, "make_model_modifiers.csv")
-    make_model_json = os.path.join(base_dir, "make_model_modifiers.json")
-    makeModelCsv_to_json(make_model_csv, make_model_json)
 
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compile data/*.csv into the JSON assets the app loads.")
+    parser.add_argument("--data-dir", default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"))
+    parser.add_argument("--force", action="store_true", help="rebuild every output")
+    parser.add_argument("--check", action="store_true", help="only report stale outputs; exit 1 if any")
+    args = parser.parse_args()
+
+    if args.check:
+        stale = stale_assets(args.data_dir, load_manifest(args.data_dir), args.force)
+        for source in stale:
+            print(f"⚠️ {source} changed: {ASSETS[source][0]} needs rebuilding")
+        # Gaps are allowed (they get the fallback cap) but are usually a typo in the bands CSV
+        from helper.functions import UpchargeBands
+        with open(os.path.join(args.data_dir, "dynamic_modifiers.json"), "r", encoding="utf-8") as f:
+            bands = UpchargeBands(json.load(f))
+        if bands.gaps:
+            gaps = ", ".join(f"{lo}-{hi}" for lo, hi in bands.gaps)
+            print(f"⚠️ Subtotals between upcharge bands ({gaps}) use the fallback cap {bands.fallback}")
+        sys.exit(1 if stale else 0)
+
+    started = time.perf_counter()
+    written, manifest = build_assets(args.data_dir, force=args.force)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if written:
+        print(f"✅ Rebuilt {', '.join(written)} in {elapsed_ms:.0f} ms (catalog version {manifest['catalog_version']})")
+    else:
+        print(f"✅ Assets up to date (catalog version {manifest['catalog_version']})")
@@ -0,0 +1,138 @@
+import os, time
+from prometheus_client import (
+    CollectorRegistry, Counter, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest, multiprocess,
+)
+
+# ------------------- Metrics -------------------
+#
+# Prometheus histograms and counters for the quote path, served as text on
+# /metrics. Per stage of /calculate (catalog, quote cache, distance, quote
+# context, service loop, breakdown text, JSON serialization), per tow type and
+# service, upstream Distance Matrix calls, cache lookups and request errors.
+#
+# Multiple gunicorn workers: set PROMETHEUS_MULTIPROC_DIR to an empty
+# directory shared by the workers (wiped on deploy). Each worker then writes
+# its samples there and /metrics aggregates all of them; gunicorn.conf.py
+# cleans up after exited workers. METRICS_ENABLED=false turns every span and
+# counter into a no-op.
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() != "false"
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+# 100µs .. 10s: pricing stages are sub-millisecond, distance lookups are not
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_SECONDS = Histogram(
+    "towdynamiq_request_seconds", "HTTP request latency by endpoint and status",
+    ["endpoint", "status"], buckets=LATENCY_BUCKETS,
+)
+STAGE_SECONDS = Histogram(
+    "towdynamiq_quote_stage_seconds", "Time spent in each stage of a quote",
+    ["stage"], buckets=LATENCY_BUCKETS,
+)
+SERVICE_SECONDS = Histogram(
+    "towdynamiq_service_pricing_seconds", "Pricing time per service",
+    ["tow_type", "service"], buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_SECONDS = Histogram(
+    "towdynamiq_distance_upstream_seconds", "Distance Matrix HTTP call latency by client and outcome",
+    ["client", "outcome"], buckets=LATENCY_BUCKETS,
+)
+ERRORS = Counter(
+    "towdynamiq_errors_total", "Error responses by endpoint and status (batch items included)",
+    ["endpoint", "status"],
+)
+CACHE_LOOKUPS = Counter(
+    "towdynamiq_cache_lookups_total", "Cache lookups by cache and result (hit/miss)",
+    ["cache", "result"],
+)
+QUOTE_LOG = Counter(
+    "towdynamiq_quote_log_total", "Quote log records by outcome (written/dropped/failed)",
+    ["outcome"],
+)
+
+
+# ------------------- Spans -------------------
+
+class _Span:
+    __slots__ = ("child", "started")
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.started)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+_stage_children = {}
+
+
+def span(stage: str):
+    """`with span("distance"): ...` records the block's duration under that stage."""
+    if not METRICS_ENABLED:
+        return _NOOP
+    child = _stage_children.get(stage)
+    if child is None:
+        child = _stage_children[stage] = STAGE_SECONDS.labels(stage)
+    return _Span(child)
+
+
+def observe_service(tow_type, service, seconds):
+    if METRICS_ENABLED:
+        SERVICE_SECONDS.labels(tow_type, service).observe(seconds)
+
+
+def observe_upstream(client, outcome, seconds):
+    if METRICS_ENABLED:
+        UPSTREAM_SECONDS.labels(client, outcome).observe(seconds)
+
+
+def observe_request(endpoint, status, seconds):
+    if METRICS_ENABLED:
+        REQUEST_SECONDS.labels(endpoint, str(status)).observe(seconds)
+        if status >= 400:
+            ERRORS.labels(endpoint, str(status)).inc()
+
+
+def count_error(endpoint, status):
+    if METRICS_ENABLED:
+        ERRORS.labels(endpoint, str(status)).inc()
+
+
+def count_cache(cache, hit):
+    if METRICS_ENABLED:
+        CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def count_quote_log(outcome, n=1):
+    if METRICS_ENABLED:
+        QUOTE_LOG.labels(outcome).inc(n)
+
+
+# ------------------- Exposition -------------------
+
+def render():
+    """(body, content type) for /metrics: this worker, or every worker in multiprocess mode."""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
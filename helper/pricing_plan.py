@@ -0,0 +1,234 @@
+from dataclasses import dataclass
+from datetime import datetime
+from types import MappingProxyType
+from typing import Callable, Mapping, Optional, Tuple
+from helper.functions import PRICING_CALCULATORS
+from helper.time_slots import client_local_time
+from helper.fleet import utilization_band
+
+# ------------------- Compiled Pricing Plan -------------------
+#
+# pricing.json is compiled once per catalog snapshot into immutable plans, so
+# the quote loop does attribute access instead of dict plumbing:
+#   - calculators are resolved to functions,
+#   - the config each calculator sees is prebuilt for every possible base rate
+#     (standard, each addon rate, accident hook) instead of copied per quote,
+#   - enabled modifiers become a tuple of names, picked per service from the
+#     QuoteContext that resolves every request-level modifier once per quote,
+#   - addon rule trees become closures over a bitmask of the selected services.
+
+
+# ------------------- Modifier Resolvers -------------------
+# Each resolver takes the request payload and the catalog snapshot and returns
+# the upcharge fraction for that modifier (0.0 when it does not apply).
+
+def resolve_make_model(data, snapshot):
+    make = data.get("make")
+    model = data.get("model")
+    if make and model:
+        make_entry = snapshot.cars.get(make)
+        if make_entry:
+            model_entry = make_entry["models"].get(model)
+            if model_entry:
+                return model_entry.get("upcharge_percentage", 0.0)
+    return 0.0
+
+def resolve_vehicle_location(data, snapshot):
+    unsafe_location = data.get("unsafe_location")  # dict {road_type, lane}
+    if unsafe_location:
+        locations = snapshot.dynamic_modifiers["vehicle_location"]
+        road_type = unsafe_location.get("road_type")
+        lane = unsafe_location.get("lane")
+        if road_type in locations:
+            road_data = locations[road_type]
+            if lane in road_data["lanes"]:
+                return road_data["lanes"][lane].get("upcharge", 0.0)
+    return 0.0
+
+def resolve_weather(data, snapshot):
+    weather = data.get("weather")
+    if weather and weather in snapshot.dynamic_modifiers["weather"]:
+        return snapshot.dynamic_modifiers["weather"][weather].get("upcharge", 0.0)
+    return 0.0
+
+def resolve_truck_utilization(data, snapshot):
+    return utilization_band(data, snapshot)[1]   # live fleet load, see helper/fleet.py
+
+# time_of_day is resolved from the client clock in build_quote_context
+MODIFIER_RESOLVERS = {
+    "make_model": resolve_make_model,
+    "vehicle_location": resolve_vehicle_location,
+    "weather": resolve_weather,
+    "truck_utilization": resolve_truck_utilization,
+}
+
+
+# ------------------- Quote Context -------------------
+# Everything about a quote that does not depend on the service, resolved once
+# before the per-service loop. Services only pick their enabled upcharges.
+
+@dataclass(frozen=True, slots=True)
+class QuoteContext:
+    g_miles: int                 # Google miles, ceil'd
+    bucket_miles: int            # billable miles after bucketing
+    local_time: datetime         # client wall-clock time (UTC fallback)
+    time_slot: Optional[str]     # matched time_of_day slot, None outside every slot
+    upcharges: Mapping[str, float]
+
+    def upcharge(self, name: str) -> float:
+        # modifiers without a resolver count as 0.0
+        return self.upcharges.get(name, 0.0)
+
+
+def build_quote_context(data: dict, snapshot, g_miles: int) -> QuoteContext:
+    local_time = client_local_time(data)
+    time_slot, time_upcharge = snapshot.time_slots.lookup(local_time)
+    upcharges = {name: resolve(data, snapshot) for name, resolve in MODIFIER_RESOLVERS.items()}
+    upcharges["time_of_day"] = time_upcharge
+    return QuoteContext(
+        g_miles=g_miles,
+        bucket_miles=snapshot.billable_miles.lookup(g_miles),
+        local_time=local_time,
+        time_slot=time_slot,
+        upcharges=upcharges,
+    )
+
+
+# ------------------- Addon Rule Compilation -------------------
+
+def compile_condition(condition, bits):
+    """Turn an evaluate_condition tree into a predicate over a selected-services bitmask."""
+    ctype = condition["type"]
+    if ctype == "SINGLE":
+        mask = 0
+        for trigger in condition["triggers"]:
+            mask |= bits[trigger]
+        return lambda selected: selected & mask != 0
+    children = tuple(compile_condition(child, bits) for child in condition["triggers"])
+    if ctype == "AND":
+        return lambda selected: all(test(selected) for test in children)
+    if ctype == "OR":
+        return lambda selected: any(test(selected) for test in children)
+    raise ValueError(f"Unknown condition type: {ctype}")
+
+def _condition_services(condition):
+    if condition["type"] == "SINGLE":
+        yield from condition["triggers"]
+    else:
+        for child in condition["triggers"]:
+            yield from _condition_services(child)
+
+
+# ------------------- Plans -------------------
+
+@dataclass(frozen=True, slots=True)
+class AddonRule:
+    test: Callable[[int], bool]
+    addon_rate: float
+    calc_config: Mapping
+
+
+@dataclass(frozen=True, slots=True)
+class ServicePlan:
+    code: str
+    label: str
+    pricing_type: str
+    calculator: Optional[Callable]
+    base_rate: float
+    accident_rate: Optional[float]
+    rules: Tuple[AddonRule, ...]
+    modifiers: Tuple[str, ...]
+    includes: float
+    per_mile: float
+    input_kind: Optional[str]          # "window_film", "skid_steer" or None
+    calc_config: Mapping               # what the calculator sees at base_rate
+    accident_config: Optional[Mapping]
+
+    def resolve_base_rate(self, selected_mask: int, is_accident: bool):
+        """Effective (base_rate, calculator config) after addon and accident overrides."""
+        # accident override wins over any addon rate
+        if is_accident and self.accident_rate is not None:
+            return self.accident_rate, self.accident_config
+        # addon rules (override base_rate if condition is true)
+        for rule in self.rules:
+            if rule.test(selected_mask):
+                return rule.addon_rate, rule.calc_config
+        return self.base_rate, self.calc_config
+
+
+@dataclass(frozen=True, slots=True)
+class TowTypePlan:
+    tow_type: str
+    services: Mapping[str, ServicePlan]
+    bits: Mapping[str, int]
+
+    def selection_mask(self, services) -> int:
+        bits = self.bits
+        mask = 0
+        for service in services:
+            mask |= bits.get(service, 0)
+        return mask
+
+
+def compile_service(code, config, bits) -> ServicePlan:
+    pricing_type = config.get("pricing_type", "flat")
+    base_rate = config.get("base_rate", 0)
+
+    accident = config.get("accident") or {}
+    accident_rate = accident.get("hook")
+
+    def calc_config(rate):
+        return MappingProxyType({**config, "base_rate": rate})
+
+    rules = tuple(
+        AddonRule(
+            test=compile_condition(rule["condition"], bits),
+            addon_rate=rule["addon_rate"],
+            calc_config=calc_config(rule["addon_rate"]),
+        )
+        for rule in config.get("rules", [])
+    )
+
+    modifiers = tuple(name for name, enabled in config.get("modifiers", {}).items() if enabled)
+
+    if code == "window_film":
+        input_kind = "window_film"
+    elif code.startswith("skid_steer"):
+        input_kind = "skid_steer"
+    else:
+        input_kind = None
+
+    return ServicePlan(
+        code=code,
+        label=config["label"],
+        pricing_type=pricing_type,
+        calculator=PRICING_CALCULATORS.get(pricing_type),
+        base_rate=base_rate,
+        accident_rate=accident_rate,
+        rules=rules,
+        modifiers=modifiers,
+        includes=config.get("includes", 0),
+        per_mile=config.get("mileage", 0),
+        input_kind=input_kind,
+        calc_config=calc_config(base_rate),
+        accident_config=calc_config(accident_rate) if accident_rate is not None else None,
+    )
+
+
+def compile_pricing_plan(pricing: dict) -> Mapping[str, TowTypePlan]:
+    plans = {}
+    for tow_type, services in pricing.items():
+        names = list(services)
+        for config in services.values():
+            for rule in config.get("rules", []):
+                names.extend(_condition_services(rule["condition"]))
+        bits = {}
+        for name in names:
+            bits.setdefault(name, 1 << len(bits))
+
+        plans[tow_type] = TowTypePlan(
+            tow_type=tow_type,
+            services=MappingProxyType({code: compile_service(code, config, bits) for code, config in services.items()}),
+            bits=MappingProxyType(bits),
+        )
+    return MappingProxyType(plans)
@@ -0,0 +1,166 @@
+import os, sys, time, random, threading, cProfile
+from collections import Counter
+
+# ------------------- Request Profiler -------------------
+#
+# Opt-in profiling of production requests, to catch tail-latency spikes that
+# don't reproduce locally. Nothing is installed unless it is turned on:
+#   PROFILE_SAMPLE_RATE=0.01     profile 1% of requests to PROFILE_ENDPOINTS
+#   PROFILE_ALLOW_HEADER=true    admins can force one with "X-Profile: 1"
+#
+# Two modes (PROFILE_MODE):
+#   sampler   (default) a background thread samples the request thread's stack
+#             every PROFILE_INTERVAL_MS and writes collapsed stacks
+#             (<name>.collapsed) for flamegraph.pl / speedscope,
+#   cprofile  deterministic cProfile, written as <name>.prof for pstats/snakeviz.
+# Files go to PROFILE_DIR; only the newest PROFILE_MAX_FILES are kept.
+
+PROFILE_EXTENSIONS = (".collapsed", ".prof")
+
+
+class StackSampler:
+    """Samples one thread's Python stack on a timer until stopped."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RequestProfiler:
+    def __init__(self, profile_dir="profiles", sample_rate=0.0, allow_header=False, mode="sampler",
+                 interval_ms=1.0, max_files=200, endpoints=("calculate", "calculate_batch")):
+        if mode not in ("sampler", "cprofile"):
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        self.profile_dir = profile_dir
+        self.sample_rate = sample_rate
+        self.allow_header = allow_header
+        self.mode = mode
+        self.interval = interval_ms / 1000.0
+        self.max_files = max_files
+        self.endpoints = frozenset(endpoints)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0 or self.allow_header
+
+    def should_profile(self, endpoint, forced=False) -> bool:
+        if endpoint not in self.endpoints:
+            return False
+        if forced and self.allow_header:
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self):
+        if self.mode == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            profiler = StackSampler(threading.get_ident(), self.interval)
+            profiler.start()
+        return profiler, time.perf_counter()
+
+    def finish(self, handle, endpoint, status):
+        """Stop profiling and write the profile file; returns its name."""
+        profiler, started = handle
+        if self.mode == "cprofile":
+            profiler.disable()
+        else:
+            profiler.stop()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        os.makedirs(self.profile_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        name = f"{stamp}_{endpoint}_{status}_{elapsed_ms:.0f}ms_{os.getpid()}_{random.getrandbits(24):06x}"
+        path = os.path.join(self.profile_dir, name)
+        if self.mode == "cprofile":
+            name += ".prof"
+            profiler.dump_stats(path + ".prof")
+        else:
+            name += ".collapsed"
+            with open(path + ".collapsed", "w", encoding="utf-8") as f:
+                f.write(profiler.collapsed())
+        self._rotate()
+        return name
+
+    def _rotate(self):
+        with self._lock:
+            files = self.list_files()
+            for entry in files[self.max_files:]:
+                try:
+                    os.remove(os.path.join(self.profile_dir, entry["file"]))
+                except OSError:
+                    pass
+
+    def list_files(self, limit=None):
+        """Profiles on disk, newest first: [{"file", "endpoint", "status", "duration_ms", "created_at", "bytes"}]."""
+        try:
+            names = [n for n in os.listdir(self.profile_dir) if n.endswith(PROFILE_EXTENSIONS)]
+        except FileNotFoundError:
+            return []
+        entries = []
+        for name in names:
+            path = os.path.join(self.profile_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            parts = os.path.splitext(name)[0].split("_")
+            entries.append({
+                "file": name,
+                "endpoint": "_".join(parts[1:-4]) if len(parts) >= 6 else None,
+                "status": parts[-4] if len(parts) >= 6 else None,
+                "duration_ms": int(parts[-3][:-2]) if len(parts) >= 6 and parts[-3][:-2].isdigit() else None,
+                "created_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(st.st_mtime)),
+                "bytes": st.st_size,
+                "mtime": st.st_mtime,
+            })
+        entries.sort(key=lambda e: e["mtime"], reverse=True)
+        for entry in entries:
+            del entry["mtime"]
+        return entries[:limit] if limit else entries
+
+    def path_for(self, name):
+        """Absolute path of a profile file by name, or None (no path traversal)."""
+        if os.path.basename(name) != name or not name.endswith(PROFILE_EXTENSIONS):
+            return None
+        path = os.path.join(self.profile_dir, name)
+        return path if os.path.isfile(path) else None
+
+
+def profiler_from_env() -> RequestProfiler:
+    endpoints = os.environ.get("PROFILE_ENDPOINTS", "calculate,calculate_batch")
+    return RequestProfiler(
+        profile_dir=os.environ.get("PROFILE_DIR", "profiles"),
+        sample_rate=float(os.environ.get("PROFILE_SAMPLE_RATE", 0)),
+        allow_header=os.environ.get("PROFILE_ALLOW_HEADER", "false").lower() == "true",
+        mode=os.environ.get("PROFILE_MODE", "sampler"),
+        interval_ms=float(os.environ.get("PROFILE_INTERVAL_MS", 1)),
+        max_files=int(os.environ.get("PROFILE_MAX_FILES", 200)),
+        endpoints=[e.strip() for e in endpoints.split(",") if e.strip()],
+    )
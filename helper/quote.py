@@ -0,0 +1,240 @@
+import math, time
+from collections import OrderedDict
+from datetime import datetime, timezone, timedelta
+from helper.functions import format_breakdown
+from helper.pricing_plan import build_quote_context
+from helper import metrics
+
+# ------------------- Quote Pricing -------------------
+#
+# The pricing half of /calculate: given the request payload, the resolved
+# distance and a catalog snapshot, build the quote response. Shared by
+# /calculate and /calculate/batch so every entry point prices the same way.
+
+
+class QuoteError(Exception):
+    """Invalid quote input; `status` is the HTTP status to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def get_calculation_time(data: dict) -> str:
+    """Time of calculation (client local time if provided)."""
+    local_time_str = data.get("local_time")
+    tz_offset = data.get("timezone_offset")
+
+    try:
+        if local_time_str and tz_offset is not None:
+            client_time = datetime.fromisoformat(local_time_str.replace("Z", "+00:00"))
+            offset = timedelta(minutes=-int(tz_offset))  # JS offset is minutes *behind* UTC
+            local_time = client_time + offset
+            return local_time.strftime("%Y-%m-%d %H:%M:%S")
+        return datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+    except Exception as e:
+        print("⚠️ Failed to set calculation_time:", local_time_str, tz_offset, e)
+        return datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def restamp_quote(response: OrderedDict, data: dict) -> OrderedDict:
+    """Refresh a cached quote for a new request: same prices, this request's time and echoed inputs."""
+    response["source"] = data.get("source")
+    response["destination"] = data.get("destination")
+    response["calculation_time"] = get_calculation_time(data)
+    response["breakdown"] = format_breakdown(response)
+    response["window_film"] = data.get("window_film") or {}
+    response["skid_steer"] = data.get("skid_steer")
+    return response
+
+
+def price_quote(data: dict, distance_info: dict, snapshot, breakdown=True) -> OrderedDict:
+    """The /calculate response. breakdown=False skips the text breakdown (simulations only need the numbers)."""
+    tow_type = data.get("tow_type")
+    services = data.get("services", [])
+    is_accident = data.get("is_accident") == "yes"
+    source = data.get("source")
+    destination = data.get("destination")
+    # Extra service-specific inputs from frontend
+    window_film_entries = data.get("window_film") or {}
+    skid_steer_entries = data.get("skid_steer")
+    if not isinstance(window_film_entries, dict):
+        raise QuoteError("window_film must be an object")
+    if skid_steer_entries is not None and not isinstance(skid_steer_entries, dict):
+        raise QuoteError("skid_steer must be an object")
+    side_window = window_film_entries.get("side_window", 0)
+    front_or_back_window = window_film_entries.get("front_or_back_window", 0)
+    skid_steer_hours = (skid_steer_entries or {}).get("hours", 0)
+    for name, value in (("side_window", side_window), ("front_or_back_window", front_or_back_window),
+                        ("hours", skid_steer_hours)):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise QuoteError(f"{name} must be a number")
+
+    g_miles_actual = distance_info["g_miles"]
+    g_miles = math.ceil(g_miles_actual)
+    distance_text = f"{g_miles} mi"
+    distance_text_actual = f"{g_miles_actual} mi"
+    # Overwrite with Google's resolved addresses
+    resolved_source = distance_info["resolved_origin"]
+    resolved_destination = distance_info["resolved_destination"]
+
+    tow_plan = snapshot.plans.get(tow_type) if isinstance(tow_type, str) else None
+    if tow_plan is None:
+        raise QuoteError(f"Invalid tow type: {tow_type}")
+    if not services:
+        raise QuoteError("At least one service is required")
+
+    selected_mask = tow_plan.selection_mask(services)
+    # Request-level inputs (bucket miles, every modifier) resolved once for all services
+    with metrics.span("context"):
+        context = build_quote_context(data, snapshot, g_miles)
+    bucket_miles = context.bucket_miles
+
+    breakdowns = []
+    standard_total = 0   # before upcharges
+    todynamiq_total = 0  # after upcharges
+    overall_pct_chng = 0.0
+
+    for service in services:
+        service_started = time.perf_counter()
+        plan = tow_plan.services.get(service)
+        if plan is None:
+            raise QuoteError(f"Invalid service: {service}")
+
+        pricing_type = plan.pricing_type
+
+        # -------------------------
+        # 1. Apply addon/accident overrides
+        # -------------------------
+        base_rate, service_cfg = plan.resolve_base_rate(selected_mask, is_accident)
+
+        # -------------------------
+        # 2. Build inputs for calculators
+        # -------------------------
+        inputs = {"miles": bucket_miles}
+
+        # Window Film → capture both side and front/back counts
+        if plan.input_kind == "window_film":
+            inputs["side_window"] = side_window
+            inputs["front_or_back_window"] = front_or_back_window
+
+        # Skid Steer → capture hours (convert to minutes for time-based calc)
+        elif plan.input_kind == "skid_steer":
+            inputs["unit_type"] = "hours"
+            inputs["count"] = skid_steer_hours
+            inputs["duration_minutes"] = int(skid_steer_hours) * 60
+
+        # -------------------------
+        # 3. Dispatch to calculator (bucket miles calc)
+        # -------------------------
+        if plan.calculator is not None:
+            calc_result = plan.calculator(service_cfg, inputs)
+            bucket_subtotal = calc_result["subtotal"]
+        else:
+            calc_result = {"subtotal": base_rate}
+            bucket_subtotal = base_rate
+
+        # -------------------------
+        # 3b. Calculate "standard" subtotal (rounded miles)
+        # -------------------------
+        if pricing_type == "flat":
+            rounded_miles_charged = max(0, g_miles - plan.includes)  # g_miles already ceil’d above
+            mileage_cost_rounded = rounded_miles_charged * plan.per_mile
+            standard_subtotal = base_rate + mileage_cost_rounded
+        else:
+            standard_subtotal = bucket_subtotal
+
+        # -------------------------
+        # 4. Apply per-service modifiers
+        # -------------------------
+        service_upcharges = {}
+        combined_mod_pct = 0.0
+
+        for mod_name in plan.modifiers:
+            value = context.upcharge(mod_name)
+            service_upcharges[mod_name] = value
+            combined_mod_pct += value
+
+        # -------------------------
+        # Dynamic cap based on subtotal bands
+        # -------------------------
+        max_cap = snapshot.upcharge_bands.lookup(standard_subtotal)
+        combined_mod_pct = min(combined_mod_pct, max_cap)
+
+        upcharge_amount = round(standard_subtotal * combined_mod_pct, 2)
+
+        # -------------------------
+        # 5. Final amounts
+        # -------------------------
+        mileage_upcharge = bucket_subtotal - standard_subtotal
+        service_total = round(standard_subtotal + mileage_upcharge + upcharge_amount, 2)
+
+        breakdowns.append({
+            "service": plan.label,
+            "pricing_type": pricing_type,
+            "standard_quote": round(standard_subtotal, 2),
+            "calc_details": calc_result,
+            "upcharges": service_upcharges,
+            "combined_upcharge_pct": round(combined_mod_pct, 3),
+            "upcharge_amount": upcharge_amount,
+            "mileage_upcharge": mileage_upcharge,
+            "todynamiq_quote": service_total
+        })
+
+        standard_total += standard_subtotal
+        todynamiq_total += service_total
+        if standard_total:
+            overall_pct_chng = (todynamiq_total-standard_total)/standard_total * 100
+        metrics.observe_service(tow_type, service, time.perf_counter() - service_started)
+
+
+    calculation_time = get_calculation_time(data)
+
+    # -------------------------
+    # ✅ RESPONSE
+    # -------------------------
+    response = OrderedDict()
+    # User input
+    response["source"] = source
+    response["destination"] = destination
+    # Google resolved addresses
+    response["source_resolved"] = resolved_source
+    response["destination_resolved"] = resolved_destination
+
+    # Distance
+    response["distance_miles"] = g_miles          # Rounded miles
+    response["bucket_miles"] = bucket_miles       # True billable miles
+    response["distance_text"] = distance_text
+    response["distance_provider"] = distance_info.get("provider", "google")   # google / cache / local estimate
+    deadhead = distance_info.get("deadhead")
+    if deadhead:
+        # Yard mileage: distance_miles covers start -> pickup -> drop
+        response["mileage_from"] = "yard"
+        response["start_point"] = deadhead["start"]
+        response["start_address"] = deadhead["start_address"]
+        response["deadhead_miles"] = deadhead["miles"]
+        response["trip_miles"] = deadhead["trip_miles"]
+
+    # Tow info
+    response["tow_type"] = tow_type
+    response["services"] = breakdowns
+    response["calculation_time"] = calculation_time
+    response["distance_text_actual"] = distance_text_actual
+
+
+    # Pricing
+    response["standard_quote"] = round(standard_total, 2)   # 👈 before modifiers
+    response["overall_pct_chng"] = round(overall_pct_chng, 2)   # 👈 before modifiers
+    response["todynamiq_quote"] = round(todynamiq_total, 2) # 👈 after modifiers
+
+
+    # Breakdown string
+    if breakdown:
+        with metrics.span("breakdown"):
+            response["breakdown"] = format_breakdown(response)
+
+    response["window_film"] = window_film_entries
+    response["skid_steer"] = skid_steer_entries
+
+    return response
@@ -0,0 +1,99 @@
+import json, time, hashlib, threading
+from collections import OrderedDict
+from helper.distance_cache import normalize_address
+from helper.time_slots import client_local_time
+from helper.fleet import utilization_band
+from helper import metrics
+
+# ------------------- Quote Result Cache -------------------
+#
+# Dispatchers resubmit the same /calculate payload (re-clicks, refreshes,
+# copying the breakdown). Finished quotes are kept for a few minutes, keyed on
+# everything that can change the price:
+#   - the catalog version, so editing pricing.json / dynamic_modifiers.json
+#     invalidates every entry,
+#   - the resolved time-of-day slot instead of the raw client clock, so the
+#     same job re-quoted within the same slot is a hit,
+#   - normalized source/destination (same normalization as the distance cache),
+#   - the mileage mode inputs (yard availability is part of the catalog version).
+# A hit skips both the distance lookup and pricing; only calculation_time and
+# the echoed inputs are refreshed (see helper.quote.restamp_quote).
+
+
+class QuoteCache:
+    """LRU + TTL cache of price_quote responses."""
+
+    def __init__(self, max_entries=2000, ttl_seconds=300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()   # key -> (stored_at, response)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    @staticmethod
+    def key(data: dict, snapshot) -> str:
+        time_slot, _ = snapshot.time_slots.lookup(client_local_time(data))
+        fields = [
+            snapshot.version,
+            data.get("tow_type"),
+            data.get("services"),            # request order: it is the order of the breakdown
+            data.get("is_accident") == "yes",
+            normalize_address(str(data.get("source"))),
+            normalize_address(str(data.get("destination"))),
+            data.get("make"),
+            data.get("model"),
+            data.get("unsafe_location"),
+            data.get("weather"),
+            time_slot,
+            utilization_band(data, snapshot)[0],   # surge band from the live fleet state
+            data.get("window_film"),
+            data.get("skid_steer"),
+            data.get("mileage_from"),
+            data.get("repeat_customer"),
+            normalize_address(str(data.get("driver_start") or "")),
+        ]
+        canonical = json.dumps(fields, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+    def get(self, key):
+        """A copy of the cached response, or None."""
+        if not self.enabled:
+            return None
+        now = time.time()
+        response = None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                response = OrderedDict(entry[1])
+            else:
+                self.misses += 1
+        metrics.count_cache("quote", response is not None)
+        return response
+
+    def set(self, key, response):
+        # Local distance estimates are a fallback: don't keep serving them once Google is back
+        if not self.enabled or response.get("distance_provider") == "local":
+            return
+        with self._lock:
+            self._entries[key] = (time.time(), OrderedDict(response))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
@@ -0,0 +1,187 @@
+import os, time, uuid, queue, atexit, threading
+from datetime import datetime
+from helper import metrics
+from helper.time_slots import client_local_time
+
+# ------------------- Quote Log -------------------
+#
+# Every quote we hand out is recorded (quote_log, quote_log_services and
+# quote_log_modifiers in app.py) for acceptance, revenue and modifier
+# analysis. The request thread only builds a small record and puts it on a
+# bounded in-memory queue. A background thread drains the queue and writes
+# batches of up to `batch_size` records with one bulk insert per table, at
+# least every `flush_interval` seconds. If the database falls behind and
+# the queue fills up, records are dropped and counted
+# (towdynamiq_quote_log_total{outcome="dropped"}); quoting never blocks.
+
+
+def hour_of(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def quote_dimensions(data: dict, snapshot):
+    """(weather, vehicle_location, time_slot) the quote was priced under; "none" when absent or unknown."""
+    modifiers = snapshot.dynamic_modifiers
+    weather = data.get("weather")
+    if weather not in modifiers.get("weather", {}):
+        weather = "none"
+    location = "none"
+    unsafe_location = data.get("unsafe_location")
+    if isinstance(unsafe_location, dict):
+        road_type, lane = unsafe_location.get("road_type"), unsafe_location.get("lane")
+        if lane in modifiers.get("vehicle_location", {}).get(road_type, {}).get("lanes", {}):
+            location = f"{road_type}/{lane}"
+    time_slot, _ = snapshot.time_slots.lookup(client_local_time(data))
+    return weather, location, time_slot or "none"
+
+
+def quote_record(data: dict, response: dict, endpoint: str, snapshot, username=None, cache_hit=False):
+    """Flat rows for one quote: {"quote": {...}, "services": [...], "modifiers": [...]}."""
+    created_at = datetime.utcnow()
+    weather, vehicle_location, time_slot = quote_dimensions(data, snapshot)
+    quote_id = response["quote_id"]
+    services = data.get("services") or []
+    tow_type = response.get("tow_type")
+    record = {
+        "quote": {
+            "id": quote_id,
+            "created_at": created_at,
+            "hour": hour_of(created_at),
+            "endpoint": endpoint,
+            "username": username,
+            "tow_type": tow_type,
+            "services": ",".join(services),
+            "source": response.get("source_resolved") or response.get("source"),
+            "destination": response.get("destination_resolved") or response.get("destination"),
+            "distance_miles": response.get("distance_miles"),
+            "bucket_miles": response.get("bucket_miles"),
+            "distance_provider": response.get("distance_provider"),
+            "standard_quote": response.get("standard_quote"),
+            "todynamiq_quote": response.get("todynamiq_quote"),
+            "overall_pct_chng": response.get("overall_pct_chng"),
+            "weather": weather,
+            "vehicle_location": vehicle_location,
+            "time_slot": time_slot,
+            "catalog_version": snapshot.version,
+            "cache_hit": cache_hit,
+            "payload": data,
+        },
+        "services": [],
+        "modifiers": [],
+    }
+    for code, line in zip(services, response.get("services", [])):
+        record["services"].append({
+            "quote_id": quote_id,
+            "created_at": created_at,
+            "tow_type": tow_type,
+            "service": code,
+            "pricing_type": line["pricing_type"],
+            "standard_quote": line["standard_quote"],
+            "todynamiq_quote": line["todynamiq_quote"],
+            "combined_upcharge_pct": line["combined_upcharge_pct"],
+            "upcharge_amount": line["upcharge_amount"],
+        })
+        for modifier, upcharge in line["upcharges"].items():
+            record["modifiers"].append({
+                "quote_id": quote_id,
+                "created_at": created_at,
+                "service": code,
+                "modifier": modifier,
+                "upcharge": upcharge,
+            })
+    return record
+
+
+class QuoteLogWriter:
+    """Bounded queue + background thread that hands batches of records to `flush(records)`."""
+
+    def __init__(self, flush, enabled=True, queue_size=10000, batch_size=500, flush_interval=1.0):
+        self.flush = flush
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._pending = 0                       # queued or being written
+        self._idle = threading.Condition()
+
+    def _ensure_thread(self):
+        # Started lazily so every gunicorn worker (forked after import) gets its own thread
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="quote-log", daemon=True)
+                self._thread.start()
+                atexit.register(self.drain)
+
+    def log(self, record):
+        if not self.enabled:
+            return
+        self._ensure_thread()
+        with self._idle:
+            self._pending += 1
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._done(1)
+            self.dropped += 1
+            metrics.count_quote_log("dropped")
+
+    def _next_batch(self, timeout):
+        batch = []
+        deadline = time.monotonic() + timeout
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _done(self, n):
+        with self._idle:
+            self._pending -= n
+            if not self._pending:
+                self._idle.notify_all()
+
+    def _write(self, batch):
+        try:
+            self.flush(batch)
+            self.written += len(batch)
+            metrics.count_quote_log("written", len(batch))
+        except Exception as e:
+            self.failed += len(batch)
+            metrics.count_quote_log("failed", len(batch))
+            print(f"⚠️ Quote log write failed, {len(batch)} quotes lost: {e}")
+        finally:
+            self._done(len(batch))
+
+    def _run(self):
+        while True:
+            batch = self._next_batch(self.flush_interval)
+            if batch:
+                self._write(batch)
+
+    def drain(self, timeout=10.0):
+        """Write whatever is queued now and wait for the batch in flight (at exit, and in tests)."""
+        while True:
+            batch = self._next_batch(0)
+            if not batch:
+                break
+            self._write(batch)
+        with self._idle:
+            self._idle.wait_for(lambda: not self._pending, timeout)
+
+    def stats(self):
+        return {"queued": self._queue.qsize(), "written": self.written, "dropped": self.dropped, "failed": self.failed}
+
+
+def new_quote_id() -> str:
+    return uuid.uuid4().hex
@@ -0,0 +1,41 @@
+from datetime import datetime
+
+# ------------------- Quote Rollups -------------------
+#
+# Hourly and daily aggregates of the quote log's service lines, kept in
+# quote_rollups (app.py) so dashboards never scan the raw log. One rollup row
+# per (period, bucket, tow_type, service, weather, vehicle_location,
+# time_slot) holds the line count (`lines`) and the sums of standard_quote,
+# todynamiq_quote and combined_upcharge_pct (average = sum / lines).
+#
+# The rollup job (`flask --app app rollup-quotes`) only reads service lines
+# past its high-water mark (the last quote_log_services.id folded in), groups
+# them by the log's `hour` column in SQL and adds the deltas below to the
+# existing rows. Lines younger than ROLLUP_LAG_SECONDS are left for the next
+# run, so batches still being committed by other workers are not skipped.
+
+PERIODS = ("hour", "day")
+DIMENSIONS = ("tow_type", "service", "weather", "vehicle_location", "time_slot")
+ROLLUP_KEY = ("period", "bucket") + DIMENSIONS
+
+
+def bucket_of(hour: datetime, period: str) -> datetime:
+    return hour if period == "hour" else hour.replace(hour=0)
+
+
+def rollup_deltas(groups):
+    """
+    {(period, bucket, *dimensions): [lines, standard_sum, todynamiq_sum, upcharge_pct_sum]}
+    from hourly groups (hour, *dimensions, lines, standard_sum, todynamiq_sum, upcharge_pct_sum).
+    """
+    deltas = {}
+    n = len(DIMENSIONS)
+    for row in groups:
+        hour = row[0]
+        dimensions = tuple(value or "none" for value in row[1:1 + n])
+        measures = row[1 + n:]
+        for period in PERIODS:
+            total = deltas.setdefault((period, bucket_of(hour, period), *dimensions), [0, 0.0, 0.0, 0.0])
+            for i, value in enumerate(measures):
+                total[i] += value or 0
+    return deltas
@@ -0,0 +1,61 @@
+import random, hashlib
+
+# ------------------- Synthetic Quote Scenarios -------------------
+#
+# Seeded /calculate payloads drawn from a catalog snapshot, and a
+# deterministic stand-in for get_distance. Shared by the benchmarks
+# (benchmarks/bench_quote.py) and the synthetic mode of helper.simulate, so
+# both price the same reproducible quote mix without network access.
+
+
+# ------------------- Stubbed Distance -------------------
+
+def fake_distance(origin, destination):
+    """Deterministic stand-in for get_distance: 1-400 miles from a hash of the pair."""
+    digest = int(hashlib.md5(f"{origin}|{destination}".encode()).hexdigest(), 16)
+    return {
+        "g_miles": round(1 + (digest % 399000) / 1000.0, 2),
+        "resolved_origin": origin.upper(),
+        "resolved_destination": destination.upper(),
+    }
+
+def fake_distances(pairs):
+    return {pair: fake_distance(*pair) for pair in pairs}
+
+
+# ------------------- Scenarios -------------------
+
+def build_scenarios(snapshot, count, seed):
+    """`count` /calculate payloads covering every tow type, service mix and modifier value."""
+    rnd = random.Random(seed)
+    dm = snapshot.dynamic_modifiers
+    makes = [(make, list(entry["models"])) for make, entry in snapshot.cars.items() if entry["models"]]
+    locations = [None] + [
+        {"road_type": road_type, "lane": lane}
+        for road_type, road in dm.get("vehicle_location", {}).items() for lane in road["lanes"]
+    ]
+    weathers = [None, *dm.get("weather", {})]
+    hours = list(range(24))
+
+    scenarios = []
+    for i in range(count):
+        tow_type = rnd.choice(list(snapshot.pricing))
+        services = list(snapshot.pricing[tow_type])
+        picked = rnd.sample(services, min(rnd.randint(1, 3), len(services)))
+        make, models = rnd.choice(makes)
+        scenarios.append({
+            "tow_type": tow_type,
+            "services": picked,
+            "is_accident": rnd.choice(["yes", "no"]) if "window_film" not in picked else "no",
+            "source": f"{rnd.randint(100, 9999)} Main St, Birmingham, AL",
+            "destination": f"{rnd.randint(100, 9999)} 2nd Ave N, Birmingham, AL",
+            "make": make,
+            "model": rnd.choice(models),
+            "unsafe_location": rnd.choice(locations),
+            "weather": rnd.choice(weathers),
+            "local_time": f"2025-10-{rnd.randint(1, 28):02d}T{rnd.choice(hours):02d}:{rnd.randint(0, 59):02d}:00.000Z",
+            "timezone_offset": 300,
+            "window_film": {"side_window": rnd.randint(0, 3), "front_or_back_window": rnd.randint(0, 2)},
+            "skid_steer": {"hours": rnd.choice([0, 1, 2, 3.5])},
+        })
+    return scenarios
@@ -0,0 +1,191 @@
+import re, csv, heapq
+from bisect import bisect_left
+from collections import defaultdict
+
+# ------------------- Make/Model Search Index -------------------
+#
+# Autocomplete over the pricing catalog (make_model_modifiers.json) and the
+# US make/model/year list (helper/car_makes_models_us.csv). Built once per
+# catalog snapshot:
+#   - every make/model/year word goes into a sorted vocabulary (prefix lookups
+#     are a bisect into it),
+#   - every vocabulary word is indexed by its trigrams (typo-tolerant lookups),
+#   - every word has a posting list of the vehicles it appears in.
+# A query word expands to matching vocabulary words, and a vehicle matches if
+# every query word hit it, so "chevy silv" finds Chevrolet Silverado.
+
+# Common shorthand dispatchers type for makes
+MAKE_ALIASES = {
+    "chevy": "chevrolet",
+    "vw": "volkswagen",
+    "merc": "mercedes",
+    "benz": "mercedes",
+    "mb": "mercedes",
+    "caddy": "cadillac",
+    "olds": "oldsmobile",
+    "lambo": "lamborghini",
+    "beemer": "bmw",
+}
+
+_WORD = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+
+
+def tokenize(text):
+    """Words of `text`; hyphenated words also yield their joined form ("f-150" -> f, 150, f150)."""
+    words = []
+    for word in _WORD.findall(text.casefold()):
+        if "-" in word:
+            words.extend(word.split("-"))
+            words.append(word.replace("-", ""))
+        else:
+            words.append(word)
+    return words
+
+
+def query_words(text):
+    """Query words; a hyphenated word is kept whole ("f-150" -> f150) so it matches as one term."""
+    return [word.replace("-", "") for word in _WORD.findall(text.casefold())]
+
+
+def trigrams(word):
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class VehicleSearchIndex:
+    def __init__(self, cars: dict, csv_path=None, fuzzy_threshold=0.45, expansion_cache_size=4096):
+        self.fuzzy_threshold = fuzzy_threshold
+        self.expansion_cache_size = expansion_cache_size
+        self._expansions = {}
+        self.docs = []               # [{"make", "model", "label", "years", "in_catalog"}]
+        self._doc_words = []         # per doc: {word: weight}
+
+        # ---- documents: catalog models first, then CSV-only vehicles ----
+        by_pair = {}
+        make_keys = {}
+        for make_key, make in cars.items():
+            make_keys[make_key.casefold()] = make_key
+            for model_key, model in make["models"].items():
+                by_pair[(make_key.casefold(), model_key.casefold())] = self._add_doc(
+                    make_key, model_key, f"{make['label']} {model.get('label', model_key)}", True
+                )
+
+        if csv_path:
+            with open(csv_path, newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    make, model = row["make"].strip(), row["model"].strip()
+                    pair = (make.casefold(), model.casefold())
+                    doc_id = by_pair.get(pair)
+                    if doc_id is None:
+                        make_name = make_keys.get(pair[0], make)
+                        doc_id = by_pair[pair] = self._add_doc(make_name, model, f"{make_name} {model}", False)
+                    year = (row.get("year") or "").strip()
+                    if year.isdigit():
+                        self.docs[doc_id]["years"].add(int(year))
+
+        # ---- word -> docs postings, sorted vocabulary, trigram index ----
+        postings = defaultdict(list)
+        for doc_id, doc in enumerate(self.docs):
+            words = self._doc_words[doc_id]
+            for year in doc["years"]:
+                words.setdefault(str(year), 1.0)
+            for word in words:
+                postings[word].append(doc_id)
+            years = sorted(doc["years"])
+            doc["years"] = [years[0], years[-1]] if years else []
+
+        self.vocabulary = sorted(postings)
+        self.postings = {word: tuple(ids) for word, ids in postings.items()}
+        self.trigram_index = defaultdict(list)
+        self.trigram_counts = {}
+        for word in self.vocabulary:
+            if not word.isdigit():
+                grams = trigrams(word)
+                self.trigram_counts[word] = len(grams)
+                for gram in grams:
+                    self.trigram_index[gram].append(word)
+
+    def _add_doc(self, make, model, label, in_catalog):
+        words = {}
+        for word in tokenize(model):
+            words[word] = 1.0
+        for word in tokenize(make):
+            words.setdefault(word, 0.9)   # model hits rank slightly above make hits
+        self.docs.append({"make": make, "model": model, "label": label, "years": set(), "in_catalog": in_catalog})
+        self._doc_words.append(words)
+        return len(self.docs) - 1
+
+    # ---- lookups ----
+
+    def _prefix_words(self, prefix):
+        i = bisect_left(self.vocabulary, prefix)
+        while i < len(self.vocabulary) and self.vocabulary[i].startswith(prefix):
+            yield self.vocabulary[i]
+            i += 1
+
+    def _fuzzy_words(self, word):
+        grams = trigrams(word)
+        counts = defaultdict(int)
+        for gram in grams:
+            for candidate in self.trigram_index.get(gram, ()):
+                counts[candidate] += 1
+        for candidate, shared in counts.items():
+            similarity = 2 * shared / (len(grams) + self.trigram_counts[candidate])  # Dice coefficient
+            if similarity >= self.fuzzy_threshold:
+                yield candidate, similarity
+
+    def _expand(self, query_word):
+        """{vocabulary word: match score} for one query word (memoized, typed prefixes repeat a lot)."""
+        matches = self._expansions.get(query_word)
+        if matches is None:
+            matches = self._expand_uncached(query_word)
+            if len(self._expansions) >= self.expansion_cache_size:
+                self._expansions.clear()
+            self._expansions[query_word] = matches
+        return matches
+
+    def _expand_uncached(self, query_word):
+        matches = {}
+        spellings = [query_word]
+        if query_word in MAKE_ALIASES:
+            spellings.append(MAKE_ALIASES[query_word])
+        for word in spellings:
+            if word in self.postings:
+                matches[word] = 3.0
+        for word in spellings:
+            for candidate in self._prefix_words(word):
+                matches.setdefault(candidate, 2.0 + len(word) / len(candidate))
+        # typo tolerance only when the word matched nothing as typed
+        if not matches:
+            for word in spellings:
+                if not word.isdigit() and len(word) >= 3:
+                    for candidate, similarity in self._fuzzy_words(word):
+                        matches.setdefault(candidate, 2.0 * similarity)
+        return matches
+
+    def search(self, query: str, limit: int = 10):
+        words = query_words(query)
+        if not words:
+            return []
+
+        scores = None
+        for word in words:
+            word_scores = {}
+            for candidate, match in self._expand(word).items():
+                for doc_id in self.postings[candidate]:
+                    score = match * self._doc_words[doc_id].get(candidate, 1.0)
+                    if score > word_scores.get(doc_id, 0.0):
+                        word_scores[doc_id] = score
+            if scores is None:
+                scores = word_scores
+            else:
+                # every query word must hit the vehicle
+                scores = {doc_id: scores[doc_id] + s for doc_id, s in word_scores.items() if doc_id in scores}
+            if not scores:
+                return []
+
+        best = heapq.nsmallest(
+            limit, scores.items(),
+            key=lambda item: (-item[1], not self.docs[item[0]]["in_catalog"], self.docs[item[0]]["label"]),
+        )
+        return [{**self.docs[doc_id], "score": round(score, 3)} for doc_id, score in best]
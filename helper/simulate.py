@@ -0,0 +1,225 @@
+import os, json, itertools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from helper.catalog import PricingCatalog
+from helper.quote import price_quote, QuoteError
+from helper import metrics
+from helper.scenarios import build_scenarios, fake_distance
+
+# ------------------- Pricing Policy Simulator -------------------
+#
+# Replays a quote mix against two catalogs (e.g. data/ and a copy with an
+# edited pricing.csv rebuilt by `generate_json_assets --data-dir`) and
+# compares revenue, per-service totals and the distribution of quotes.
+# Every scenario is priced by helper.quote.price_quote, the same code as
+# /calculate, with the distance taken from the scenario (no Google calls).
+#
+#   python -m helper.simulate --old data --new /tmp/data-new --scenarios history.jsonl
+#   python -m helper.simulate --old data --new /tmp/data-new --synthetic 1000000 --workers 8
+#
+# Scenarios are /calculate payloads, one per JSONL line, with the actual
+# miles in "g_miles". Synthetic scenarios (the benchmark mix) are generated
+# inside the workers, shard by shard, so nothing big crosses processes.
+# Each shard returns per-scenario totals as arrays plus per-service sums.
+
+SHARD_SIZE = 5000
+DISTRIBUTIONS = ("standard_quote", "todynamiq_quote", "overall_pct_chng")
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+# ------------------- Workers -------------------
+
+_catalogs = None
+
+def _init_worker(old_dir, new_dir):
+    global _catalogs
+    metrics.METRICS_ENABLED = False   # nobody scrapes a simulator
+    _catalogs = (PricingCatalog(old_dir).get(), PricingCatalog(new_dir).get())
+
+def scenario_distance(payload):
+    miles = payload.get("g_miles", payload.get("distance_miles"))
+    return {
+        "g_miles": float(miles),
+        "resolved_origin": payload.get("source", ""),
+        "resolved_destination": payload.get("destination", ""),
+    }
+
+def simulate_shard(task):
+    """Price one shard under both catalogs. `task` is ("payloads", [...]) or ("synthetic", seed, shard, size)."""
+    old, new = _catalogs
+    if task[0] == "synthetic":
+        _, seed, shard, size = task
+        payloads = build_scenarios(old, size, seed * 1_000_003 + shard)
+        for payload in payloads:
+            payload["g_miles"] = fake_distance(payload["source"], payload["destination"])["g_miles"]
+    else:
+        payloads = task[1]
+
+    totals = {f"{side}.{field}": [] for side in ("old", "new") for field in DISTRIBUTIONS}
+    services = {}   # (tow_type, service) -> [count, old standard, new standard, old todynamiq, new todynamiq]
+    errors = {"old": 0, "new": 0, "input": 0}
+    for payload in payloads:
+        try:
+            distance_info = scenario_distance(payload)
+        except (TypeError, ValueError):
+            errors["input"] += 1
+            continue
+        quotes = {}
+        for side, snapshot in (("old", old), ("new", new)):
+            try:
+                quotes[side] = price_quote(payload, distance_info, snapshot, breakdown=False)
+            except (QuoteError, AttributeError, KeyError, TypeError, ValueError):
+                errors[side] += 1
+        if len(quotes) < 2:
+            continue
+        for side, quote in quotes.items():
+            for field in DISTRIBUTIONS:
+                totals[f"{side}.{field}"].append(quote[field])
+        for code, old_line, new_line in zip(payload["services"], quotes["old"]["services"], quotes["new"]["services"]):
+            entry = services.setdefault((payload["tow_type"], code), [0, 0.0, 0.0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += old_line["standard_quote"]
+            entry[2] += new_line["standard_quote"]
+            entry[3] += old_line["todynamiq_quote"]
+            entry[4] += new_line["todynamiq_quote"]
+    arrays = {name: np.asarray(values, dtype=np.float64) for name, values in totals.items()}
+    return len(payloads), arrays, services, errors
+
+
+# ------------------- Driver -------------------
+
+def read_scenarios(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def shard_tasks(scenarios_path=None, synthetic=0, seed=1234, shard_size=SHARD_SIZE):
+    if synthetic:
+        for shard, start in enumerate(range(0, synthetic, shard_size)):
+            yield ("synthetic", seed, shard, min(shard_size, synthetic - start))
+        return
+    scenarios = read_scenarios(scenarios_path)
+    for chunk in iter(lambda: list(itertools.islice(scenarios, shard_size)), []):
+        yield ("payloads", chunk)
+
+def run_simulation(old_dir, new_dir, tasks, workers=None):
+    """Merged (scenario count, arrays, services, errors) over every shard."""
+    workers = workers or os.cpu_count() or 1
+    count = 0
+    arrays = {}
+    services = {}
+    errors = {"old": 0, "new": 0, "input": 0}
+
+    def merge(result):
+        nonlocal count
+        shard_count, shard_arrays, shard_services, shard_errors = result
+        count += shard_count
+        for name, values in shard_arrays.items():
+            arrays.setdefault(name, []).append(values)
+        for key, entry in shard_services.items():
+            total = services.setdefault(key, [0, 0.0, 0.0, 0.0, 0.0])
+            for i, value in enumerate(entry):
+                total[i] += value
+        for side, n in shard_errors.items():
+            errors[side] += n
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(old_dir, new_dir)) as pool:
+        in_flight = deque()
+        for task in tasks:
+            in_flight.append(pool.submit(simulate_shard, task))
+            if len(in_flight) >= workers * 2:
+                merge(in_flight.popleft().result())
+        while in_flight:
+            merge(in_flight.popleft().result())
+
+    arrays = {name: np.concatenate(parts) for name, parts in arrays.items()}
+    return count, arrays, services, errors
+
+
+def distribution(values):
+    if not len(values):
+        return None
+    stats = {f"p{p}": round(float(v), 2) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+    stats["mean"] = round(float(values.mean()), 2)
+    return stats
+
+def pct_change(old, new):
+    return round((new - old) / old * 100, 2) if old else None
+
+def build_report(old_dir, new_dir, count, arrays, services, errors):
+    priced = len(arrays.get("old.todynamiq_quote", ()))
+    revenue = {
+        side: {
+            "standard": round(float(arrays[f"{side}.standard_quote"].sum()), 2) if priced else 0.0,
+            "todynamiq": round(float(arrays[f"{side}.todynamiq_quote"].sum()), 2) if priced else 0.0,
+        }
+        for side in ("old", "new")
+    }
+    revenue["delta_todynamiq"] = round(revenue["new"]["todynamiq"] - revenue["old"]["todynamiq"], 2)
+    revenue["delta_pct"] = pct_change(revenue["old"]["todynamiq"], revenue["new"]["todynamiq"])
+
+    distributions = {name: distribution(values) for name, values in sorted(arrays.items())}
+    if priced:
+        distributions["delta.todynamiq_quote"] = distribution(arrays["new.todynamiq_quote"] - arrays["old.todynamiq_quote"])
+
+    per_service = []
+    for (tow_type, code), (n, old_std, new_std, old_td, new_td) in services.items():
+        per_service.append({
+            "tow_type": tow_type, "service": code, "count": n,
+            "old_standard": round(old_std, 2), "new_standard": round(new_std, 2),
+            "old_todynamiq": round(old_td, 2), "new_todynamiq": round(new_td, 2),
+            "delta": round(new_td - old_td, 2), "delta_pct": pct_change(old_td, new_td),
+        })
+    per_service.sort(key=lambda s: abs(s["delta"]), reverse=True)
+
+    return {
+        "old": {"data_dir": old_dir, "version": PricingCatalog(old_dir).get().version},
+        "new": {"data_dir": new_dir, "version": PricingCatalog(new_dir).get().version},
+        "scenarios": count,
+        "priced": priced,
+        "errors": errors,
+        "revenue": revenue,
+        "distributions": distributions,
+        "services": per_service,
+    }
+
+
+if __name__ == "__main__":
+    import time, argparse
+    from helper import simulate   # pool tasks must pickle as helper.simulate.*, not __main__.*
+
+    parser = argparse.ArgumentParser(description="Compare two pricing catalogs on the same quote mix.")
+    parser.add_argument("--old", default="data", help="current catalog data dir")
+    parser.add_argument("--new", required=True, help="candidate catalog data dir")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--scenarios", help="JSONL of /calculate payloads with g_miles")
+    source.add_argument("--synthetic", type=int, help="generate this many scenarios instead")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE)
+    parser.add_argument("--out", help="write the full report to this JSON file")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    tasks = simulate.shard_tasks(args.scenarios, args.synthetic or 0, args.seed, args.shard_size)
+    count, arrays, services, errors = simulate.run_simulation(args.old, args.new, tasks, args.workers)
+    report = build_report(args.old, args.new, count, arrays, services, errors)
+    elapsed = time.perf_counter() - started
+
+    revenue = report["revenue"]
+    print(f"✅ {count:,} scenarios ({report['priced']:,} priced by both) in {elapsed:.1f}s on {args.workers} workers")
+    print(f"   catalog {report['old']['version']} -> {report['new']['version']}")
+    print(f"   TowDynamiq revenue {revenue['old']['todynamiq']:,.2f} -> {revenue['new']['todynamiq']:,.2f} "
+          f"({revenue['delta_todynamiq']:+,.2f}, {revenue['delta_pct']}%)")
+    print(f"   standard revenue   {revenue['old']['standard']:,.2f} -> {revenue['new']['standard']:,.2f}")
+    if any(errors.values()):
+        print(f"⚠️ errors: {errors}")
+    for entry in report["services"][:10]:
+        print(f"   {entry['tow_type']:<12} {entry['service']:<20} n={entry['count']:<8,} "
+              f"{entry['old_todynamiq']:>14,.2f} -> {entry['new_todynamiq']:>14,.2f} ({entry['delta_pct']}%)")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report saved to {os.path.abspath(args.out)}")
@@ -0,0 +1,246 @@
+import numpy as np
+
+# ------------------- Vectorized Pricing Sweeps -------------------
+#
+# Array version of helper.quote.price_quote for pricing whole grids of
+# scenarios at once (services x miles x weather x lane x time slot ...).
+# Every step mirrors the scalar path operation for operation, in the same
+# order, so results are bit-for-bit identical to /calculate:
+#   - sums are accumulated in the same order starting from the same value,
+#   - Python's round() is reproduced exactly (see py_round).
+
+
+# ------------------- Exact round() -------------------
+
+_SPLITTER = 134217729.0  # 2**27 + 1, Dekker split for float64
+
+def _two_product(a, b):
+    """p, err with p = fl(a*b) and p + err == a*b exactly."""
+    p = a * b
+    t = _SPLITTER * a
+    ah = t - (t - a)
+    al = a - ah
+    t = _SPLITTER * b
+    bh = t - (t - b)
+    bl = b - bh
+    err = ((ah * bh - p) + ah * bl + al * bh) + al * bl
+    return p, err
+
+def py_round(x, ndigits):
+    """
+    Elementwise equivalent of Python's round(x, ndigits) for float64 arrays.
+
+    np.round scales by 10**ndigits in floating point, which can move a value
+    across the .5 boundary. Here the scaled value is kept exact as p + err and
+    rounded half-to-even on that exact value, then divided back, which is what
+    CPython's correctly rounded round() produces.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    scale = float(10 ** ndigits)
+    p, err = _two_product(x, scale)
+    n = np.rint(p)
+    half = np.abs(p - n) == 0.5
+    if half.any():
+        n = np.where(half & (err > 0), np.floor(p) + 1, n)
+        n = np.where(half & (err < 0), np.floor(p), n)
+    return n / scale
+
+
+# ------------------- Per-step Vector Helpers -------------------
+
+def bucket_miles_array(table, miles):
+    """BillableMilesTable.lookup for an int array of rounded miles."""
+    miles = np.asarray(miles, dtype=np.int64)
+    if miles.size and miles.min() < 0:
+        raise ValueError("Sweeps need non-negative miles")
+    lookup = np.asarray(table.table, dtype=np.int64)
+    inside = miles < len(lookup)
+    clipped = np.where(inside, miles, 0)
+    beyond = miles if table.beyond is None else np.full_like(miles, table.beyond)
+    return np.where(inside, lookup[clipped] if len(lookup) else 0, beyond)
+
+def upcharge_cap_array(subtotal, bands):
+    """UpchargeBands.lookup for an array of subtotals."""
+    subtotal = np.asarray(subtotal, dtype=np.float64)
+    if not bands.starts:
+        return np.full(subtotal.shape, bands.fallback)
+    i = np.searchsorted(np.asarray(bands.starts, dtype=np.float64), subtotal, side="right") - 1
+    clipped = np.maximum(i, 0)
+    inside = (i >= 0) & (subtotal <= np.asarray(bands.ends, dtype=np.float64)[clipped])
+    return np.where(inside, np.asarray(bands.caps, dtype=np.float64)[clipped], bands.fallback)
+
+def _subtotals(plan, base_rate, service_cfg, g_miles, bucket, inputs):
+    """(bucket_subtotal, standard_subtotal) arrays for one service."""
+    pricing_type = plan.pricing_type
+    if plan.calculator is None:
+        bucket_subtotal = np.full(g_miles.shape, float(base_rate))
+    elif pricing_type == "flat":
+        billable = np.maximum(0, bucket - service_cfg.get("includes", 0))
+        bucket_subtotal = base_rate + billable * service_cfg.get("mileage", 0)
+    elif pricing_type == "per_unit":
+        bucket_subtotal = 0
+        for unit_type, unit_info in service_cfg["units"].items():
+            count = np.asarray(inputs.get(unit_type, 0))
+            cost = unit_info["price"] * count
+            bucket_subtotal = bucket_subtotal + np.where(count > 0, cost, 0)
+        bucket_subtotal = np.broadcast_to(np.asarray(bucket_subtotal, dtype=np.float64), g_miles.shape)
+    elif pricing_type == "time_based":
+        minutes = np.asarray(inputs.get("duration_minutes", 0), dtype=np.int64)
+        extra = np.maximum(0, minutes - service_cfg.get("includes_time", 0))
+        increments = -(-extra // service_cfg.get("increment_minutes", 30))
+        bucket_subtotal = service_cfg.get("base_rate", 0) + increments * service_cfg.get("rate_per_increment", 0)
+        bucket_subtotal = np.broadcast_to(np.asarray(bucket_subtotal, dtype=np.float64), g_miles.shape)
+    else:
+        raise ValueError(f"No vectorized calculator for pricing type: {pricing_type}")
+
+    bucket_subtotal = np.asarray(bucket_subtotal, dtype=np.float64)
+    if pricing_type == "flat":
+        standard_subtotal = base_rate + np.maximum(0, g_miles - plan.includes) * plan.per_mile
+        standard_subtotal = np.asarray(standard_subtotal, dtype=np.float64)
+    else:
+        standard_subtotal = bucket_subtotal
+    return bucket_subtotal, standard_subtotal
+
+
+# ------------------- Sweep Engine -------------------
+
+def sweep_quote(snapshot, tow_type, services, miles, modifiers=None, is_accident=False,
+                window_film=None, duration_minutes=0):
+    """
+    Price `services` for every scenario in the broadcast of the input arrays.
+
+    miles             rounded (ceil'd) Google miles, int array
+    modifiers         {modifier name: array of upcharge fractions}; modifiers a
+                      service has enabled but that are missing here count as 0.0
+    window_film       {"side_window": counts, "front_or_back_window": counts}
+    duration_minutes  skid steer minutes (int(hours) * 60 in /calculate)
+
+    Returns {"services": {code: {...arrays}}, "standard_quote", "todynamiq_quote",
+    "overall_pct_chng"} with the same rounding as the /calculate response.
+    """
+    tow_plan = snapshot.plans[tow_type]
+    modifiers = modifiers or {}
+    window_film = window_film or {}
+
+    arrays = [np.asarray(miles, dtype=np.int64), *[np.asarray(v, dtype=np.float64) for v in modifiers.values()],
+              np.asarray(duration_minutes), *[np.asarray(v) for v in window_film.values()]]
+    shape = np.broadcast_shapes(*[a.shape for a in arrays])
+    g_miles = np.broadcast_to(arrays[0], shape)
+    modifiers = {name: np.broadcast_to(np.asarray(v, dtype=np.float64), shape) for name, v in modifiers.items()}
+
+    bucket = bucket_miles_array(snapshot.billable_miles, g_miles)
+    selected_mask = tow_plan.selection_mask(services)
+    bands = snapshot.upcharge_bands
+
+    results = {}
+    standard_total = np.zeros(shape)
+    todynamiq_total = np.zeros(shape)
+    for service in services:
+        plan = tow_plan.services[service]
+        base_rate, service_cfg = plan.resolve_base_rate(selected_mask, is_accident)
+
+        inputs = {}
+        if plan.input_kind == "window_film":
+            inputs.update(window_film)
+        elif plan.input_kind == "skid_steer":
+            inputs["duration_minutes"] = duration_minutes
+
+        bucket_subtotal, standard_subtotal = _subtotals(plan, base_rate, service_cfg, g_miles, bucket, inputs)
+
+        combined = np.zeros(shape)
+        for mod_name in plan.modifiers:
+            if mod_name in modifiers:
+                combined = combined + modifiers[mod_name]
+            else:
+                combined = combined + 0.0
+
+        combined = np.minimum(combined, upcharge_cap_array(standard_subtotal, bands))
+        upcharge_amount = py_round(standard_subtotal * combined, 2)
+        mileage_upcharge = bucket_subtotal - standard_subtotal
+        service_total = py_round(standard_subtotal + mileage_upcharge + upcharge_amount, 2)
+
+        results[service] = {
+            "standard_quote": py_round(standard_subtotal, 2),
+            "bucket_subtotal": bucket_subtotal,
+            "combined_upcharge_pct": py_round(combined, 3),
+            "upcharge_amount": upcharge_amount,
+            "mileage_upcharge": mileage_upcharge,
+            "todynamiq_quote": service_total,
+        }
+        standard_total = standard_total + standard_subtotal
+        todynamiq_total = todynamiq_total + service_total
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct = np.where(standard_total != 0, (todynamiq_total - standard_total) / standard_total * 100, 0.0)
+
+    return {
+        "bucket_miles": bucket,
+        "services": results,
+        "standard_quote": py_round(standard_total, 2),
+        "overall_pct_chng": py_round(pct, 2),
+        "todynamiq_quote": py_round(todynamiq_total, 2),
+    }
+
+
+# ------------------- Scenario Grids -------------------
+
+def modifier_axes(snapshot):
+    """Every selectable value of each request-level modifier, keyed like the request payload."""
+    dm = snapshot.dynamic_modifiers
+    return {
+        "weather": {key: w.get("upcharge", 0.0) for key, w in dm.get("weather", {}).items()},
+        "vehicle_location": {
+            f"{road_type} / {lane}": lane_data.get("upcharge", 0.0)
+            for road_type, road in dm.get("vehicle_location", {}).items()
+            for lane, lane_data in road["lanes"].items()
+        },
+        "time_of_day": {slot: s.get("upcharge", 0.0) for slot, s in dm.get("time_of_day", {}).items()},
+    }
+
+def grid(miles, **axes):
+    """
+    Cartesian product of miles and the given modifier axes.
+
+    Each axis is {label: upcharge}. Returns (miles, modifiers, labels) where
+    miles and every modifier array have one entry per scenario and labels maps
+    each axis to the label array for the same scenarios.
+    """
+    miles = np.asarray(miles, dtype=np.int64)
+    names = list(axes)
+    values = [np.asarray(list(axes[n].values()), dtype=np.float64) for n in names]
+    mesh = np.meshgrid(np.arange(len(miles)), *[np.arange(len(v)) for v in values], indexing="ij")
+    flat = [m.ravel() for m in mesh]
+
+    modifiers = {name: values[i][flat[i + 1]] for i, name in enumerate(names)}
+    labels = {name: np.asarray(list(axes[name]), dtype=object)[flat[i + 1]] for i, name in enumerate(names)}
+    return miles[flat[0]], modifiers, labels
+
+
+if __name__ == "__main__":
+    import argparse, os, time
+    from helper.catalog import PricingCatalog
+
+    parser = argparse.ArgumentParser(description="Price every service x miles x weather x lane x time slot.")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--tow-type", default="Light Duty")
+    parser.add_argument("--max-miles", type=int, default=500)
+    parser.add_argument("--out", help="write results to this .npz file")
+    args = parser.parse_args()
+
+    snapshot = PricingCatalog(args.data_dir).get()
+    axes = modifier_axes(snapshot)
+    miles, modifiers, labels = grid(np.arange(args.max_miles + 1), **axes)
+
+    started = time.perf_counter()
+    out = {}
+    for service in snapshot.plans[args.tow_type].services:
+        result = sweep_quote(snapshot, args.tow_type, [service], miles, modifiers)
+        out[f"{service}.standard"] = result["standard_quote"]
+        out[f"{service}.todynamiq"] = result["todynamiq_quote"]
+    elapsed = time.perf_counter() - started
+
+    scenarios = len(miles) * len(out) // 2
+    print(f"✅ Priced {scenarios:,} scenarios in {elapsed:.2f}s")
+    if args.out:
+        np.savez_compressed(args.out, miles=miles, **labels, **out)
+        print(f"✅ Sweep saved to {os.path.abspath(args.out)}")
@@ -0,0 +1,144 @@
+from datetime import datetime, timezone, timedelta
+
+# ------------------- Time-of-Day Slot Index -------------------
+#
+# dynamic_modifiers["time_of_day"] compiled once per catalog snapshot into
+# minute-of-day lookup tables, so resolving the slot for a quote is one list
+# index instead of two strptime calls per slot per service.
+#
+# Slot format (all optional fields default to "every day"):
+#   "22:00-02:00": {"start": "22:00", "end": "02:00", "upcharge": 0.1,
+#                   "days": ["fri", "sat"]}
+#   - start <= end is a same-day window, start > end crosses midnight (the
+#     part after midnight belongs to the day the window started on),
+#   - both ends are inclusive, as before: 08:00 matches a slot ending at
+#     08:00, 08:00:30 does not,
+#   - "days" takes mon..sun, "weekdays", "weekends" and "holiday",
+#   - overlapping slots are allowed; the first one in file order wins.
+#
+# Holidays: dynamic_modifiers["holidays"] = {"2025-11-27": "Thanksgiving",
+# "12-25": "Christmas Day", ...} (MM-DD entries repeat every year). On a
+# holiday, "holiday" slots win over the regular weekday slots.
+
+DAY_NAMES = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+DAY_GROUPS = {
+    "weekdays": DAY_NAMES[:5],
+    "weekends": DAY_NAMES[5:],
+}
+MINUTES_PER_DAY = 24 * 60
+
+HOLIDAY = 7         # table for holiday dates
+AFTER_HOLIDAY = 8   # after-midnight part of holiday slots that cross midnight
+
+
+def parse_minute(value: str, field: str) -> int:
+    """'HH:MM' -> minute of day ('24:00' is allowed as an end of day)."""
+    try:
+        hours, minutes = value.split(":")
+        minute = int(hours) * 60 + int(minutes)
+    except (AttributeError, ValueError):
+        raise ValueError(f"Invalid {field} time: {value!r} (expected HH:MM)")
+    if not 0 <= int(minutes) < 60 or not 0 <= minute <= MINUTES_PER_DAY:
+        raise ValueError(f"Invalid {field} time: {value!r} (expected HH:MM)")
+    return minute
+
+
+def client_local_time(data: dict) -> datetime:
+    """The client's wall-clock time from local_time + timezone_offset (UTC if missing or invalid)."""
+    local_time_str = data.get("local_time")
+    tz_offset = data.get("timezone_offset")
+    if local_time_str and tz_offset is not None:
+        try:
+            client_time = datetime.fromisoformat(local_time_str.replace("Z", "+00:00"))
+            return client_time + timedelta(minutes=-int(tz_offset))  # JS offset is minutes *behind* UTC
+        except Exception:
+            pass
+    return datetime.now(timezone.utc)
+
+
+class TimeSlotIndex:
+    """
+    Per day type (mon..sun, holiday, day after a holiday) two 1440-entry
+    tables of slot numbers: `at` for times exactly on the minute and
+    `within` for times inside it, which keeps inclusive window ends exact.
+    """
+
+    __slots__ = ("slots", "holidays", "at", "within")
+
+    def __init__(self, time_of_day: dict, holidays=None):
+        self.slots = tuple((key, slot.get("upcharge", 0.0)) for key, slot in time_of_day.items())
+        self.holidays = frozenset(self._holiday_keys(holidays or {}))
+
+        at = [[-1] * MINUTES_PER_DAY for _ in range(9)]
+        within = [[-1] * MINUTES_PER_DAY for _ in range(9)]
+
+        def fill(day, at_minutes, within_minutes, slot_no):
+            for minute in at_minutes:
+                if at[day][minute] < 0:     # first slot in file order wins
+                    at[day][minute] = slot_no
+            for minute in within_minutes:
+                if within[day][minute] < 0:
+                    within[day][minute] = slot_no
+
+        for slot_no, (key, slot) in enumerate(time_of_day.items()):
+            start = parse_minute(slot.get("start"), f"{key} start")
+            end = parse_minute(slot.get("end"), f"{key} end")
+            for day in self._day_types(key, slot.get("days")):
+                if start <= end:
+                    # start <= t <= end: the end minute itself only counts at hh:mm:00
+                    fill(day, range(start, min(end + 1, MINUTES_PER_DAY)), range(start, end), slot_no)
+                else:
+                    # crosses midnight: until the end of this day, then into the next one
+                    next_day = AFTER_HOLIDAY if day == HOLIDAY else (day + 1) % 7
+                    fill(day, range(start, MINUTES_PER_DAY), range(start, MINUTES_PER_DAY), slot_no)
+                    fill(next_day, range(0, end + 1), range(0, end), slot_no)
+
+        self.at = tuple(tuple(table) for table in at)
+        self.within = tuple(tuple(table) for table in within)
+
+    @staticmethod
+    def _holiday_keys(holidays):
+        for key in holidays:
+            parts = key.split("-")
+            if len(parts) not in (2, 3) or not all(part.isdigit() for part in parts):
+                raise ValueError(f"Invalid holiday date: {key!r} (expected YYYY-MM-DD or MM-DD)")
+            yield key
+
+    @staticmethod
+    def _day_types(key, days):
+        if days is None:
+            return range(7)
+        day_types = set()
+        for name in [days] if isinstance(days, str) else days:
+            name = name.casefold()
+            if name == "holiday":
+                day_types.add(HOLIDAY)
+            elif name in DAY_GROUPS:
+                day_types.update(DAY_NAMES.index(d) for d in DAY_GROUPS[name])
+            elif name in DAY_NAMES:
+                day_types.add(DAY_NAMES.index(name))
+            else:
+                raise ValueError(f"Invalid day {name!r} in time slot {key}")
+        return sorted(day_types)
+
+    def is_holiday(self, day) -> bool:
+        return bool(self.holidays) and (
+            day.isoformat() in self.holidays or f"{day.month:02d}-{day.day:02d}" in self.holidays
+        )
+
+    def lookup(self, when: datetime):
+        """(slot key, upcharge) for a wall-clock time, or (None, 0.0) outside every slot."""
+        minute = when.hour * 60 + when.minute
+        tables = self.at if not (when.second or when.microsecond) else self.within
+
+        slot_no = -1
+        if self.holidays:
+            day = when.date()
+            if self.is_holiday(day):
+                slot_no = tables[HOLIDAY][minute]
+            if slot_no < 0 and self.is_holiday(day - timedelta(days=1)):
+                slot_no = tables[AFTER_HOLIDAY][minute]
+        if slot_no < 0:
+            slot_no = tables[when.weekday()][minute]
+
+        return self.slots[slot_no] if slot_no >= 0 else (None, 0.0)
@@ -43,8 +43,28 @@ updateDateTime();
 
 
   // ---------------- Make / Model Dropdowns ----------------
-  // Parse car make/model data from JSON embedded in the HTML
-  const cars = JSON.parse(document.getElementById("cars-data").textContent);
+  // Models are fetched from /catalog/makes/<make>/models when a make is chosen.
+  // The browser revalidates with the catalog ETag, and we keep each make's
+  // models in memory so switching back and forth doesn't refetch.
+  const modelsByMake = new Map();
+
+  async function fetchModels(make) {
+    if (!modelsByMake.has(make)) {
+      const request = fetch(`/catalog/makes/${encodeURIComponent(make)}/models`, {
+        headers: { "Accept": "application/json" },
+      }).then(res => (res.ok ? res.json() : null))
+        .then(data => (data ? data.models : null))
+        .catch(err => {
+          console.error("Model fetch error:", err);
+          return null;
+        });
+      modelsByMake.set(make, request);
+      // Don't remember failures, so the next change can retry
+      request.then(models => { if (!models) modelsByMake.delete(make); });
+    }
+    return modelsByMake.get(make);
+  }
+
   const makeInput = document.getElementById("make_input");
   const modelInput = document.getElementById("model_input");
   const modelList = document.getElementById("model_list");
@@ -63,7 +83,7 @@ updateDateTime();
   });
 
   // Populate model dropdown once a make has been chosen
-  function populateModels() {
+  async function populateModels() {
     const selectedMake = makeInput.value.trim();
 
     // Always reset the model list first
@@ -73,20 +93,17 @@ updateDateTime();
 
     if (!selectedMake) return;
 
-    // Try direct dictionary key lookup first (cars["Ford"])
-    let makeEntry = cars[selectedMake];
+    // The server matches the make by key or by label
+    const models = await fetchModels(selectedMake);
 
-    // If not found by key, try to match by label instead
-    if (!makeEntry) {
-      makeEntry = Object.values(cars).find(m => m.label === selectedMake);
-    }
+    // Ignore stale responses if the user picked another make meanwhile
+    if (makeInput.value.trim() !== selectedMake) return;
 
     // If we found a valid make, populate the models
-    if (makeEntry && makeEntry.models) {
-      Object.keys(makeEntry.models).forEach(modelKey => {
-        const modelData = makeEntry.models[modelKey];
+    if (models) {
+      models.forEach(model => {
         const opt = document.createElement("option");
-        opt.value = modelData.label || modelKey;
+        opt.value = model.label || model.key;
         modelList.appendChild(opt);
       });
       modelInput.disabled = false;  // enable model input
@@ -96,6 +113,61 @@ updateDateTime();
   // Re-populate models whenever "make" changes
   makeInput.addEventListener("change", populateModels);
 
+
+  // ---------------- Vehicle Search ----------------
+  // Free-text lookup on /catalog/search (word prefixes, years, small typos).
+  // Picking a suggestion fills the make and model inputs above.
+  const searchInput = document.getElementById("vehicle_search_input");
+  const searchList = document.getElementById("vehicle_search_list");
+  const searchResults = new Map();   // suggestion label -> {make, model}
+  let searchTimer = null;
+
+  async function searchVehicles(query) {
+    try {
+      const res = await fetch(`/catalog/search?q=${encodeURIComponent(query)}&limit=10`, {
+        headers: { "Accept": "application/json" },
+      });
+      if (!res.ok) return;
+      const data = await res.json();
+      // Ignore stale responses if the user kept typing
+      if (searchInput.value.trim() !== query) return;
+
+      searchList.innerHTML = "";
+      searchResults.clear();
+      data.results.forEach(result => {
+        const [first, last] = result.years;
+        const label = first ? `${result.label} (${first === last ? first : `${first}-${last}`})` : result.label;
+        searchResults.set(label, result);
+        const opt = document.createElement("option");
+        opt.value = label;
+        searchList.appendChild(opt);
+      });
+    } catch (err) {
+      console.error("Vehicle search error:", err);
+    }
+  }
+
+  searchInput.addEventListener("input", () => {
+    const query = searchInput.value.trim();
+    const picked = searchResults.get(query);
+    if (picked) {
+      selectVehicle(picked);
+      return;
+    }
+    clearTimeout(searchTimer);
+    if (query.length < 2) return;
+    searchTimer = setTimeout(() => searchVehicles(query), 150);
+  });
+
+  async function selectVehicle(result) {
+    makeInput.value = result.make;
+    await populateModels();
+    if (makeInput.value !== result.make) return;   // user changed the make meanwhile
+    // Vehicles only in the US makes/models list have no catalog models: still fill them in
+    modelInput.disabled = false;
+    modelInput.value = result.model;
+  }
+
 /**
  * Dynamic Truck Label Updater
  * ---------------------------
@@ -0,0 +1,7 @@
+import os, sys
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")   # app.py needs a database; tests use an in-memory one
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+DATA_DIR = os.path.join(ROOT, "data")
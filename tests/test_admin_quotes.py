@@ -0,0 +1,28 @@
+import pytest
+import app as app_module
+from app import app, db, quote_log, QUOTE_LOG_TABLES
+
+
+@pytest.fixture
+def admin(monkeypatch):
+    """An admin test client on a database without the quote log tables."""
+    quote_log.drain(timeout=5)
+    with app.app_context():
+        db.metadata.drop_all(db.engine, tables=QUOTE_LOG_TABLES)
+    monkeypatch.setattr(app_module, "_quote_log_tables_ready", False)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user"] = "admin"
+        session["role"] = "admin"
+    return client
+
+
+def test_admin_quotes_on_empty_database(admin):
+    response = admin.get("/admin/quotes")
+    assert response.status_code == 200
+    assert response.get_json()["quotes"] == []
+
+
+def test_admin_quote_stats_on_empty_database(admin):
+    response = admin.get("/admin/quotes/stats")
+    assert response.status_code == 200
@@ -0,0 +1,49 @@
+import asyncio, threading
+from helper import async_distance
+from helper.distance_cache import DistanceCache
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = 0
+
+    async def matrix(self, origins, destinations):
+        self.calls += 1
+        return {
+            "status": "OK",
+            "origin_addresses": [o.upper() for o in origins],
+            "destination_addresses": [d.upper() for d in destinations],
+            "rows": [{"elements": [{"status": "OK", "distance": {"value": 16093}}]}],
+        }
+
+
+def test_sqlite_tier_stays_off_the_event_loop(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "distances.db")
+    DistanceCache(db_path=db_path).set("a", "b", {"g_miles": 7.0, "resolved_origin": "A", "resolved_destination": "B"})
+    cache = DistanceCache(db_path=db_path)   # cold memory tier, warm SQLite tier
+    client = FakeClient()
+    monkeypatch.setattr(async_distance, "distance_cache", cache)
+    monkeypatch.setattr(async_distance, "get_async_client", lambda: client)
+
+    db_threads = []
+    for name in ("_db_get", "_db_set"):
+        original = getattr(cache, name)
+        def recorded(*args, _original=original):
+            db_threads.append(threading.current_thread())
+            return _original(*args)
+        monkeypatch.setattr(cache, name, recorded)
+
+    async def run():
+        loop_thread = threading.current_thread()
+        from_sqlite = await async_distance.google_distance_async("a", "b")
+        from_memory = await async_distance.google_distance_async("a", "b")
+        from_google = await async_distance.google_distance_async("c", "d")
+        return loop_thread, from_sqlite, from_memory, from_google
+
+    loop_thread, from_sqlite, from_memory, from_google = asyncio.run(run())
+
+    assert (from_sqlite["g_miles"], from_sqlite["provider"]) == (7.0, "cache")
+    assert from_memory["provider"] == "cache"
+    assert from_google["provider"] == "google" and client.calls == 1
+    assert len(db_threads) == 3   # sqlite read for a|b, read + write for c|d; none for the memory hit
+    assert loop_thread not in db_threads
@@ -0,0 +1,31 @@
+import pytest
+import app as app_module
+from helper.scenarios import fake_distances
+
+
+GOOD = {"source": "a", "destination": "b", "tow_type": "Light Duty", "services": ["tow"]}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app_module, "get_distances", fake_distances)
+    return app_module.app.test_client()
+
+
+def test_bad_jobs_do_not_fail_the_batch(client):
+    quotes = [
+        GOOD,
+        dict(GOOD, make=["x"], model="y"),
+        dict(GOOD, services=[["tow"]]),
+        dict(GOOD, unsafe_location="shoulder"),
+        dict(GOOD, source=123),
+        "not a quote",
+        dict(GOOD, source="c"),
+    ]
+    response = client.post("/calculate/batch", json={"quotes": quotes})
+
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert [r["ok"] for r in results] == [True, False, False, False, False, False, True]
+    assert [r["status"] for r in results[1:6]] == [500, 500, 500, 400, 400]
+    assert results[6]["quote"]["source_resolved"] == "C"
@@ -0,0 +1,31 @@
+import json, os
+import pytest
+from conftest import DATA_DIR
+from helper import functions
+from helper.functions import BillableMilesTable, get_billable_miles
+
+
+def pattern(**free_range):
+    return {"bucket_mileage_pricing": {"mode": "pattern", "pattern": {
+        "start": 6, "first_step": 2, "step_growth": 1, "max_miles": 100, "free_range": free_range}}}
+
+
+def test_table_matches_get_billable_miles():
+    with open(os.path.join(DATA_DIR, "dynamic_modifiers.json"), "r", encoding="utf-8") as f:
+        dynamic_modifiers = json.load(f)
+    table = BillableMilesTable(dynamic_modifiers)
+    for miles in range(0, 3000, 7):
+        assert table.lookup(miles) == get_billable_miles(miles, dynamic_modifiers)
+
+
+@pytest.mark.parametrize("dynamic_modifiers", [pattern(min=0, max=5, billable_miles=5),
+                                               pattern(min=90, max=150, billable_miles=0)])
+def test_miles_past_the_table_skip_the_slow_path(dynamic_modifiers, monkeypatch):
+    table = BillableMilesTable(dynamic_modifiers)
+    expected = {miles: get_billable_miles(miles, dynamic_modifiers) for miles in (99, 100, 101, 150, 151, 5000)}
+
+    def slow_path(*args):
+        raise AssertionError("fell back to get_billable_miles")
+
+    monkeypatch.setattr(functions, "get_billable_miles", slow_path)
+    assert {miles: table.lookup(miles) for miles in expected} == expected
@@ -0,0 +1,35 @@
+import json
+import pytest
+from conftest import DATA_DIR
+from helper.bulk import read_jobs, price_jobs
+from helper.catalog import PricingCatalog
+
+
+def fake_distances(pairs):
+    return {
+        pair: {"g_miles": 12.3, "resolved_origin": pair[0].upper(), "resolved_destination": pair[1].upper(), "provider": "google"}
+        for pair in pairs
+    }
+
+
+GOOD = {"source": "a", "destination": "b", "tow_type": "Light Duty", "services": ["tow"]}
+
+
+@pytest.mark.parametrize("workers", [0, 1])
+def test_bad_jobs_do_not_stop_the_run(workers):
+    lines = [
+        json.dumps(GOOD),
+        json.dumps(dict(GOOD, window_film="x")),
+        json.dumps(dict(GOOD, skid_steer={"hours": "two"})),
+        "{not json",
+        json.dumps(dict(GOOD, make=["x"], model="y")),   # unexpected crash inside pricing
+        json.dumps(dict(GOOD, source=5)),
+        json.dumps(dict(GOOD, source="c")),
+    ]
+    items = list(price_jobs(read_jobs(lines, "jsonl"), PricingCatalog(DATA_DIR), workers=workers,
+                            distances=fake_distances))
+
+    assert [item["index"] for item in items] == [0, 1, 2, 3, 4, 5, 6]
+    assert [item["ok"] for item in items] == [True, False, False, False, False, False, True]
+    assert [item["status"] for item in items[1:6]] == [400, 400, 400, 500, 400]
+    assert items[6]["quote"]["source_resolved"] == "C"
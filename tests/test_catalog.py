@@ -0,0 +1,33 @@
+import os, shutil
+from conftest import DATA_DIR
+from helper import catalog as catalog_module
+from helper.catalog import PricingCatalog
+from helper.functions import UpchargeBands
+
+
+def test_vehicle_csv_edits_reload_the_search_index(tmp_path, monkeypatch):
+    csv_path = str(tmp_path / "vehicles.csv")
+    shutil.copy(catalog_module.VEHICLE_CSV, csv_path)
+    monkeypatch.setattr(catalog_module, "VEHICLE_CSV", csv_path)
+    catalog = PricingCatalog(DATA_DIR, check_interval=0)
+
+    before = catalog.get()
+    assert not [r for r in before.search_index.search("zorblax", 5) if r["make"] == "Zorblax"]
+
+    with open(csv_path, "a", encoding="utf-8") as f:
+        f.write("Zorblax,Hauler,2024\n")
+    st = os.stat(csv_path)
+    os.utime(csv_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+    after = catalog.get()
+    assert after is not before
+    assert after.version == before.version   # prices did not change
+    assert after.search_index.search("zorblax hauler", 5)[0]["model"] == "Hauler"
+
+
+def test_whole_dollar_bands_are_adjacent():
+    band = lambda lo, hi: {"min": lo, "max": hi, "max_upcharge": 0.1}
+    bands = UpchargeBands({"subtotal_upcharge_bands": {"a": band(50.0, 150.0), "b": band(151.0, 300.0),
+                                                       "c": band(400.0, 600.0)}})
+    assert bands.gaps == [(300.0, 400.0)]
+    assert bands.lookup(150.5) == bands.fallback   # prices between whole-dollar bands are unchanged
@@ -0,0 +1,45 @@
+import time
+import pytest
+import requests
+from helper.distance_client import CircuitBreaker, DistanceMatrixClient, UpstreamUnavailable
+
+
+class FakeResponse:
+    status_code = 200
+
+    def json(self):
+        return {"status": "OK", "rows": []}
+
+
+def client_with(monkeypatch, outcomes):
+    """A client whose session.get raises or returns the next item of `outcomes`."""
+    client = DistanceMatrixClient("key", max_retries=0, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0.01))
+    outcomes = iter(outcomes)
+
+    def get(*args, **kwargs):
+        outcome = next(outcomes)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+    monkeypatch.setattr(client.session, "get", get)
+    return client
+
+
+@pytest.mark.parametrize("trial_error, raised", [
+    (requests.exceptions.ChunkedEncodingError("broken body"), UpstreamUnavailable),
+    (requests.exceptions.ContentDecodingError("bad gzip"), UpstreamUnavailable),
+    (RuntimeError("bug"), RuntimeError),
+])
+def test_half_open_trial_always_settles(monkeypatch, trial_error, raised):
+    client = client_with(monkeypatch, [requests.ConnectionError("down"), trial_error, FakeResponse()])
+
+    with pytest.raises(UpstreamUnavailable):
+        client.matrix(["a"], ["b"])          # opens the circuit
+    time.sleep(0.02)
+    with pytest.raises(raised):
+        client.matrix(["a"], ["b"])          # half-open trial fails
+    assert client.breaker.state == "open"
+
+    time.sleep(0.02)
+    assert client.matrix(["a"], ["b"])["status"] == "OK"   # next trial is let through and closes it
+    assert client.breaker.state == "closed"
@@ -0,0 +1,50 @@
+import os
+import pytest
+from conftest import DATA_DIR
+from helper import functions
+from helper.distance_client import UpstreamUnavailable
+from helper.distance_providers import LocalDistanceEngine, UnknownPlace, calibrate_circuity, haversine_miles
+
+PLACES_CSV = os.path.join(DATA_DIR, "known_places.csv")
+
+
+def test_seed_places_load():
+    engine = LocalDistanceEngine(PLACES_CSV)
+    assert engine.locate("BHM") == engine.locate("Birmingham airport")
+    assert engine.locate("Galleria") is not None
+
+
+def test_local_distance_is_haversine_times_circuity():
+    engine = LocalDistanceEngine(PLACES_CSV, circuity=1.25)
+    airport, galleria = engine.locate("BHM")[:2], engine.locate("Galleria")[:2]
+    result = engine.distance("BHM", "Galleria")
+    assert result["provider"] == "local"
+    assert result["g_miles"] == round(haversine_miles(airport, galleria) * 1.25, 1)
+    # "lat,lng" works without a places file
+    assert LocalDistanceEngine().distance("33.5186,-86.8104", "33.5186,-86.8104")["g_miles"] == 0.0
+    with pytest.raises(UnknownPlace):
+        engine.distance("BHM", "Nowhere Rd, Atlantis")
+
+
+def test_calibrate_recovers_circuity():
+    engine = LocalDistanceEngine(PLACES_CSV)
+    pairs = [("BHM", "Galleria"), ("Trussville", "Bessemer"), ("UAB", "Trussville")]
+    samples = [(o, d, haversine_miles(engine.locate(o)[:2], engine.locate(d)[:2]) * 1.4) for o, d in pairs]
+    factor, used = calibrate_circuity(engine, samples + [("BHM", "Nowhere Rd, Atlantis", 10.0)])
+    assert used == 3
+    assert factor == pytest.approx(1.4)
+
+
+def test_provider_chain_falls_back_to_local(monkeypatch):
+    def google_down(origin, destination):
+        raise UpstreamUnavailable("circuit open")
+
+    engine = LocalDistanceEngine(PLACES_CSV)
+    monkeypatch.setattr(functions, "DISTANCE_PROVIDERS", ["google", "local"])
+    monkeypatch.setitem(functions.DISTANCE_FUNCTIONS, "google", google_down)
+    monkeypatch.setitem(functions.DISTANCE_FUNCTIONS, "local", engine.distance)
+
+    assert functions.get_distance("BHM", "Galleria") == engine.distance("BHM", "Galleria")
+    # Neither provider can answer: Google being down is the error that matters
+    with pytest.raises(UpstreamUnavailable):
+        functions.get_distance("BHM", "Nowhere Rd, Atlantis")
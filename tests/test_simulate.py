@@ -0,0 +1,31 @@
+from conftest import DATA_DIR
+from helper import simulate
+
+GOOD = {"source": "a", "destination": "b", "tow_type": "Light Duty", "services": ["tow"], "g_miles": 12.3}
+
+
+def test_malformed_scenarios_are_counted_not_fatal(monkeypatch):
+    monkeypatch.setattr(simulate.metrics, "METRICS_ENABLED", True)   # restored after _init_worker turns it off
+    simulate._init_worker(DATA_DIR, DATA_DIR)
+    payloads = [
+        GOOD,
+        dict(GOOD, unsafe_location="shoulder"),   # AttributeError inside pricing
+        dict(GOOD, window_film="x"),
+        dict(GOOD, g_miles="far"),
+        GOOD,
+    ]
+    count, arrays, services, errors = simulate.simulate_shard(("payloads", payloads))
+
+    assert count == 5
+    assert len(arrays["old.todynamiq_quote"]) == 2
+    assert errors == {"old": 2, "new": 2, "input": 1}
+
+
+def test_synthetic_shards_need_no_benchmarks_package(monkeypatch):
+    monkeypatch.setattr(simulate.metrics, "METRICS_ENABLED", True)
+    simulate._init_worker(DATA_DIR, DATA_DIR)
+    count, arrays, _, errors = simulate.simulate_shard(("synthetic", 1, 0, 50))
+
+    assert count == 50
+    assert not any(errors.values())
+    assert (arrays["old.todynamiq_quote"] == arrays["new.todynamiq_quote"]).all()